@@ -1,20 +1,25 @@
 import requests
 import json
+import os
+import sys
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.auth import get_token_manager
+
 # Базовый URL для тестовой среды Amadeus
 BASE_URL = "https://test.api.amadeus.com/v1"
 
-def get_access_token(api_key, api_secret):
+def request_access_token(api_key, api_secret):
     """
-    Получение access token через OAuth 2.0 Client Credentials Grant
+    Запрос нового access token через OAuth 2.0 Client Credentials Grant
     
     Args:
         api_key (str): API Key из панели управления Amadeus
         api_secret (str): API Secret из панели управления Amadeus
     
     Returns:
-        str: Access token или None в случае ошибки
+        dict: Ответ сервера авторизации или None в случае ошибки
     """
     
     url = f"{BASE_URL}/security/oauth2/token"
@@ -41,7 +46,7 @@ def get_access_token(api_key, api_secret):
             token_data = response.json()
             print("Токен успешно получен:")
             print(json.dumps(token_data, indent=2))
-            return token_data.get("access_token")
+            return token_data
         else:
             print(f"Ошибка получения токена: {response.text}")
             return None
@@ -50,6 +55,21 @@ def get_access_token(api_key, api_secret):
         print(f"Ошибка при запросе токена: {e}")
         return None
 
+def get_access_token(api_key, api_secret):
+    """
+    Получение access token из общего кэша токенов
+    
+    Args:
+        api_key (str): API Key из панели управления Amadeus
+        api_secret (str): API Secret из панели управления Amadeus
+    
+    Returns:
+        str: Access token или None в случае ошибки
+    """
+    credentials = {"token_url": f"{BASE_URL}/security/oauth2/token", "client_id": api_key, "client_secret": api_secret}
+    return get_token_manager().get_token("amadeus", credentials,
+                                         lambda: request_access_token(api_key, api_secret))
+
 def test_transfer_search_with_auth(api_key=None, api_secret=None):
     """
     Тестовый запрос к API Amadeus Transfer Search с авторизацией
@@ -7,6 +7,11 @@
 import requests
 import json
 import time
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.auth import get_token_manager
 
 # Конфигурация API
 BASE_URL = "https://stage.abgapiservices.com"
@@ -17,9 +22,12 @@ LOCATIONS_ENDPOINT = f"{BASE_URL}/cars/locations/v1/"
 CLIENT_ID = "7bc7af29041645fe80aa5d16e71876e5"
 CLIENT_SECRET = "7bc7af29041645fe80aa5d16e71876e5"
 
-def get_access_token():
+def request_access_token():
     """
-    Получение access token для аутентификации
+    Запрос нового access token у сервера авторизации
+    
+    Returns:
+        dict: Ответ сервера авторизации или None
     """
     print("🔑 Получение access token...")
     
@@ -36,7 +44,7 @@ def get_access_token():
             token_data = response.json()
             print("✅ Access token успешно получен")
             print(f"🕒 Срок действия: {token_data.get('expires_in', 'неизвестно')} секунд")
-            return token_data.get('access_token')
+            return token_data
         else:
             print("❌ Ошибка при получении токена:")
             print(f"Статус: {response.status_code}")
@@ -47,6 +55,15 @@ def get_access_token():
         print(f"❌ Исключение при получении токена: {e}")
         return None
 
+def get_access_token():
+    """
+    Получение access token для аутентификации
+    
+    Токен кэшируется на время жизни (expires_in ~ 2 часа) в общем менеджере токенов
+    """
+    credentials = {'token_url': TOKEN_ENDPOINT, 'client_id': CLIENT_ID, 'client_secret': CLIENT_SECRET}
+    return get_token_manager().get_token('avis', credentials, request_access_token)
+
 def test_car_locations_api(access_token):
     """
     Тестовый запрос к Car Locations API
@@ -4,10 +4,17 @@
 Демонстрирует структуру запроса и обработку ответа
 """
 
-import requests
 import json
 import base64
 from datetime import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.auth import get_token_manager
+from common.async_transport import get_async_client
+from common.place_index import PlaceIndex, radius_km
 
 class SabreGeoSearchAPI:
     def __init__(self):
@@ -22,10 +29,11 @@ class SabreGeoSearchAPI:
         }
         
         self.access_token = None
+        self.session = get_session()
     
-    def get_access_token(self, client_id, client_secret, username, password):
+    def _request_token(self, client_id, client_secret, username, password):
         """
-        Получение токена доступа для аутентификации
+        Запрос нового токена доступа у сервера авторизации
         """
         # Кодирование client_id:client_secret в base64
         credentials = f"{client_id}:{client_secret}"
@@ -44,23 +52,44 @@ class SabreGeoSearchAPI:
         
         try:
             print("Попытка получения токена доступа...")
-            response = requests.post(self.auth_url, headers=auth_headers, data=auth_data)
+            response = self.session.post(self.auth_url, headers=auth_headers, data=auth_data)
             
             print(f"Статус ответа аутентификации: {response.status_code}")
             print(f"Заголовки ответа: {dict(response.headers)}")
             
             if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data.get("access_token")
-                print(f"Токен получен успешно: {self.access_token[:20]}...")
-                return True
+                return response.json()
             else:
                 print(f"Ошибка получения токена: {response.text}")
-                return False
+                return None
                 
         except Exception as e:
             print(f"Исключение при получении токена: {e}")
-            return False
+            return None
+    
+    def get_access_token(self, client_id, client_secret, username, password):
+        """
+        Получение токена доступа для аутентификации
+        
+        Токен берется из общего кэша; запрос к серверу авторизации
+        выполняется, только если действующего токена нет.
+        """
+        credentials = {
+            "auth_url": self.auth_url,
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "username": username,
+            "password": password
+        }
+        self.access_token = get_token_manager().get_token(
+            "sabre", credentials,
+            lambda: self._request_token(client_id, client_secret, username, password)
+        )
+        
+        if self.access_token:
+            print(f"Токен получен успешно: {self.access_token[:20]}...")
+            return True
+        return False
     
     def search_by_coordinates(self, latitude, longitude, radius=10, category="HOTEL", uom="KM"):
         """
@@ -130,7 +159,7 @@ class SabreGeoSearchAPI:
             print(f"URL: {self.geo_search_url}")
             print(f"Данные запроса: {json.dumps(request_data, indent=2, ensure_ascii=False)}")
             
-            response = requests.post(self.geo_search_url, headers=headers, json=request_data)
+            response = self.session.post(self.geo_search_url, headers=headers, json=request_data)
             
             print(f"Статус ответа: {response.status_code}")
             print(f"Заголовки ответа: {dict(response.headers)}")
@@ -203,6 +232,114 @@ class SabreGeoSearchAPI:
         
         print("\n" + "="*50)
 
+class AsyncSabreGeoSearchAPI(SabreGeoSearchAPI):
+    """
+    Асинхронный вариант клиента Sabre Geo Search
+    
+    Методы search_by_coordinates, search_by_airport_code и search_by_city_name
+    наследуются и возвращают корутину, так как _make_request асинхронный.
+    Токен получается синхронно через get_access_token до начала опроса.
+    """
+    
+    async def _make_request(self, request_data, search_type):
+        """
+        Выполнение запроса к Geo Search API, асинхронно
+        """
+        if not self.access_token:
+            print("Ошибка: токен доступа не получен")
+            return None
+        
+        headers = self.headers.copy()
+        headers["Authorization"] = f"Bearer {self.access_token}"
+        
+        try:
+            response = await get_async_client().post(self.geo_search_url, headers=headers, json=request_data)
+            
+            if response.status_code == 200:
+                return response.json()
+            print(f"Sabre: ошибка поиска по {search_type}: {response.status_code} {response.text}")
+            return None
+                
+        except Exception as e:
+            print(f"Sabre: исключение при поиске по {search_type}: {e}")
+            return None
+
+class CachedSabreGeoSearchAPI(SabreGeoSearchAPI):
+    """
+    Клиент Sabre Geo Search с локальным пространственным индексом
+    
+    Все найденные места сохраняются в PlaceIndex. Если круг поиска целиком
+    лежит в уже обысканной области, ответ строится из индекса без запроса
+    к API. Координаты аэропортов и городов запоминаются из первого ответа,
+    поэтому повторный поиск вокруг того же аэропорта идет только локально.
+    
+    Дополнительные фильтры (chain_codes, min_stars, max_stars, limit)
+    передаются в PlaceIndex.query.
+    """
+    
+    def __init__(self, place_index=None):
+        """
+        Args:
+            place_index (PlaceIndex): Индекс мест (по умолчанию — в памяти)
+        """
+        super().__init__()
+        self.place_index = place_index if place_index is not None else PlaceIndex()
+        self.network_requests = 0
+    
+    def search_by_coordinates(self, latitude, longitude, radius=10, category="HOTEL", uom="KM", **filters):
+        """
+        Поиск по географическим координатам (из индекса, если область уже обыскана)
+        """
+        return self._cached_search(
+            (latitude, longitude), radius, category, uom, filters,
+            lambda: super(CachedSabreGeoSearchAPI, self).search_by_coordinates(
+                latitude, longitude, radius, category, uom)
+        )
+    
+    def search_by_airport_code(self, airport_code, radius=10, category="HOTEL", uom="KM", **filters):
+        """
+        Поиск по коду аэропорта (из индекса, если область уже обыскана)
+        """
+        return self._cached_search(
+            self.place_index.anchor('airport', airport_code), radius, category, uom, filters,
+            lambda: super(CachedSabreGeoSearchAPI, self).search_by_airport_code(
+                airport_code, radius, category, uom),
+            anchor=('airport', airport_code)
+        )
+    
+    def search_by_city_name(self, city_name, radius=10, category="HOTEL", uom="KM", **filters):
+        """
+        Поиск по названию города (из индекса, если область уже обыскана)
+        """
+        return self._cached_search(
+            self.place_index.anchor('city', city_name), radius, category, uom, filters,
+            lambda: super(CachedSabreGeoSearchAPI, self).search_by_city_name(
+                city_name, radius, category, uom),
+            anchor=('city', city_name)
+        )
+    
+    def _cached_search(self, center, radius, category, uom, filters, fetch, anchor=None):
+        if center is not None and self.place_index.is_covered(center[0], center[1],
+                                                              radius_km(radius, uom), category):
+            return self.place_index.as_response(center[0], center[1], radius, category, uom, **filters)
+        
+        self.network_requests += 1
+        result = fetch()
+        if not result:
+            return result
+        
+        search_results = result.get("GeoSearchRS", {}).get("GeoSearchResults", {})
+        if search_results.get("Latitude") is not None and search_results.get("Longitude") is not None:
+            center = (float(search_results["Latitude"]), float(search_results["Longitude"]))
+            if anchor:
+                self.place_index.set_anchor(anchor[0], anchor[1], center[0], center[1])
+        self.place_index.add_response(result, category, search_center=center,
+                                      searched_radius_km=radius_km(radius, uom))
+        
+        if filters and center is not None:
+            return self.place_index.as_response(center[0], center[1], radius, category, uom, **filters)
+        return result
+
 def main():
     """
     Основная функция для демонстрации работы с API
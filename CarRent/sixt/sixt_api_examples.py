@@ -3,18 +3,25 @@
 ## Базовая настройка
 
 ```python
+import os
+import sys
 import requests
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.ratelimit import get_rate_limiter
+
 # Базовый URL API
 BASE_URL = "https://api.orange.sixt.com/v1"
 
-# Настройка сессии для повторного использования соединений
-session = requests.Session()
-session.headers.update({
+# Общая сессия с пулом соединений; заголовки Sixt передаются в каждом запросе,
+# чтобы не попасть в запросы других провайдеров
+session = get_session()
+HEADERS = {
     'User-Agent': 'SixtAPIClient/1.0',
     'Accept': 'application/json'
-})
+}
 ```
 
 ## 1. Поиск станций
@@ -40,7 +47,8 @@ def search_stations(term, vehicle_type='car', location_type='station'):
     }
     
     try:
-        response = session.get(url, params=params, timeout=10)
+        get_rate_limiter().acquire('sixt')
+        response = session.get(url, params=params, headers=HEADERS)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -69,7 +77,8 @@ def get_station_details(station_id):
     url = f"{BASE_URL}/locations/{station_id}"
     
     try:
-        response = session.get(url, timeout=10)
+        get_rate_limiter().acquire('sixt')
+        response = session.get(url, headers=HEADERS)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -85,7 +94,21 @@ if station_details:
     print(f"Типы услуг: {station_details['subtypes']}")
 ```
 
-## 3. Поиск ближайших станций
+## 3. Каталог станций
+
+Детали станций (координаты, услуги) хранятся в локальном каталоге: поиск
+ближайших станций и фильтр по услугам не делают HTTP-запросов. При
+обновлении города детали запрашиваются только для новых и изменившихся
+станций, устаревшие города обновляются в фоне.
+
+```python
+from common.station_catalog import StationCatalog
+
+catalog = StationCatalog(search_stations, get_station_details, path="sixt_stations.json")
+catalog.start_background_refresh(interval=600)
+```
+
+## 4. Поиск ближайших станций
 
 ```python
 def find_nearest_stations(city, max_results=10):
@@ -99,19 +122,17 @@ def find_nearest_stations(city, max_results=10):
     Returns:
         list: Список ближайших станций с деталями
     """
-    stations = search_stations(city)
+    catalog.track(city)
     nearest_stations = []
     
-    for station in stations[:max_results]:
-        details = get_station_details(station['id'])
-        if details:
-            nearest_stations.append({
-                'id': station['id'],
-                'title': station['title'],
-                'address': station['subtitle'],
-                'coordinates': details.get('coordinates', {}),
-                'services': details.get('subtypes', [])
-            })
+    for station in catalog.by_city(city)[:max_results]:
+        nearest_stations.append({
+            'id': station['id'],
+            'title': station['title'],
+            'address': station['subtitle'],
+            'coordinates': station.get('coordinates', {}),
+            'services': station.get('subtypes', [])
+        })
     
     return nearest_stations
 
@@ -122,9 +143,13 @@ for i, station in enumerate(munich_stations, 1):
     print(f"   Адрес: {station['address']}")
     print(f"   Услуги: {', '.join(station['services'])}")
     print()
+
+# Ближайшие к точке станции (Мариенплац) — из памяти, по всем загруженным городам
+for distance, station in catalog.nearest(48.1374, 11.5755, k=3, service='eCar'):
+    print(f"{station['title']}: {distance:.1f} км")
 ```
 
-## 4. Фильтрация станций по типу услуг
+## 5. Фильтрация станций по типу услуг
 
 ```python
 def filter_stations_by_service(city, required_service):
@@ -138,16 +163,8 @@ def filter_stations_by_service(city, required_service):
     Returns:
         list: Станции с требуемой услугой
     """
-    stations = search_stations(city)
-    filtered_stations = []
-    
-    for station in stations:
-        if required_service in station.get('subtypes', []):
-            details = get_station_details(station['id'])
-            if details:
-                filtered_stations.append(details)
-    
-    return filtered_stations
+    catalog.track(city)
+    return catalog.with_service(required_service, city)
 
 # Пример использования - поиск станций с электромобилями
 ecar_stations = filter_stations_by_service("Munich", "eCar")
@@ -156,7 +173,7 @@ for station in ecar_stations[:3]:
     print(f"- {station['title']}: {station['subtitle']}")
 ```
 
-## 5. Обработка ошибок и повторные попытки
+## 6. Обработка ошибок и повторные попытки
 
 ```python
 import time
@@ -174,7 +191,12 @@ def retry_on_failure(max_retries=3, delay=1):
                     if attempt == max_retries - 1:
                         raise e
                     print(f"Попытка {attempt + 1} неудачна: {e}")
-                    time.sleep(delay * (2 ** attempt))  # Экспоненциальная задержка
+                    wait = delay * (2 ** attempt)  # Экспоненциальная задержка
+                    if e.response is not None and e.response.status_code == 429:
+                        # Пауза из Retry-After действует для всех процессов
+                        retry_after = get_rate_limiter().report_response('sixt', None, e.response)
+                        wait = max(wait, retry_after)
+                    time.sleep(wait)
             return None
         return wrapper
     return decorator
@@ -185,7 +207,7 @@ def robust_search_stations(term):
     return search_stations(term)
 ```
 
-## 6. Полный пример приложения
+## 7. Полный пример приложения
 
 ```python
 def main():
@@ -199,8 +221,8 @@ def main():
     
     # 2. Показать первые 3 станции с деталями
     print("2. Топ-3 станции с подробностями:")
-    for i, station in enumerate(munich_stations[:3], 1):
-        details = get_station_details(station['id'])
+    catalog.track("Munich")
+    for i, details in enumerate(catalog.by_city("Munich")[:3], 1):
         if details:
             print(f"{i}. {details['title']}")
             print(f"   ID: {details['id']}")
@@ -226,8 +248,8 @@ if __name__ == "__main__":
 ## Заметки по использованию
 
 1. **Лимиты запросов**: API может иметь ограничения на количество запросов в минуту
-2. **Кэширование**: Рекомендуется кэшировать результаты поиска станций
+2. **Кэширование**: Детали станций берутся из `StationCatalog`; снимок хранится в `sixt_stations.json`
 3. **Обработка ошибок**: Всегда проверяйте статус ответа и обрабатывайте исключения
-4. **Таймауты**: Устанавливайте разумные таймауты для запросов (10-30 секунд)
+4. **Таймауты**: Общий таймаут задается в `common/transport.py` (`DEFAULT_TIMEOUT`)
 5. **User-Agent**: Используйте осмысленный User-Agent для идентификации вашего приложения
 
@@ -5,6 +5,42 @@
 
 import requests
 import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.autosuggest import AutosuggestCache
+from common.schema import infer_files, describe
+
+AUTOSUGGEST_URL = "https://partners.api.skyscanner.net/apiservices/v3/autosuggest/carhire"
+
+def make_autosuggest_fetch(api_key):
+    """
+    Функция запроса к Car Hire Autosuggest для AutosuggestCache
+    
+    Returns:
+        callable: fetch(market, locale, term) -> ответ API или None
+    """
+    session = get_session()
+    headers = {
+        "Content-Type": "application/json",
+        "X-API-Key": api_key
+    }
+    
+    def fetch(market, locale, term):
+        data = {"query": {"market": market, "locale": locale, "searchTerm": term}}
+        try:
+            response = session.post(AUTOSUGGEST_URL, headers=headers, json=data)
+            if response.status_code == 200:
+                return response.json()
+            print(f"Skyscanner: ошибка автодополнения {response.status_code}: {response.text}")
+        except requests.exceptions.RequestException as e:
+            print(f"Skyscanner: ошибка сети: {e}")
+        return None
+    
+    return fetch
 
 def test_skyscanner_carhire_autosuggest():
     """
@@ -125,6 +161,36 @@ def test_skyscanner_carhire_autosuggest():
         print("-" * 80)
         print()
 
+def demo_autosuggest_cache():
+    """
+    Автодополнение с кэшем по префиксам на симулированных ответах
+    
+    Провайдер вызывается только для 'Lond' и пустого запроса; 'Londo',
+    'London', 'London H' строятся локально из полного ответа для 'Lond'.
+    """
+    print("=== Автодополнение с кэшем по префиксам ===\n")
+    
+    directory = os.path.dirname(os.path.abspath(__file__))
+    simulated = {}
+    for term, filename in [("lond", "simulated_response_london.json"), ("", "simulated_response_popular.json")]:
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            simulated[term] = json.load(f)
+    
+    def simulated_fetch(market, locale, term):
+        time.sleep(0.2)  # имитация задержки сети
+        return simulated.get(term.lower(), {"places": []})
+    
+    service = AutosuggestCache(simulated_fetch)
+    for term in ["", "", "Lond", "Londo", "London", "London H", "Heath", "Lond"]:
+        started = time.perf_counter()
+        result = service.suggest("UK", "en-GB", term)
+        elapsed = (time.perf_counter() - started) * 1000
+        names = [place['name'] for place in result['places']]
+        print(f"  '{term}': {result['source']:8} {elapsed:7.2f} мс  {names}")
+    
+    print(f"\nБез сети ('Man'): {[p['name'] for p in service.suggest_local('UK', 'en-GB', 'Man')]}")
+    print(f"Статистика: {service.stats}\n")
+
 def analyze_response_structure():
     """
     Анализирует структуру ожидаемого ответа
@@ -162,12 +228,23 @@ def analyze_response_structure():
     for place_type in place_types:
         print(f"  - {place_type}")
     print()
+    
+    # Фактическая структура — по записанным ответам рядом со скриптом
+    here = os.path.dirname(os.path.abspath(__file__))
+    recorded = [os.path.join(here, name) for name in sorted(os.listdir(here))
+                if name.startswith('simulated_response_') and name.endswith('.json')]
+    if recorded:
+        print(f"Структура по записанным ответам ({len(recorded)}):")
+        for line in describe(infer_files(recorded)):
+            print(f"  {line}")
+        print()
 
 if __name__ == "__main__":
     print("ВНИМАНИЕ: Для выполнения реальных запросов необходим API ключ от Skyscanner!")
     print("Получите его на https://developers.skyscanner.net/\n")
     
     analyze_response_structure()
+    demo_autosuggest_cache()
     
     # Раскомментируйте следующую строку после получения API ключа
     # test_skyscanner_carhire_autosuggest()
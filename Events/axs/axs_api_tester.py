@@ -5,7 +5,12 @@
 
 import requests
 import json
-from urllib.parse import urljoin
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.probe import EndpointProber, expand_targets, read_results, run_probe
 
 class AXSAPITester:
     def __init__(self):
@@ -34,12 +39,13 @@ class AXSAPITester:
             'Accept-Language': 'en-US,en;q=0.9',
             'Accept-Encoding': 'gzip, deflate, br'
         }
+        self.session = get_session()
 
     def test_endpoint(self, url):
         """Тестирует один endpoint"""
         try:
             print(f"Тестирую: {url}")
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.session.get(url, headers=self.headers)
             
             result = {
                 'url': url,
@@ -70,40 +76,57 @@ class AXSAPITester:
                 'status_code': None
             }
 
-    def run_tests(self):
-        """Запускает тесты для всех комбинаций URL и endpoints"""
-        results = []
+    def run_tests(self, results_path=None):
+        """
+        Запускает тесты для всех комбинаций URL и endpoints
+        
+        Запросы идут параллельно (не больше 4 на хост), сначала HEAD;
+        endpoints недоступного хоста пропускаются.
         
+        Args:
+            results_path (str): JSONL, куда результаты пишутся по мере готовности
+        """
         print("Начинаю тестирование AXS API endpoints...")
         print("=" * 60)
         
-        for base_url in self.base_urls:
-            print(f"\nТестирую базовый URL: {base_url}")
-            
-            # Тестируем базовый URL
-            result = self.test_endpoint(base_url)
-            results.append(result)
-            
-            # Тестируем endpoints
-            for endpoint in self.common_endpoints:
-                full_url = urljoin(base_url, endpoint)
-                result = self.test_endpoint(full_url)
-                results.append(result)
-        
+        prober = EndpointProber(headers=self.headers)
+        results = run_probe(prober, expand_targets(self.base_urls, self.common_endpoints), results_path)
+        for result in results:
+            print(f"{result.get('status_code') or result.get('skipped') or 'ERROR'}: {result['url']}")
         return results
 
     def analyze_results(self, results):
-        """Анализирует результаты тестирования"""
+        """
+        Анализирует результаты тестирования
+        
+        Args:
+            results: Список результатов или итератор (read_results) — читается за один проход
+        
+        Returns:
+            list: Успешные ответы (200)
+        """
+        total = 0
+        successful_requests = []
+        interesting_responses = []
+        skipped = 0
+        for result in results:
+            total += 1
+            if result.get('skipped'):
+                skipped += 1
+            if result.get('status_code') == 200:
+                successful_requests.append(result)
+            if result.get('status_code') in [200, 401, 403, 404]:
+                interesting_responses.append(result)
+        
         print("\n" + "=" * 60)
         print("АНАЛИЗ РЕЗУЛЬТАТОВ")
         print("=" * 60)
         
-        successful_requests = [r for r in results if r.get('status_code') == 200]
-        interesting_responses = [r for r in results if r.get('status_code') in [200, 401, 403, 404]]
-        
-        print(f"Всего запросов: {len(results)}")
+        print(f"Всего запросов: {total}")
         print(f"Успешных ответов (200): {len(successful_requests)}")
         print(f"Интересных ответов: {len(interesting_responses)}")
+        if skipped:
+            print(f"Пропущено (хост недоступен): {skipped}")
         
         if successful_requests:
             print("\nУСПЕШНЫЕ ЗАПРОСЫ:")
@@ -119,16 +142,17 @@ class AXSAPITester:
             if result.get('error'):
                 print(f"  Ошибка: {result['error']}")
         
-        return results
+        return successful_requests
 
 if __name__ == "__main__":
-    tester = AXSAPITester()
-    results = tester.run_tests()
-    tester.analyze_results(results)
+    results_path = 'axs_api_test_results.jsonl'
+    if os.path.exists(results_path):
+        os.remove(results_path)
     
-    # Сохраняем результаты в файл
-    with open('/home/ubuntu/axs_api_test_results.json', 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    tester = AXSAPITester()
+    tester.run_tests(results_path)
+    # Результаты записаны построчно по мере готовности
+    tester.analyze_results(read_results(results_path))
     
-    print(f"\nРезультаты сохранены в: /home/ubuntu/axs_api_test_results.json")
+    print(f"\nРезультаты сохранены в: {results_path}")
 
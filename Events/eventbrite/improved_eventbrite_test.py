@@ -1,5 +1,10 @@
 import requests
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import eventbrite_organization_events
 
 # Базовый URL API Eventbrite
 base_url = "https://www.eventbriteapi.com/v3"
@@ -129,6 +134,15 @@ def test_categories(token=None):
     except Exception as e:
         print(f"Исключение при запросе: {e}")
 
+def list_organization_events(organization_id, token, **params):
+    """Все события организации постранично (continuation)"""
+    events = eventbrite_organization_events(organization_id, token, **params)
+    for event in events:
+        print(f"- {event.get('name', {}).get('text')} [{event.get('status')}]")
+    print(f"Событий: {events.stats['items']}, страниц: {events.stats['pages']}"
+          f"{'' if events.complete else ' — неполная выборка: ошибка загрузки страницы'}")
+    return {**events.stats, 'complete': events.complete}
+
 if __name__ == "__main__":
     print("=== Улучшенное тестирование API Eventbrite ===\n")
     
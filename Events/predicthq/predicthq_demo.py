@@ -1,6 +1,12 @@
 import requests
 import json
 from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.async_transport import get_async_client
 
 # Демонстрационный скрипт для работы с PredictHQ Events API
 # Показывает различные способы использования API
@@ -15,13 +21,14 @@ class PredictHQEventsAPI:
         
         if access_token:
             self.headers["Authorization"] = f"Bearer {access_token}"
+        self.session = get_session()
     
     def search_events(self, **params):
         """
         Поиск событий с заданными параметрами
         """
         try:
-            response = requests.get(self.base_url, headers=self.headers, params=params)
+            response = self.session.get(self.base_url, headers=self.headers, params=params)
             return {
                 "status_code": response.status_code,
                 "headers": dict(response.headers),
@@ -67,6 +74,23 @@ class PredictHQEventsAPI:
         }
         return self.search_events(**params)
 
+class AsyncPredictHQEventsAPI(PredictHQEventsAPI):
+    """Асинхронный вариант клиента PredictHQ для параллельного опроса провайдеров"""
+    
+    async def search_events(self, **params):
+        """
+        Поиск событий с заданными параметрами, асинхронно
+        """
+        try:
+            response = await get_async_client().get(self.base_url, headers=self.headers, params=params)
+            return {
+                "status_code": response.status_code,
+                "headers": dict(response.headers),
+                "data": response.json() if response.headers.get('content-type', '').startswith('application/json') else response.text
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
 def demonstrate_api_usage():
     """
     Демонстрация различных способов использования API
@@ -1,5 +1,10 @@
 import requests
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import ticketmaster_events
 
 # Базовый URL API Ticketmaster Discovery
 base_url = "https://app.ticketmaster.com/discovery/v2"
@@ -79,6 +84,20 @@ def test_api_with_demo_key():
     
     return None
 
+def list_all_events(api_key, **filters):
+    """
+    Все события по фильтрам постранично (page/size)
+    
+    Discovery API отдает не глубже 1000 событий на запрос — для больших
+    выборок сужайте фильтры (startDateTime/endDateTime, city).
+    """
+    events = ticketmaster_events(api_key, **filters)
+    for event in events:
+        print(f"- {event.get('name')} ({event.get('dates', {}).get('start', {}).get('localDate')})")
+    print(f"Событий: {events.stats['items']}, страниц: {events.stats['pages']}"
+          f"{'' if events.complete else ' — неполная выборка: ошибка загрузки страницы'}")
+    return {**events.stats, 'complete': events.complete}
+
 if __name__ == "__main__":
     print("Тестирование API Ticketmaster Discovery")
     print("=" * 50)
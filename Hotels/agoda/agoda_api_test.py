@@ -8,6 +8,12 @@
 import requests
 import json
 from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.async_transport import get_async_client
 
 class AgodaAPIClient:
     def __init__(self, site_id, api_key, is_sandbox=True):
@@ -29,6 +35,7 @@ class AgodaAPIClient:
         else:
             self.json_search_url = "https://distribution.agoda.com/api/search"
             self.xml_search_url = "https://distribution.agoda.com/dsws/hotelapi.asmx"
+        self.session = get_session()
     
     def get_headers(self, content_type="application/json"):
         """Получить HTTP заголовки для запроса"""
@@ -115,11 +122,10 @@ class AgodaAPIClient:
             print()
             
             # Попытка выполнить запрос (ожидается ошибка без валидных учетных данных)
-            response = requests.post(
+            response = self.session.post(
                 self.json_search_url,
                 headers=headers,
-                json=request_data,
-                timeout=30
+                json=request_data
             )
             
             return {
@@ -135,6 +141,38 @@ class AgodaAPIClient:
                 "note": "Это ожидаемо без валидных учетных данных"
             }
 
+class AsyncAgodaAPIClient(AgodaAPIClient):
+    """Асинхронный вариант клиента Agoda для параллельного опроса провайдеров"""
+    
+    async def search_hotels_json(self, property_ids, check_in, check_out, **kwargs):
+        """
+        Выполнить поиск отелей через JSON API, асинхронно
+        
+        Аргументы и формат результата такие же, как у AgodaAPIClient.search_hotels_json
+        """
+        request_data = self.create_json_search_request(
+            property_ids, check_in, check_out, **kwargs
+        )
+        
+        try:
+            response = await get_async_client().post(
+                self.json_search_url,
+                headers=self.get_headers("application/json"),
+                json=request_data
+            )
+            
+            return {
+                "status_code": response.status_code,
+                "headers": dict(response.headers),
+                "content": response.text
+            }
+            
+        except Exception as e:
+            return {
+                "error": "Network error",
+                "details": str(e)
+            }
+
 def demo_agoda_api():
     """Демонстрация использования Agoda API"""
     
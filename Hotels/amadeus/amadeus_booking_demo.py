@@ -6,24 +6,31 @@
 
 import requests
 import json
+import os
+import sys
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.auth import get_token_manager
+from common.transport import get_session
+
 # Конфигурация API
 BASE_URL = "https://test.api.amadeus.com/v2"
 BOOKING_ENDPOINT = "/booking/hotel-orders"
+AUTH_URL = "https://test.api.amadeus.com/v1/security/oauth2/token"
 
 # ВНИМАНИЕ: Для реального использования нужно получить API ключи на https://developers.amadeus.com
 # Этот пример показывает структуру запроса
 API_KEY = "YOUR_API_KEY_HERE"
 API_SECRET = "YOUR_API_SECRET_HERE"
 
-def get_access_token(api_key, api_secret):
-    """
-    Получение access token для авторизации
-    В реальном приложении этот токен нужно кэшировать и обновлять при истечении
+def request_access_token(api_key, api_secret):
     """
-    auth_url = "https://test.api.amadeus.com/v1/security/oauth2/token"
+    Запрос нового access token через OAuth 2.0 Client Credentials Grant
     
+    Returns:
+        dict: Ответ сервера авторизации или None в случае ошибки
+    """
     headers = {
         "Content-Type": "application/x-www-form-urlencoded"
     }
@@ -34,8 +41,27 @@ def get_access_token(api_key, api_secret):
         "client_secret": api_secret
     }
     
-    # В демонстрационном режиме возвращаем фиктивный токен
-    return "DEMO_ACCESS_TOKEN"
+    try:
+        response = get_session().post(AUTH_URL, headers=headers, data=data)
+        if response.status_code == 200:
+            return response.json()
+        print(f"Ошибка получения токена: {response.status_code} {response.text}")
+    except requests.exceptions.RequestException as e:
+        print(f"Ошибка при запросе токена: {e}")
+    return None
+
+def get_access_token(api_key, api_secret):
+    """
+    Получение access token для авторизации
+    Токен кэшируется в общем менеджере токенов и обновляется до истечения
+    """
+    # В демонстрационном режиме (ключи не заданы) возвращаем фиктивный токен
+    if api_key == "YOUR_API_KEY_HERE":
+        return "DEMO_ACCESS_TOKEN"
+    
+    credentials = {"token_url": AUTH_URL, "client_id": api_key, "client_secret": api_secret}
+    return get_token_manager().get_token("amadeus", credentials,
+                                         lambda: request_access_token(api_key, api_secret))
 
 def create_hotel_booking_request():
     """
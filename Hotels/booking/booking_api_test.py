@@ -11,6 +11,12 @@ import requests
 import json
 from datetime import datetime, timedelta
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.async_transport import get_async_client
+from common.hydrate import DetailCache, DetailHydrator
 
 class BookingAPIClient:
     def __init__(self, api_key=None, affiliate_id=None, sandbox=True):
@@ -29,6 +35,9 @@ class BookingAPIClient:
             self.base_url = "https://demandapi-sandbox.booking.com/3.1"
         else:
             self.base_url = "https://demandapi.booking.com/3.1"
+        self.session = get_session()
+        # Кэши деталей по набору extras и languages
+        self.details_caches = {}
     
     def _get_headers(self):
         """Получить заголовки для аутентификации"""
@@ -39,6 +48,28 @@ class BookingAPIClient:
             'User-Agent': 'BookingAPITestClient/1.0'
         }
     
+    def _build_search_payload(self, city_id, checkin_date, checkout_date, country,
+                              platform, num_rooms, num_adults, num_children):
+        """Тело запроса поиска отелей (общее для синхронного и асинхронного клиента)"""
+        payload = {
+            "city": city_id,
+            "booker": {
+                "country": country.lower(),
+                "platform": platform
+            },
+            "checkin": checkin_date,
+            "checkout": checkout_date,
+            "guests": {
+                "number_of_rooms": num_rooms,
+                "number_of_adults": num_adults
+            }
+        }
+        
+        if num_children > 0:
+            payload["guests"]["children"] = [{"age": 10}] * num_children
+        
+        return payload
+    
     def search_accommodations(self, city_id, checkin_date, checkout_date, 
                             country='us', platform='desktop', 
                             num_rooms=1, num_adults=2, num_children=0):
@@ -59,34 +90,18 @@ class BookingAPIClient:
             dict: Ответ API или None в случае ошибки
         """
         url = f"{self.base_url}/accommodations/search"
-        
-        payload = {
-            "city": city_id,
-            "booker": {
-                "country": country.lower(),
-                "platform": platform
-            },
-            "checkin": checkin_date,
-            "checkout": checkout_date,
-            "guests": {
-                "number_of_rooms": num_rooms,
-                "number_of_adults": num_adults
-            }
-        }
-        
-        if num_children > 0:
-            payload["guests"]["children"] = [{"age": 10}] * num_children
+        payload = self._build_search_payload(city_id, checkin_date, checkout_date, country,
+                                             platform, num_rooms, num_adults, num_children)
         
         try:
             print(f"Отправка запроса к: {url}")
             print(f"Заголовки: {json.dumps(self._get_headers(), indent=2)}")
             print(f"Тело запроса: {json.dumps(payload, indent=2)}")
             
-            response = requests.post(
+            response = self.session.post(
                 url, 
                 headers=self._get_headers(),
-                json=payload,
-                timeout=30
+                json=payload
             )
             
             print(f"Статус ответа: {response.status_code}")
@@ -136,11 +151,10 @@ class BookingAPIClient:
         
         try:
             print(f"Получение деталей для отелей: {accommodation_ids}")
-            response = requests.post(
+            response = self.session.post(
                 url,
                 headers=self._get_headers(),
-                json=payload,
-                timeout=30
+                json=payload
             )
             
             if response.status_code == 200:
@@ -153,6 +167,63 @@ class BookingAPIClient:
         
         return None
 
+    def hydrate_accommodations(self, accommodation_ids, extras=None, languages=None,
+                               batch_size=100, max_workers=4):
+        """
+        Детали отелей для длинного списка ID
+        
+        Повторы убираются, уже загруженные отели берутся из кэша клиента,
+        остальные запрашиваются пачками через accommodations/details
+        (эндпоинт принимает список ID), пачки — параллельно.
+        
+        Args:
+            accommodation_ids: ID отелей, например из search_accommodations
+            extras (list): Как в get_accommodation_details
+            languages (list): Как в get_accommodation_details
+            batch_size (int): Максимум ID в одном запросе
+            max_workers (int): Максимум одновременных запросов
+        
+        Returns:
+            dict: {ID отеля: детали}; отели, которые не удалось загрузить, пропускаются
+        """
+        def fetch_many(ids):
+            response = self.get_accommodation_details(ids, extras=extras, languages=languages)
+            if not response:
+                return {}
+            return {item.get('id'): item for item in response.get('data', response.get('accommodations', []))}
+        
+        cache_key = (tuple(extras or ()), tuple(languages or ()))
+        cache = self.details_caches.setdefault(cache_key, DetailCache())
+        hydrator = DetailHydrator(fetch_many=fetch_many, batch_size=batch_size,
+                                  max_workers=max_workers, cache=cache, name="деталей отелей")
+        return hydrator.hydrate(accommodation_ids)
+
+class AsyncBookingAPIClient(BookingAPIClient):
+    """Асинхронный вариант клиента Booking.com для параллельного опроса провайдеров"""
+    
+    async def search_accommodations(self, city_id, checkin_date, checkout_date, 
+                                    country='us', platform='desktop', 
+                                    num_rooms=1, num_adults=2, num_children=0):
+        """
+        Поиск отелей, асинхронно
+        
+        Аргументы и формат результата такие же, как у BookingAPIClient.search_accommodations
+        """
+        url = f"{self.base_url}/accommodations/search"
+        payload = self._build_search_payload(city_id, checkin_date, checkout_date, country,
+                                             platform, num_rooms, num_adults, num_children)
+        
+        try:
+            response = await get_async_client().post(url, headers=self._get_headers(), json=payload)
+            
+            if response.status_code == 200:
+                return response.json()
+            print(f"Booking.com: ошибка {response.status_code}: {response.text}")
+        except Exception as e:
+            print(f"Booking.com: ошибка сети: {e}")
+        
+        return None
+
 def demo_search():
     """Демонстрация поиска отелей"""
     print("=== Демонстрация работы с Booking.com API ===\n")
@@ -183,17 +254,17 @@ def demo_search():
         print("✅ Поиск выполнен успешно!")
         print(f"Найдено отелей: {len(search_result.get('accommodations', []))}")
         
-        # Получение деталей для первых 3 отелей
-        accommodation_ids = [acc['id'] for acc in search_result.get('accommodations', [])[:3]]
+        # Получение деталей для всех найденных отелей (пачками, параллельно)
+        accommodation_ids = [acc['id'] for acc in search_result.get('data', search_result.get('accommodations', []))]
         if accommodation_ids:
-            details = client.get_accommodation_details(
+            details = client.hydrate_accommodations(
                 accommodation_ids,
                 extras=['description', 'facilities', 'photos'],
                 languages=['en-gb']
             )
             
             if details:
-                print("✅ Детали отелей получены успешно!")
+                print(f"✅ Детали отелей получены успешно: {len(details)}")
     else:
         print("❌ Поиск не удался")
         print("\nВозможные причины:")
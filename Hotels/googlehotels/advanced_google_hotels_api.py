@@ -7,18 +7,33 @@
 import requests
 import json
 import os
+import sys
+import tempfile
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.price_store import PriceStore
+from common.records import HotelOffer, RecordBatch
+
 class GoogleHotelsAPIClient:
     """Клиент для работы с Google Hotels API"""
     
-    def __init__(self, access_token=None):
+    def __init__(self, access_token=None, price_store=None):
+        """
+        Args:
+            access_token (str): OAuth 2.0 токен
+            price_store (PriceStore): Хранилище, в которое сохраняются полученные цены
+        """
         self.base_url = "https://travelpartner.googleapis.com/v3"
         self.access_token = access_token
-        self.session = requests.Session()
+        self.price_store = price_store
+        self.session = get_session()
+        # Сессия общая для всех клиентов, поэтому заголовки храним отдельно
+        self.headers = {}
         
         if access_token:
-            self.session.headers.update({
+            self.headers.update({
                 'Authorization': f'Bearer {access_token}',
                 'Content-Type': 'application/json'
             })
@@ -38,7 +53,7 @@ class GoogleHotelsAPIClient:
         url = f"{self.base_url}/{resource_name}"
         
         try:
-            response = self.session.get(url, timeout=30)
+            response = self.session.get(url, headers=self.headers)
             
             result = {
                 'url': url,
@@ -51,6 +66,9 @@ class GoogleHotelsAPIClient:
                 result['data'] = response.json()
             except json.JSONDecodeError:
                 result['data'] = response.text
+            
+            if self.price_store is not None and response.status_code == 200:
+                result['stored_rows'] = self.price_store.append_price_view(partner_hotel_id, result)
                 
             return result
             
@@ -65,6 +83,9 @@ class GoogleHotelsAPIClient:
         """
         Анализ данных о ценах
         
+        Для анализа по многим отелям и датам используйте PriceStore.analyze
+        и PriceStore.hotel_statistics — они не разбирают JSON повторно.
+        
         Args:
             price_view_data (dict): Данные о ценах из API
             
@@ -144,6 +165,23 @@ class GoogleHotelsAPIClient:
         
         return analysis
 
+    def price_offers(self, hotel_id, price_view_data):
+        """
+        Строки perItineraryPrices как записи HotelOffer в колоночной форме
+        
+        Компактная замена detailed_breakdown из analyze_price_data, когда цены
+        многих отелей держатся в памяти для ранжирования.
+        
+        Args:
+            hotel_id (str): ID отеля партнера
+            price_view_data (dict): Данные о ценах из API
+            
+        Returns:
+            RecordBatch: Предложения (пустой пакет при ошибке API)
+        """
+        prices = price_view_data.get('data', {}).get('perItineraryPrices', []) if 'error' not in price_view_data else []
+        return RecordBatch(HotelOffer, (HotelOffer.from_google_price(hotel_id, item) for item in prices))
+
 def demonstrate_api_usage():
     """Демонстрация использования API клиента"""
     
@@ -211,6 +249,16 @@ def demonstrate_api_usage():
     
     print("Результат анализа примерных данных:")
     print(json.dumps(analysis, indent=2, ensure_ascii=False))
+    
+    # Те же данные в колоночном хранилище: анализ сразу по всем отелям
+    print("\n=== Анализ через колоночное хранилище ===\n")
+    store = PriceStore(os.path.join(tempfile.mkdtemp(), "google_price_views"))
+    store.append_price_view(test_hotel_id, sample_data)
+    store.append_price_view("hotel_example_456", sample_data)
+    print(json.dumps(store.analyze(checkin_from="2025-07-15", checkin_to="2025-07-16"),
+                     indent=2, ensure_ascii=False))
+    print(json.dumps(store.hotel_statistics(), indent=2, ensure_ascii=False))
+    print(json.dumps(store.cheapest_checkin(test_hotel_id), indent=2, ensure_ascii=False))
 
 def save_results_to_file():
     """Сохранение результатов тестирования в файл"""
@@ -4,11 +4,16 @@
 Демонстрирует структуру запросов и аутентификацию
 """
 
-import requests
 import hashlib
 import time
 import json
 from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.async_transport import get_async_client
 
 class HotelbedsAPI:
     def __init__(self, api_key, secret, test_mode=True):
@@ -23,6 +28,7 @@ class HotelbedsAPI:
         self.api_key = api_key
         self.secret = secret
         self.base_url = "https://api.test.hotelbeds.com" if test_mode else "https://api.hotelbeds.com"
+        self.session = get_session()
         
     def _generate_signature(self):
         """Генерация X-Signature для аутентификации"""
@@ -46,7 +52,7 @@ class HotelbedsAPI:
         headers = self._get_headers()
         
         try:
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers)
             return {
                 'status_code': response.status_code,
                 'response': response.text,
@@ -57,21 +63,9 @@ class HotelbedsAPI:
                 'error': str(e)
             }
     
-    def search_hotels(self, destination, checkin_date, checkout_date, adults=2, children=0):
-        """
-        Поиск отелей (метод /hotels)
-        
-        Args:
-            destination (str): Код назначения
-            checkin_date (str): Дата заезда (YYYY-MM-DD)
-            checkout_date (str): Дата выезда (YYYY-MM-DD)
-            adults (int): Количество взрослых
-            children (int): Количество детей
-        """
-        url = f"{self.base_url}/hotel-api/1.0/hotels"
-        headers = self._get_headers()
-        
-        payload = {
+    def _build_search_payload(self, destination, checkin_date, checkout_date, adults, children):
+        """Тело запроса поиска отелей (общее для синхронного и асинхронного клиента)"""
+        return {
             "stay": {
                 "checkIn": checkin_date,
                 "checkOut": checkout_date
@@ -87,9 +81,49 @@ class HotelbedsAPI:
                 "code": destination
             }
         }
+    
+    def search_hotels(self, destination, checkin_date, checkout_date, adults=2, children=0):
+        """
+        Поиск отелей (метод /hotels)
+        
+        Args:
+            destination (str): Код назначения
+            checkin_date (str): Дата заезда (YYYY-MM-DD)
+            checkout_date (str): Дата выезда (YYYY-MM-DD)
+            adults (int): Количество взрослых
+            children (int): Количество детей
+        """
+        url = f"{self.base_url}/hotel-api/1.0/hotels"
+        headers = self._get_headers()
+        payload = self._build_search_payload(destination, checkin_date, checkout_date, adults, children)
+        
+        try:
+            response = self.session.post(url, headers=headers, json=payload)
+            return {
+                'status_code': response.status_code,
+                'response': response.json() if response.status_code == 200 else response.text,
+                'headers': dict(response.headers)
+            }
+        except Exception as e:
+            return {
+                'error': str(e)
+            }
+
+class AsyncHotelbedsAPI(HotelbedsAPI):
+    """Асинхронный вариант клиента Hotelbeds для параллельного опроса провайдеров"""
+    
+    async def search_hotels(self, destination, checkin_date, checkout_date, adults=2, children=0):
+        """
+        Поиск отелей (метод /hotels), асинхронно
+        
+        Аргументы и формат результата такие же, как у HotelbedsAPI.search_hotels
+        """
+        url = f"{self.base_url}/hotel-api/1.0/hotels"
+        headers = self._get_headers()
+        payload = self._build_search_payload(destination, checkin_date, checkout_date, adults, children)
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = await get_async_client().post(url, headers=headers, json=payload)
             return {
                 'status_code': response.status_code,
                 'response': response.json() if response.status_code == 200 else response.text,
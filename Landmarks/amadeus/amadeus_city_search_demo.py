@@ -11,10 +11,16 @@
 на ваши настоящие ключи от Amadeus for Developers.
 """
 
-import requests
 import json
 import time
 from typing import Dict, List, Optional, Any
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.auth import get_token_manager, REFRESH_MARGIN
+from common.ratelimit import get_rate_limiter
 
 class AmadeusClient:
     """Клиент для работы с Amadeus API"""
@@ -44,13 +50,23 @@ class AmadeusClient:
         # Токен и время его истечения
         self.access_token = None
         self.token_expires_at = None
+        self.session = get_session()
+        self.rate_limiter = get_rate_limiter()
     
-    def get_access_token(self) -> Optional[str]:
+    def _token_credentials(self) -> Dict[str, str]:
+        """Учетные данные, по которым токен хранится в общем кэше"""
+        return {
+            "token_url": self.token_url,
+            "client_id": self.api_key,
+            "client_secret": self.api_secret
+        }
+    
+    def _request_token(self) -> Optional[Dict[str, Any]]:
         """
-        Получение access token через OAuth 2.0
+        Запрос нового access token через OAuth 2.0
         
         Returns:
-            Access token или None в случае ошибки
+            Ответ сервера авторизации или None в случае ошибки
         """
         print("🔐 Получение access token...")
         
@@ -65,29 +81,20 @@ class AmadeusClient:
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.token_url,
                 headers=headers,
-                data=data,
-                timeout=10
+                data=data
             )
             
             print(f"Статус ответа: {response.status_code}")
             
             if response.status_code == 200:
                 token_data = response.json()
-                self.access_token = token_data.get("access_token")
-                expires_in = token_data.get("expires_in", 1800)  # По умолчанию 30 минут
-                
-                # Вычисляем время истечения токена
-                self.token_expires_at = time.time() + expires_in - 60  # Обновляем за минуту до истечения
-                
                 print("✅ Токен успешно получен")
                 print(f"Тип токена: {token_data.get('token_type')}")
-                print(f"Истекает через: {expires_in} секунд")
-                print(f"Токен: {self.access_token[:20]}...")
-                
-                return self.access_token
+                print(f"Истекает через: {token_data.get('expires_in')} секунд")
+                return token_data
             else:
                 print("❌ Ошибка получения токена:")
                 print(f"Статус: {response.status_code}")
@@ -98,17 +105,31 @@ class AmadeusClient:
             print(f"❌ Исключение при получении токена: {e}")
             return None
     
+    def get_access_token(self) -> Optional[str]:
+        """
+        Получение access token из общего кэша токенов
+        
+        Новый токен запрашивается, только если в кэше нет действующего;
+        обновление за минуту до истечения выполняет менеджер токенов.
+        
+        Returns:
+            Access token или None в случае ошибки
+        """
+        credentials = self._token_credentials()
+        manager = get_token_manager()
+        self.access_token = manager.get_token("amadeus", credentials, self._request_token)
+        self.token_expires_at = manager.expires_at("amadeus", credentials)
+        return self.access_token
+    
     def is_token_valid(self) -> bool:
         """Проверка валидности токена"""
         if not self.access_token or not self.token_expires_at:
             return False
-        return time.time() < self.token_expires_at
+        return time.time() < self.token_expires_at - REFRESH_MARGIN
     
     def ensure_valid_token(self) -> bool:
         """Обеспечение наличия валидного токена"""
-        if not self.is_token_valid():
-            return self.get_access_token() is not None
-        return True
+        return self.get_access_token() is not None
     
     def search_cities(self, 
                      keyword: str, 
@@ -154,12 +175,14 @@ class AmadeusClient:
         print(f"Параметры: {params}")
         
         try:
-            response = requests.get(
+            # Квота тестовой среды общая для всех процессов с этим ключом
+            self.rate_limiter.acquire("amadeus", self.api_key)
+            response = self.session.get(
                 self.city_search_url,
                 params=params,
-                headers=headers,
-                timeout=10
+                headers=headers
             )
+            self.rate_limiter.report_response("amadeus", self.api_key, response)
             
             print(f"Статус ответа: {response.status_code}")
             
@@ -9,8 +9,14 @@
 """
 
 import json
+import os
+import sys
 from typing import Dict, List, Any
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.geodistance import GeoIndex, one_to_many, pairwise
+from common.records import Place, RecordBatch
+
 # Пример успешного ответа API для поиска "PAR"
 EXAMPLE_SUCCESS_RESPONSE = {
     "meta": {
@@ -185,6 +191,16 @@ class CitySearchAnalyzer:
             ]
         }
     
+    @staticmethod
+    def to_places(cities: List[Dict[str, Any]]) -> RecordBatch:
+        """
+        Города и аэропорты в колоночной форме (common/records.py)
+        
+        Для сотен тысяч мест: записи Place без словарей, координаты — массивом
+        (batch.points() для common/geodistance.py).
+        """
+        return RecordBatch(Place, (Place.from_amadeus(city) for city in cities))
+    
     @staticmethod
     def group_by_country(cities: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Группировка городов по странам"""
@@ -223,6 +239,50 @@ class CitySearchAnalyzer:
         r = 6371
         
         return c * r
+    
+    @staticmethod
+    def distance_matrix(places_a: List[Dict[str, Any]],
+                        places_b: List[Dict[str, Any]] = None) -> List[List[float]]:
+        """
+        Матрица расстояний в километрах между двумя списками мест
+        
+        Места — города и аэропорты Amadeus, отели Sabre, станции Sixt
+        (см. common/geodistance.py). Считается одной векторной операцией.
+        """
+        return pairwise(places_a, places_b).tolist()
+    
+    @staticmethod
+    def places_within(center: Dict[str, Any], places: List[Dict[str, Any]],
+                      radius_km: float) -> List[Dict[str, Any]]:
+        """Места в радиусе radius_km от center, по возрастанию расстояния"""
+        info = CitySearchAnalyzer.extract_city_info(center)
+        distances = one_to_many((float(info["latitude"]), float(info["longitude"])), places)
+        order = [i for i in distances.argsort() if distances[i] <= radius_km]
+        return [{**places[i], "distance_km": round(float(distances[i]), 2)} for i in order]
+    
+    @staticmethod
+    def nearest_airports(places: List[Dict[str, Any]], airports: List[Dict[str, Any]],
+                         k: int = 1) -> List[List[Dict[str, Any]]]:
+        """
+        k ближайших аэропортов для каждого места
+        
+        Использует сеточный индекс, поэтому подходит для десятков тысяч мест.
+        
+        Returns:
+            Для каждого места список {'iata_code', 'name', 'distance_km'}
+        """
+        distances, indices = GeoIndex(airports).query(places, k=k)
+        return [
+            [
+                {
+                    "iata_code": airports[i].get("iataCode"),
+                    "name": airports[i].get("name"),
+                    "distance_km": round(float(d), 2)
+                }
+                for d, i in zip(row_d, row_i) if i >= 0
+            ]
+            for row_d, row_i in zip(distances, indices)
+        ]
 
 def demo_response_analysis():
     """Демонстрация анализа ответов API"""
@@ -279,6 +339,15 @@ def demo_response_analysis():
             print(f"  Страна: {airport['address']['countryCode']}")
             print(f"  Координаты: {airport['geoCode']['latitude']}, {airport['geoCode']['longitude']}")
     
+        
+        # Ближайший аэропорт для каждого города (векторный расчет)
+        print("\n📏 БЛИЖАЙШИЙ АЭРОПОРТ")
+        print("-" * 25)
+        nearest = analyzer.nearest_airports(cities, airports)
+        for city, city_airports in zip(cities, nearest):
+            for airport in city_airports:
+                print(f"{city['name']}: {airport['iata_code']} — {airport['distance_km']} км")
+    
     # Анализ ошибок
     print(f"\n\n❌ ПРИМЕРЫ ОБРАБОТКИ ОШИБОК")
     print("-" * 35)
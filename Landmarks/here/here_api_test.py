@@ -7,6 +7,11 @@
 import requests
 import json
 from typing import Dict, Any, Optional
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
 
 class HereGeocoderAPI:
     """Класс для работы с HERE Geocoder API"""
@@ -14,6 +19,7 @@ class HereGeocoderAPI:
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.base_url = "https://reverse.geocoder.ls.hereapi.com/6.2/reversegeocode.json"
+        self.session = get_session()
     
     def search_landmarks(self, latitude: float, longitude: float, radius: int = 1000) -> Optional[Dict[str, Any]]:
         """
@@ -38,7 +44,7 @@ class HereGeocoderAPI:
             print(f"URL: {self.base_url}")
             print(f"Параметры: {params}")
             
-            response = requests.get(self.base_url, params=params, timeout=10)
+            response = self.session.get(self.base_url, params=params)
             response.raise_for_status()
             
             return response.json()
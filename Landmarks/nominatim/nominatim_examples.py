@@ -3,29 +3,60 @@
 ## Базовый класс для работы с API
 
 ```python
+import os
+import sys
 import requests
 import time
 import json
 from typing import Dict, List, Optional
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.geocache import GeoCache
+from common.ratelimit import get_rate_limiter
+
+# Максимум OSM ID в одном запросе /lookup (ограничение сервера)
+MAX_LOOKUP_IDS = 50
+
+def normalize_osm_id(osm_id: str) -> str:
+    """Привести OSM ID к виду [N|W|R]<id>: 'n123 ' -> 'N123'"""
+    return str(osm_id).strip().upper()
+
+def osm_key(result: Dict) -> str:
+    """OSM ID результата в формате [N|W|R]<id>, как в параметре osm_ids"""
+    return f"{result.get('osm_type', '')[:1].upper()}{result.get('osm_id')}"
+
 class NominatimClient:
     """Клиент для работы с Nominatim API"""
     
-    def __init__(self, user_agent: str, base_url: str = "https://nominatim.openstreetmap.org"):
+    def __init__(self, user_agent: str, base_url: str = "https://nominatim.openstreetmap.org",
+                 cache: Optional[GeoCache] = None):
+        """
+        Args:
+            user_agent: User-Agent приложения (обязателен по правилам Nominatim)
+            base_url: Адрес сервера Nominatim
+            cache: Кэш ответов; ответы из кэша не ждут ограничения 1 запрос/с
+        
+        Ограничение 1 запрос/с общее для всех клиентов, потоков и процессов,
+        работающих с тем же сервером (см. common/ratelimit.py).
+        """
         self.base_url = base_url
+        self.cache = cache
         self.headers = {
             'User-Agent': user_agent
         }
-        self.last_request_time = 0
-        self.min_request_interval = 1  # Минимальный интервал между запросами в секундах
+        self.rate_limiter = get_rate_limiter()
+        self.session = get_session()
     
     def _wait_if_needed(self):
         """Ожидание для соблюдения ограничений API"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last)
-        self.last_request_time = time.time()
+        self.rate_limiter.acquire('nominatim', self.base_url)
+    
+    def _get(self, url: str, params: Dict):
+        """GET-запрос; ответ 429 приостанавливает все запросы к серверу на Retry-After"""
+        response = self.session.get(url, params=params, headers=self.headers)
+        self.rate_limiter.report_response('nominatim', self.base_url, response)
+        return response
     
     def search(self, query: str = None, **params) -> List[Dict]:
         """
@@ -38,8 +69,6 @@ class NominatimClient:
         Returns:
             Список найденных мест
         """
-        self._wait_if_needed()
-        
         url = f"{self.base_url}/search"
         
         # Параметры по умолчанию
@@ -52,13 +81,25 @@ class NominatimClient:
         # Объединяем параметры
         request_params = {**default_params, **params}
         
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.search_key(query, request_params)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        self._wait_if_needed()
+        
         if query:
             request_params['q'] = query
         
         try:
-            response = requests.get(url, params=request_params, headers=self.headers)
+            response = self._get(url, request_params)
             response.raise_for_status()
-            return response.json()
+            results = response.json()
+            if cache_key:
+                self.cache.put(cache_key, results, kind='search')
+            return results
         except requests.exceptions.RequestException as e:
             print(f"Ошибка запроса: {e}")
             return []
@@ -75,22 +116,30 @@ class NominatimClient:
         Returns:
             Информация о месте или None
         """
+        variant_params = {'format': 'json', 'addressdetails': 1, **params}
+        if self.cache:
+            cached = self.cache.get_reverse(lat, lon, variant_params)
+            if cached is not None:
+                return cached
+        
         self._wait_if_needed()
         
         url = f"{self.base_url}/reverse"
         
         request_params = {
-            'format': 'json',
             'lat': lat,
             'lon': lon,
-            'addressdetails': 1,
-            **params
+            **variant_params
         }
         
         try:
-            response = requests.get(url, params=request_params, headers=self.headers)
+            response = self._get(url, request_params)
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+            # Ответ с ошибкой ("Unable to geocode") тоже валиден, но не кэшируем его
+            if self.cache and 'error' not in result:
+                self.cache.put_reverse(lat, lon, result, variant_params)
+            return result
         except requests.exceptions.RequestException as e:
             print(f"Ошибка обратного геокодирования: {e}")
             return None
@@ -104,31 +153,85 @@ class NominatimClient:
             **params: Дополнительные параметры API
         
         Returns:
-            Список найденных объектов
+            Список найденных объектов (без дубликатов, в порядке osm_ids)
+        """
+        found = []
+        seen = set()
+        for osm_id, result in zip(osm_ids, self.lookup_batch(osm_ids, **params)):
+            key = normalize_osm_id(osm_id)
+            if result is not None and key not in seen:
+                seen.add(key)
+                found.append(result)
+        return found
+    
+    def lookup_batch(self, osm_ids: List[str], **params) -> List[Optional[Dict]]:
+        """
+        Пакетный поиск деталей по любому количеству OSM ID
+        
+        Дубликаты удаляются, закэшированные объекты не запрашиваются,
+        остальные ID упаковываются в запросы по MAX_LOOKUP_IDS штук,
+        каждый запрос проходит через ограничение частоты.
+        
+        Args:
+            osm_ids: Список OSM ID в формате [N|W|R]<id>
+            **params: Дополнительные параметры API
+        
+        Returns:
+            Список той же длины, что osm_ids: объект или None, если не найден
         """
+        variant_params = {'format': 'json', 'addressdetails': 1, **params}
+        
+        # Уникальные ID в порядке первого появления
+        unique_ids = list(dict.fromkeys(normalize_osm_id(osm_id) for osm_id in osm_ids))
+        
+        # Объекты из кэша не запрашиваем повторно
+        found = {}
+        missing_ids = unique_ids
+        if self.cache:
+            missing_ids = []
+            for osm_id in unique_ids:
+                cached = self.cache.get(self.cache.lookup_key(osm_id, variant_params))
+                if cached is not None:
+                    found[osm_id] = cached
+                else:
+                    missing_ids.append(osm_id)
+        
+        for start in range(0, len(missing_ids), MAX_LOOKUP_IDS):
+            chunk = missing_ids[start:start + MAX_LOOKUP_IDS]
+            for result in self._lookup_request(chunk, variant_params):
+                found[osm_key(result)] = result
+        
+        return [found.get(normalize_osm_id(osm_id)) for osm_id in osm_ids]
+    
+    def _lookup_request(self, osm_ids: List[str], variant_params: Dict) -> List[Dict]:
+        """Один запрос /lookup (не больше MAX_LOOKUP_IDS объектов)"""
         self._wait_if_needed()
         
         url = f"{self.base_url}/lookup"
         
         request_params = {
-            'format': 'json',
             'osm_ids': ','.join(osm_ids),
-            'addressdetails': 1,
-            **params
+            **variant_params
         }
         
         try:
-            response = requests.get(url, params=request_params, headers=self.headers)
+            response = self._get(url, request_params)
             response.raise_for_status()
-            return response.json()
+            results = response.json()
+            if self.cache:
+                for result in results:
+                    self.cache.put(self.cache.lookup_key(osm_key(result), variant_params),
+                                   result, kind='lookup')
+            return results
         except requests.exceptions.RequestException as e:
             print(f"Ошибка lookup: {e}")
             return []
 
 # Примеры использования
 if __name__ == "__main__":
-    # Создаем клиент
-    client = NominatimClient("MyApp/1.0 (contact@example.com)")
+    # Создаем клиент с постоянным кэшем: повторные запросы не ждут 1 с
+    cache = GeoCache("nominatim_cache.sqlite", reverse_radius_m=25)
+    client = NominatimClient("MyApp/1.0 (contact@example.com)", cache=cache)
     
     # Пример 1: Простой поиск
     print("=== Простой поиск ===")
@@ -164,6 +267,10 @@ if __name__ == "__main__":
         limit=5
     )
     print(f"Найдено ресторанов в Париже: {len(results)}")
+    
+    # Пример 5: Статистика кэша
+    print("\n=== Кэш ===")
+    print(cache.stats())  # {'hits': ..., 'misses': ..., 'hit_rate': ..., 'entries': ...}
 ```
 
 ## Полезные функции
@@ -202,6 +309,15 @@ def group_by_country(results: List[Dict]) -> Dict[str, List[Dict]]:
             groups[country] = []
         groups[country].append(result)
     return groups
+
+def group_osm_ids_by_country(client: NominatimClient, osm_ids: List[str]) -> Dict[str, List[Dict]]:
+    """
+    Группирует объекты по странам, получая их детали пакетно
+    
+    Вместо lookup на каждое место — один запрос на 50 ID
+    """
+    places = [place for place in client.lookup_batch(osm_ids) if place is not None]
+    return group_by_country(places)
 ```
 
 ## Обработка ошибок
@@ -224,3 +340,38 @@ def validate_coordinates(lat: float, lon: float) -> bool:
     return -90 <= lat <= 90 and -180 <= lon <= 180
 ```
 
+Для больших файлов адресов вместо цикла с `safe_search` используйте пакетный
+геокодер: он убирает повторы, использует тот же кэш и ограничитель частоты,
+сохраняет контрольные точки и показывает скорость и оставшееся время.
+
+```bash
+python -m common.bulk_geocode addresses.csv geocoded.jsonl --column street --column city \
+    --user-agent "MyApp/1.0 (contact@example.com)"
+# Прерванный запуск продолжается той же командой
+```
+
+
+## Единый геокодер для нескольких провайдеров
+
+Nominatim бесплатен, но ограничен 1 запросом в секунду. `Geocoder` из
+`common/geocoder.py` сам выбирает провайдера по стоимости, текущей
+задержке, доле ошибок и оставшейся квоте и дублирует запрос следующему
+провайдеру, если основной отвечает медленнее обычного.
+
+```python
+from common.geocoder import Geocoder, nominatim_provider, mapbox_provider, geodb_provider
+
+geocoder = Geocoder([
+    nominatim_provider(NominatimClient("MyTravelApp/1.0")),
+    mapbox_provider(os.getenv("MAPBOX_TOKEN"), daily_quota=3000),
+    geodb_provider(os.getenv("RAPIDAPI_KEY")),
+])
+
+result = geocoder.geocode("Красная площадь, Москва")
+for place in result['places']:
+    print(place['name'], place['latitude'], place['longitude'], place['sources'])
+
+# Ответы всех опрошенных провайдеров, объединенные в одну модель места
+cities = geocoder.search_cities("Kazan", country_code="RU", merge=True)
+print(cities['providers'], geocoder.stats())
+```
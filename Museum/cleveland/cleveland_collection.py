@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Локальная копия коллекции Cleveland Museum of Art с полнотекстовым поиском
+
+Полный открытый набор (~65 000 записей) загружается один раз — постранично
+через /api/artworks (limit=1000, skip) или из опубликованной выгрузки
+(data.json / data.jsonl / data.csv из github.com/ClevelandMuseumArt/openaccess,
+можно .gz). Повторная загрузка из API берет только записи, обновленные после
+предыдущей (updated_since).
+
+Записи хранятся в SQLite в сжатом виде (zlib от компактного JSON), рядом —
+обратный индекс FTS5 по названию, художникам (artists_tags и creators),
+культуре, технике, отделу и дате. Поиск по коллекции выполняется локально
+за миллисекунды; если SQLite собран без FTS5, используется таблица термов.
+
+Запуск:
+    python cleveland_collection.py ingest                    # из API
+    python cleveland_collection.py ingest --dump data.json   # из выгрузки
+    python cleveland_collection.py search "monet water lilies" --department "Modern European Painting and Sculpture"
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import cleveland_artworks
+
+DEFAULT_DB_PATH = "cleveland_collection.sqlite"
+# Поля обратного индекса: колонка -> поля записи
+INDEX_FIELDS = {
+    'title': ('title', 'alternate_titles'),
+    'artists': ('artists_tags', 'creators'),
+    'culture': ('culture',),
+    'technique': ('technique', 'type'),
+    'department': ('department', 'collection'),
+    'date': ('creation_date',),
+}
+BATCH_SIZE = 1000
+
+
+def _text(value):
+    """Текст поля для индекса: строки, списки и описания creators"""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ' '.join(_text(item) for item in value)
+    if isinstance(value, dict):
+        return _text(value.get('description') or value.get('title') or '')
+    return str(value)
+
+
+def tokenize(text):
+    """Термы для таблицы термов: нижний регистр без диакритики"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return re.findall(r'\w+', text)
+
+
+def parse_query(query):
+    """
+    Разобрать запрос на (колонка или None, терм)
+
+    'monet lilies' — оба слова в любом поле; 'culture:japan' — только в колонке;
+    последнее слово ищется как префикс.
+    """
+    terms = []
+    for part in query.split():
+        column, _, value = part.rpartition(':')
+        column = column if column in INDEX_FIELDS else None
+        for token in tokenize(value if column else part):
+            terms.append((column, token))
+    return terms
+
+
+def _read_dump(path):
+    # Записи выгрузки по одной: JSON (список или {'data': [...]}), JSONL или CSV
+    opener = gzip.open if path.endswith('.gz') else open
+    name = path[:-3] if path.endswith('.gz') else path
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if name.endswith('.csv'):
+            csv.field_size_limit(sys.maxsize)
+            yield from csv.DictReader(f)
+        elif name.endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            yield from (data.get('data', []) if isinstance(data, dict) else data)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ClevelandCollection:
+    """Сжатое хранилище записей и обратный индекс по коллекции"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        """
+        Args:
+            path (str): Файл SQLite (':memory:' — в памяти)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.fts = self._init_schema()
+
+    def _init_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS artworks (
+                id INTEGER PRIMARY KEY,
+                accession_number TEXT,
+                title TEXT,
+                department TEXT,
+                type TEXT,
+                year_from INTEGER,
+                year_to INTEGER,
+                has_image INTEGER,
+                updated_at TEXT,
+                record BLOB
+            );
+            CREATE INDEX IF NOT EXISTS artworks_accession ON artworks (accession_number);
+            CREATE INDEX IF NOT EXISTS artworks_department ON artworks (department);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        columns = ', '.join(INDEX_FIELDS)
+        try:
+            self.conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS artworks_fts USING fts5("
+                              f"{columns}, tokenize='unicode61 remove_diacritics 2')")
+            return True
+        except sqlite3.OperationalError:
+            # SQLite без FTS5: термы в обычной таблице
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS terms (term TEXT, column TEXT, id INTEGER);
+                CREATE INDEX IF NOT EXISTS terms_term ON terms (term, column);
+                CREATE INDEX IF NOT EXISTS terms_id ON terms (id);
+            """)
+            return False
+
+    # Загрузка
+
+    def _store(self, records):
+        rows, index_rows = [], []
+        for record in records:
+            artwork_id = _int(record.get('id'))
+            if artwork_id is None:
+                continue
+            images = record.get('images')
+            rows.append((
+                artwork_id, record.get('accession_number'), record.get('title'),
+                record.get('department'), record.get('type'),
+                _int(record.get('creation_date_earliest')), _int(record.get('creation_date_latest')),
+                1 if images or record.get('image_web') else 0, record.get('updated_at'),
+                zlib.compress(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            ))
+            index_rows.append((artwork_id, [' '.join(_text(record.get(field)) for field in fields)
+                                            for fields in INDEX_FIELDS.values()]))
+
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO artworks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            ids = [(artwork_id,) for artwork_id, _ in index_rows]
+            if self.fts:
+                self.conn.executemany("DELETE FROM artworks_fts WHERE rowid = ?", ids)
+                self.conn.executemany(f"INSERT INTO artworks_fts (rowid, {', '.join(INDEX_FIELDS)}) "
+                                      f"VALUES (?{', ?' * len(INDEX_FIELDS)})",
+                                      [(artwork_id, *texts) for artwork_id, texts in index_rows])
+            else:
+                self.conn.executemany("DELETE FROM terms WHERE id = ?", ids)
+                self.conn.executemany("INSERT INTO terms VALUES (?, ?, ?)", [
+                    (term, column, artwork_id)
+                    for artwork_id, texts in index_rows
+                    for column, text in zip(INDEX_FIELDS, texts)
+                    for term in set(tokenize(text))
+                ])
+        return len(rows)
+
+    def _ingest(self, records, source):
+        started = time.monotonic()
+        total = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                total += self._store(batch)
+                batch = []
+                print(f"  записано {total} ({total / (time.monotonic() - started):.0f} записей/с)", flush=True)
+        if batch:
+            total += self._store(batch)
+        # Обход API, прерванный ошибкой страницы (Pager.complete = False), не сдвигает
+        # отметку updated_at: иначе следующая загрузка с updated_since пропустит
+        # непрочитанные записи. У выгрузки из файла атрибута complete нет
+        complete = getattr(records, 'complete', True)
+        entries = [('source', source), ('ingested_at', time.strftime('%Y-%m-%dT%H:%M:%S'))]
+        with self.lock, self.conn:
+            if complete:
+                latest = self.conn.execute("SELECT MAX(updated_at) FROM artworks").fetchone()[0]
+                entries.append(('updated_at', latest or ''))
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", entries)
+        if not complete:
+            print("Загрузка неполная: отметка updated_at не изменена, следующий запуск повторит выборку")
+        return total
+
+    def ingest_api(self, full=False, **params):
+        """
+        Загрузить коллекцию из API постранично
+
+        Args:
+            full (bool): Загрузить все заново (по умолчанию — только обновленные
+                после предыдущей загрузки)
+            **params: Фильтры /api/artworks (cc0, has_image, department, ...)
+
+        Returns:
+            int: Количество записанных записей
+        """
+        since = None if full else self.meta('updated_at')
+        if since:
+            params['updated_since'] = since[:10]
+            print(f"Загрузка записей, обновленных с {params['updated_since']}")
+        return self._ingest(cleveland_artworks(**params), 'api')
+
+    def ingest_dump(self, path):
+        """
+        Загрузить коллекцию из файла выгрузки (.json, .jsonl, .csv, можно .gz)
+
+        Returns:
+            int: Количество записанных записей
+        """
+        return self._ingest(_read_dump(path), os.path.basename(path))
+
+    # Поиск
+
+    def _match_ids_fts(self, terms, limit, offset, filters, params):
+        parts = []
+        for i, (column, token) in enumerate(terms):
+            phrase = f'"{token}"' + ('*' if i == len(terms) - 1 else '')
+            parts.append(f"{column} : {phrase}" if column else phrase)
+        sql = (f"SELECT a.id FROM artworks_fts JOIN artworks a ON a.id = artworks_fts.rowid "
+               f"WHERE artworks_fts MATCH ?{filters} ORDER BY bm25(artworks_fts, 10, 3, 2, 2, 1, 1) "
+               f"LIMIT ? OFFSET ?")
+        return [row[0] for row in self.conn.execute(sql, [' '.join(parts), *params, limit, offset])]
+
+    def _match_ids_terms(self, terms, limit, offset, filters, params):
+        # Пересечение списков ID по термам; последний терм — префикс
+        selects, values = [], []
+        for i, (column, token) in enumerate(terms):
+            condition = "term >= ? AND term < ?" if i == len(terms) - 1 else "term = ?"
+            values.extend([token, token + '\uffff'] if i == len(terms) - 1 else [token])
+            if column:
+                condition += " AND column = ?"
+                values.append(column)
+            selects.append(f"SELECT id FROM terms WHERE {condition}")
+        sql = (f"SELECT a.id FROM artworks a WHERE a.id IN ({' INTERSECT '.join(selects)}){filters} "
+               f"ORDER BY a.title LIMIT ? OFFSET ?")
+        return [row[0] for row in self.conn.execute(sql, [*values, *params, limit, offset])]
+
+    def search(self, query='', department=None, artwork_type=None, year_from=None, year_to=None,
+               has_image=None, limit=20, offset=0):
+        """
+        Поиск по локальной коллекции
+
+        Args:
+            query (str): Слова запроса; 'culture:japan' — поиск в одном поле
+                (title, artists, culture, technique, department, date)
+            department (str): Точное название отдела
+            artwork_type (str): Тип произведения ('Painting', 'Print', ...)
+            year_from (int): Создано не раньше
+            year_to (int): Создано не позже
+            has_image (bool): Только с изображением
+            limit (int): Максимум результатов
+            offset (int): Смещение
+
+        Returns:
+            list: Записи в формате API, лучшие совпадения первыми
+        """
+        filters, params = [], []
+        for condition, value in (("a.department = ?", department), ("a.type = ?", artwork_type),
+                                 ("a.year_to >= ?", year_from), ("a.year_from <= ?", year_to)):
+            if value is not None:
+                filters.append(condition)
+                params.append(value)
+        if has_image is not None:
+            filters.append("a.has_image = ?")
+            params.append(1 if has_image else 0)
+
+        terms = parse_query(query or '')
+        with self.lock:
+            if not terms:
+                where = f" WHERE {' AND '.join(filters)}" if filters else ''
+                ids = [row[0] for row in self.conn.execute(
+                    f"SELECT a.id FROM artworks a{where} ORDER BY a.title LIMIT ? OFFSET ?",
+                    [*params, limit, offset])]
+            else:
+                extra = ''.join(f" AND {condition}" for condition in filters)
+                match = self._match_ids_fts if self.fts else self._match_ids_terms
+                ids = match(terms, limit, offset, extra, params)
+            return [self._record(artwork_id) for artwork_id in ids]
+
+    def _record(self, artwork_id):
+        row = self.conn.execute("SELECT record FROM artworks WHERE id = ?", (artwork_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def get(self, key):
+        """Запись по id или номеру поступления ('1964.160'), иначе None"""
+        with self.lock:
+            row = self.conn.execute("SELECT id FROM artworks WHERE id = ? OR accession_number = ?",
+                                    (_int(key), str(key))).fetchone()
+            return self._record(row[0]) if row else None
+
+    def meta(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+
+    def stats(self):
+        """Количество записей, размер сжатых записей и источник загрузки"""
+        with self.lock:
+            count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(record)), 0) FROM artworks").fetchone()
+            meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        return {'artworks': count, 'record_bytes': size, 'fts5': self.fts, **meta}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальная копия коллекции Cleveland Museum of Art")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Файл SQLite")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="Загрузить коллекцию")
+    ingest.add_argument('--dump', help="Файл выгрузки вместо API (.json, .jsonl, .csv, .gz)")
+    ingest.add_argument('--full', action='store_true', help="Загрузить из API все заново")
+    ingest.add_argument('--cc0', action='store_true', help="Только записи CC0")
+
+    search = commands.add_parser('search', help="Поиск по локальной коллекции")
+    search.add_argument('query', nargs='?', default='')
+    search.add_argument('--department')
+    search.add_argument('--type')
+    search.add_argument('--year-from', type=int)
+    search.add_argument('--year-to', type=int)
+    search.add_argument('--has-image', action='store_true')
+    search.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    collection = ClevelandCollection(args.db)
+    if args.command == 'ingest':
+        started = time.monotonic()
+        if args.dump:
+            count = collection.ingest_dump(args.dump)
+        else:
+            count = collection.ingest_api(full=args.full, **({'cc0': ''} if args.cc0 else {}))
+        print(f"Записано {count} за {time.monotonic() - started:.1f} с; {collection.stats()}")
+    else:
+        started = time.monotonic()
+        results = collection.search(args.query, args.department, args.type, args.year_from,
+                                    args.year_to, True if args.has_image else None, args.limit)
+        elapsed = (time.monotonic() - started) * 1000
+        for record in results:
+            print(f"{record.get('accession_number')}: {record.get('title')} "
+                  f"({record.get('creation_date')}) — {record.get('department')}")
+        print(f"Найдено {len(results)} за {elapsed:.1f} мс")
+    collection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,11 @@
 import requests
 import json
 from datetime import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import cleveland_artworks
 
 def test_cleveland_api():
     """Выполняет тестовый запрос к API Cleveland Museum of Art"""
@@ -114,9 +119,31 @@ def test_cleveland_api():
         print(f"Неожиданная ошибка: {e}")
         return None
 
+def walk_artworks(search, max_items=None):
+    """
+    Обход всех произведений по запросу постранично (limit/skip)
+    
+    Следующая страница загружается, пока обрабатывается текущая; в памяти
+    хранятся только счетчики, поэтому так можно пройти всю коллекцию.
+    """
+    artworks = cleveland_artworks(search=search, max_items=max_items)
+    departments = {}
+    for artwork in artworks:
+        department = artwork.get('department') or 'N/A'
+        departments[department] = departments.get(department, 0) + 1
+    print(f"Произведений: {artworks.stats['items']}, страниц: {artworks.stats['pages']}, "
+          f"ожидание страниц: {artworks.stats['wait_seconds']:.2f} с"
+          f"{'' if artworks.complete else ' — неполная выборка: ошибка загрузки страницы'}")
+    for department, count in sorted(departments.items(), key=lambda item: -item[1])[:5]:
+        print(f"  - {department}: {count}")
+    return departments
+
 if __name__ == "__main__":
     result = test_cleveland_api()
     
+    print("\n=== Обход результатов поиска постранично ===")
+    walk_artworks("painting", max_items=3000)
+    
     if result:
         print("\n=== Тест завершен успешно ===")
     else:
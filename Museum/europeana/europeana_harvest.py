@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Полная выгрузка результатов поиска Europeana
+
+Постраничный обход через start медленный и упирается в потолок глубины
+выдачи (start + rows <= 1000). Здесь запрос сначала делится по фасетам
+TYPE, COUNTRY и YEAR на срезы не больше --max-slice записей, затем срезы
+выгружаются параллельно, каждый — курсором (cursor=*, затем nextCursor),
+у которого ограничения глубины нет.
+
+Каждый срез пишется в свой файл <срез>.jsonl.gz; каждая страница — отдельный
+gzip-блок, поэтому файл всегда читается целиком (zcat, gzip.open). После
+каждой страницы в harvest.json сохраняются курсор и размер файла: прерванный
+запуск продолжается той же командой, недописанный хвост отбрасывается.
+
+Для значений, не попавших в список фасета (и записей без значения), создается
+срез-остаток с NOT; записи с несколькими значениями YEAR попадают в несколько
+срезов и пишутся один раз.
+
+Запуск:
+    python europeana_harvest.py "Van Gogh" vangogh/ --wskey ВАШ_КЛЮЧ --workers 4
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import Pager, cursor_strategy, items_at, make_fetch
+
+SEARCH_URL = "https://api.europeana.eu/record/v2/search.json"
+FACET_FIELDS = ('TYPE', 'COUNTRY', 'YEAR')
+# Максимум значений одного фасета; остальные попадают в срез-остаток
+FACET_LIMIT = 150
+# Максимум записей на страницу Search API
+MAX_ROWS = 100
+DEFAULT_MAX_SLICE = 20000
+DEFAULT_WORKERS = 4
+PROGRESS_EVERY_SECONDS = 10
+STATE_FILE = 'harvest.json'
+
+
+def facet_filter(field, values):
+    """Фильтр qf для одного или нескольких значений фасета"""
+    listed = ' OR '.join(json.dumps(value, ensure_ascii=False) for value in values)
+    return f'{field}:({listed})' if len(values) > 1 else f'{field}:{listed}'
+
+
+def pack_values(values, max_slice):
+    """
+    Сгруппировать значения фасета в срезы не больше max_slice записей
+
+    Значения, которые больше max_slice сами по себе, остаются отдельными
+    группами и делятся дальше по следующему фасету.
+
+    Returns:
+        list: [(значения, количество), ...]
+    """
+    groups = []
+    for label, count in sorted(values, key=lambda value: -value[1]):
+        for group in groups:
+            if group[1] + count <= max_slice:
+                group[0].append(label)
+                group[1] += count
+                break
+        else:
+            groups.append([[label], count])
+    return [(labels, count) for labels, count in groups]
+
+
+def exclude_values(query, field, values):
+    """Запрос без перечисленных значений фасета (срез-остаток)"""
+    if not values:
+        return query
+    listed = ' OR '.join(json.dumps(value, ensure_ascii=False) for value in values)
+    return f'({query}) NOT {field}:({listed})'
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class EuropeanaHarvester:
+    """Выгрузка запроса Europeana параллельными срезами с курсором"""
+
+    def __init__(self, api_key, output_dir, profile='standard', rows=MAX_ROWS,
+                 workers=DEFAULT_WORKERS, max_slice=DEFAULT_MAX_SLICE, fetch=None):
+        """
+        Args:
+            api_key (str): Ключ wskey
+            output_dir (str): Каталог для срезов и harvest.json
+            profile (str): Профиль записей ('minimal', 'standard', 'rich')
+            rows (int): Записей на страницу (не больше 100)
+            workers (int): Срезов, выгружаемых одновременно
+            max_slice (int): Срез больше этого делится по следующему фасету
+            fetch (callable): fetch(url, params) -> dict или None (по умолчанию make_fetch)
+        """
+        self.api_key = api_key
+        self.output_dir = output_dir
+        self.profile = profile
+        self.rows = min(rows, MAX_ROWS)
+        self.workers = workers
+        self.max_slice = max_slice
+        self.fetch = fetch or make_fetch(provider='europeana', credential=api_key)
+        self.state_path = os.path.join(output_dir, STATE_FILE)
+        self.state = None
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.seen = set()
+        self.written = 0
+
+    # Планирование срезов
+
+    def _facet(self, query, qf, field):
+        params = {
+            'wskey': self.api_key, 'query': query, 'qf': list(qf), 'rows': 0,
+            'profile': 'facets', 'facet': field, f'f.{field}.facet.limit': FACET_LIMIT
+        }
+        page = self.fetch(SEARCH_URL, params)
+        if page is None:
+            return None
+        for facet in page.get('facets', []):
+            if facet.get('name') == field:
+                return page.get('totalResults', 0), [(f['label'], f['count']) for f in facet.get('fields', [])]
+        return page.get('totalResults', 0), []
+
+    def _split(self, query, qf, total, fields, slices):
+        if total == 0:
+            return True
+        if total <= self.max_slice or not fields:
+            slices.append({'query': query, 'qf': qf, 'expected': total})
+            return True
+        field, rest = fields[0], fields[1:]
+        result = self._facet(query, qf, field)
+        if result is None:
+            return False
+        total, values = result
+        if not values:
+            return self._split(query, qf, total, rest, slices)
+
+        for labels, count in pack_values(values, self.max_slice):
+            if not self._split(query, qf + [facet_filter(field, labels)], count, rest, slices):
+                return False
+        # Записи без значения фасета или со значением вне списка
+        remainder = exclude_values(query, field, [label for label, _ in values])
+        counted = self._facet(remainder, qf, field)
+        if counted is None:
+            return False
+        return self._split(remainder, qf, counted[0], rest, slices)
+
+    def plan(self, query, qf=()):
+        """
+        Разбить запрос на срезы
+
+        Returns:
+            list: Срезы {'query', 'qf', 'expected'} или None при ошибке запроса
+        """
+        result = self._facet(query, list(qf), FACET_FIELDS[0])
+        if result is None:
+            return None
+        slices = []
+        if not self._split(query, list(qf), result[0], FACET_FIELDS, slices):
+            return None
+        return slices
+
+    # Состояние
+
+    def _save(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def _load(self, query, qf, restart):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if restart and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state['query'] != query or state['qf'] != list(qf) or state['profile'] != self.profile:
+                print(f"В {self.output_dir} уже выгружается другой запрос ({state['query']!r}); "
+                      f"укажите другой каталог или --restart")
+                return False
+            self.state = state
+            return True
+
+        print(f"Планирование срезов для {query!r}...")
+        slices = self.plan(query, qf)
+        if slices is None:
+            print("Не удалось разбить запрос на срезы")
+            return False
+        self.state = {
+            'query': query, 'qf': list(qf), 'profile': self.profile,
+            'slices': {
+                f"slice_{i:04d}": {**slice_, 'cursor': '*', 'bytes': 0, 'records': 0,
+                                   'duplicates': 0, 'done': False}
+                for i, slice_ in enumerate(slices)
+            }
+        }
+        self._save()
+        return True
+
+    def _slice_path(self, name):
+        return os.path.join(self.output_dir, f"{name}.jsonl.gz")
+
+    def _restore_seen(self):
+        # ID уже записанных записей: повторы из пересекающихся срезов YEAR не пишутся
+        for name, slice_ in self.state['slices'].items():
+            path = self._slice_path(name)
+            if not slice_['bytes'] or not os.path.exists(path):
+                continue
+            with open(path, 'r+b') as f:
+                f.truncate(slice_['bytes'])
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    self.seen.add(json.loads(line).get('id'))
+            self.written += slice_['records']
+
+    # Выгрузка
+
+    def _harvest_slice(self, name):
+        if self.stop.is_set():
+            return False
+        with self.lock:
+            slice_ = self.state['slices'][name]
+            if slice_['done']:
+                return True
+            params = {'wskey': self.api_key, 'query': slice_['query'], 'qf': slice_['qf'],
+                      'rows': self.rows, 'profile': self.profile, 'cursor': slice_['cursor']}
+
+        path = self._slice_path(name)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as out:
+            out.truncate(slice_['bytes'])
+            out.seek(0, os.SEEK_END)
+            pager = Pager(self.fetch, SEARCH_URL, params, items_at('items'),
+                          cursor_strategy('cursor', lambda page: page.get('nextCursor')),
+                          name=f'europeana-{name}')
+            for _, items in pager.pages():
+                with self.lock:
+                    fresh = [item for item in items if item.get('id') not in self.seen]
+                    self.seen.update(item.get('id') for item in fresh)
+                if fresh:
+                    lines = ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in fresh)
+                    out.write(gzip.compress(lines.encode('utf-8')))
+                    out.flush()
+                    os.fsync(out.fileno())
+                with self.lock:
+                    following = pager.next_page
+                    slice_['bytes'] = out.tell()
+                    slice_['records'] += len(fresh)
+                    slice_['duplicates'] += len(items) - len(fresh)
+                    slice_['cursor'] = following[1]['cursor'] if following else None
+                    slice_['done'] = following is None
+                    self.written += len(fresh)
+                    self._save()
+                if self.stop.is_set():
+                    return False
+        if not slice_['done']:
+            print(f"Срез {name} не завершен (ошибка запроса), будет продолжен при следующем запуске")
+        return slice_['done']
+
+    def _report(self, started, start_written):
+        elapsed = time.monotonic() - started
+        rate = (self.written - start_written) / elapsed if elapsed > 0 else 0.0
+        slices = self.state['slices'].values()
+        expected = sum(slice_['expected'] for slice_ in slices)
+        done = sum(1 for slice_ in slices if slice_['done'])
+        line = (f"записей {self.written}/~{expected} | срезов {done}/{len(self.state['slices'])} | "
+                f"{rate:.0f} записей/с")
+        if rate > 0 and expected > self.written:
+            line += f" | осталось ~{format_duration((expected - self.written) / rate)}"
+        print(line, flush=True)
+
+    def run(self, query, qf=(), restart=False):
+        """
+        Выгрузить запрос (или продолжить прерванную выгрузку)
+
+        Args:
+            query (str): Поисковый запрос Europeana
+            qf (list): Дополнительные фильтры qf для всего запроса
+            restart (bool): Начать заново, игнорируя сохраненное состояние
+
+        Returns:
+            dict: {'records', 'slices', 'complete'} или None, если выгрузку не удалось начать
+        """
+        if not self._load(query, qf, restart):
+            return None
+        self._restore_seen()
+        pending = [name for name, slice_ in self.state['slices'].items() if not slice_['done']]
+        print(f"Срезов: {len(self.state['slices'])}, осталось: {len(pending)}, "
+              f"уже записано: {self.written}")
+
+        started = time.monotonic()
+        start_written = self.written
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        futures = [pool.submit(self._harvest_slice, name) for name in pending]
+        try:
+            while not all(future.done() for future in futures):
+                time.sleep(0.2)
+                if time.monotonic() - started >= PROGRESS_EVERY_SECONDS:
+                    self._report(started, start_written)
+                    started, start_written = time.monotonic(), self.written
+        except KeyboardInterrupt:
+            # Срезы дописывают текущую страницу и сохраняют курсор
+            self.stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            print(f"\nОстановлено, записано {self.written}; повторите команду, чтобы продолжить")
+            raise
+        pool.shutdown(wait=True)
+
+        complete = all(slice_['done'] for slice_ in self.state['slices'].values())
+        return {'records': self.written, 'slices': len(self.state['slices']), 'complete': complete}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Полная выгрузка результатов поиска Europeana")
+    parser.add_argument('query', help="Поисковый запрос ('*' — все записи)")
+    parser.add_argument('output_dir', help="Каталог для срезов .jsonl.gz и harvest.json")
+    parser.add_argument('--wskey', default=os.environ.get('EUROPEANA_API_KEY'),
+                        help="Ключ API (по умолчанию EUROPEANA_API_KEY)")
+    parser.add_argument('--qf', action='append', default=[], help="Дополнительный фильтр, например TYPE:IMAGE")
+    parser.add_argument('--profile', default='standard', help="Профиль записей")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Параллельных срезов")
+    parser.add_argument('--max-slice', type=int, default=DEFAULT_MAX_SLICE,
+                        help="Максимум записей в срезе до деления по фасетам")
+    parser.add_argument('--restart', action='store_true', help="Начать заново")
+    args = parser.parse_args(argv)
+
+    if not args.wskey:
+        print("Нужен ключ API: --wskey или EUROPEANA_API_KEY")
+        return 2
+    harvester = EuropeanaHarvester(args.wskey, args.output_dir, args.profile,
+                                   workers=args.workers, max_slice=args.max_slice)
+    try:
+        result = harvester.run(args.query, args.qf, args.restart)
+    except KeyboardInterrupt:
+        return 130
+    if result is None:
+        return 1
+    print(f"Готово: {json.dumps(result, ensure_ascii=False)}")
+    return 0 if result['complete'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
 import requests
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import europeana_search
 
 # Попробуем сделать тестовый запрос к API Europeana
 # Базовый URL для Search API
@@ -73,3 +78,26 @@ except json.JSONDecodeError as e:
 except Exception as e:
     print(f"Неожиданная ошибка: {e}")
 
+def walk_search(api_key, query, max_items=None):
+    """
+    Обход всех результатов поиска с курсором (cursor=*, затем nextCursor)
+
+    В отличие от start курсор не ограничен глубиной start + rows <= 1000,
+    а элементы не накапливаются в памяти — считаются только поставщики.
+    """
+    items = europeana_search(api_key, query=query, profile='minimal', max_items=max_items)
+    providers = {}
+    for item in items:
+        provider = (item.get('dataProvider') or ['N/A'])[0]
+        providers[provider] = providers.get(provider, 0) + 1
+    print(f"Элементов: {items.stats['items']}, страниц: {items.stats['pages']}"
+          f"{'' if items.complete else ' — неполная выборка: ошибка загрузки страницы'}")
+    for provider, count in sorted(providers.items(), key=lambda entry: -entry[1])[:5]:
+        print(f"  - {provider}: {count}")
+    return providers if items.complete else None
+
+
+# Обход с курсором — только с ключом API (как у europeana_harvest.py)
+if os.environ.get('EUROPEANA_API_KEY'):
+    print("\nОбход результатов поиска с курсором")
+    walk_search(os.environ['EUROPEANA_API_KEY'], 'Van Gogh', max_items=500)
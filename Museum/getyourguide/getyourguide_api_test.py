@@ -7,6 +7,12 @@
 import requests
 import json
 from typing import Dict, Any, Optional
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.pagination import Pager, make_fetch, items_at, offset_strategy
 
 class GetYourGuideAPI:
     """Класс для работы с API GetYourGuide"""
@@ -26,6 +32,7 @@ class GetYourGuideAPI:
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         }
+        self.session = get_session()
     
     def get_categories(self, 
                       version: str = "1",
@@ -55,7 +62,7 @@ class GetYourGuideAPI:
         }
         
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self.session.get(url, headers=self.headers, params=params)
             
             result = {
                 'status_code': response.status_code,
@@ -109,7 +116,7 @@ class GetYourGuideAPI:
         }
         
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self.session.get(url, headers=self.headers, params=params)
             
             result = {
                 'status_code': response.status_code,
@@ -131,6 +138,37 @@ class GetYourGuideAPI:
                 'status_code': None
             }
 
+    def iter_tours(self,
+                   version: str = "1",
+                   language: str = "en",
+                   currency: str = "USD",
+                   limit: int = 100,
+                   max_items: Optional[int] = None,
+                   **kwargs) -> Pager:
+        """
+        Все туры по запросу, страница за страницей (limit/offset)
+        
+        Следующая страница загружается в фоне, пока обрабатывается текущая;
+        в памяти хранятся только две-три страницы.
+        
+        Args:
+            version: Версия API
+            language: Язык ответа
+            currency: Валюта
+            limit: Размер страницы
+            max_items: Максимум туров (None — все)
+            **kwargs: Дополнительные параметры поиска
+            
+        Returns:
+            Итератор туров (Pager)
+        """
+        return Pager(make_fetch(self.headers, provider='getyourguide', session=self.session),
+                     f"{self.base_url}/{version}/tours",
+                     {'cnt_language': language, 'currency': currency, 'limit': limit, 'offset': 0, **kwargs},
+                     items_at('data.tours'),
+                     offset_strategy('offset', 'limit'),
+                     max_items=max_items, name='getyourguide')
+
 def test_api_without_token():
     """Тестирование API без токена (демонстрация ошибки аутентификации)"""
     print("=== Тест без API токена ===")
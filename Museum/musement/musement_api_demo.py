@@ -7,6 +7,14 @@
 import requests
 import json
 from datetime import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.auth import get_token_manager
+from common.hydrate import DetailCache, DetailHydrator
+from common.pagination import Pager, make_fetch, items_at, dig, offset_strategy
 
 class MusementAPIClient:
     def __init__(self, base_url, application_value, client_id, client_secret):
@@ -16,6 +24,9 @@ class MusementAPIClient:
         self.client_secret = client_secret
         self.access_token = None
         self.token_expires_at = None
+        self.session = get_session()
+        # Активности, уже полученные этим клиентом
+        self.activity_cache = DetailCache()
     
     def get_headers(self, include_auth=True):
         """Получить стандартные заголовки для запросов"""
@@ -30,8 +41,8 @@ class MusementAPIClient:
             
         return headers
     
-    def authenticate(self):
-        """Получить access token через OAuth 2.0"""
+    def _request_token(self):
+        """Запросить новый access token через OAuth 2.0"""
         url = f"{self.base_url}/login"
         
         payload = {
@@ -45,36 +56,47 @@ class MusementAPIClient:
         try:
             print(f"Отправляем запрос аутентификации на: {url}")
             print(f"Заголовки: {json.dumps(headers, indent=2)}")
-            print(f"Payload: {json.dumps(payload, indent=2)}")
             
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.session.post(url, json=payload, headers=headers)
             
             print(f"Статус ответа: {response.status_code}")
             print(f"Заголовки ответа: {dict(response.headers)}")
             
             if response.status_code == 200:
                 data = response.json()
-                self.access_token = data.get('access_token')
-                expires_in = data.get('expires_in', 3600)
-                
-                # Вычисляем время истечения токена
-                from datetime import datetime, timedelta
-                self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-                
-                print(f"Аутентификация успешна!")
-                print(f"Access token получен (истекает в {self.token_expires_at})")
-                return True
+                print(f"Аутентификация успешна! Токен действует {data.get('expires_in', 3600)} секунд")
+                return {
+                    'access_token': data.get('access_token'),
+                    'expires_in': data.get('expires_in', 3600)
+                }
             else:
                 print(f"Ошибка аутентификации: {response.text}")
-                return False
+                return None
                 
         except requests.RequestException as e:
             print(f"Ошибка при выполнении запроса: {e}")
+            return None
+    
+    def authenticate(self):
+        """Получить access token из общего кэша токенов (запрос к /login только при необходимости)"""
+        credentials = {
+            "base_url": self.base_url,
+            "application": self.application_value,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+        manager = get_token_manager()
+        self.access_token = manager.get_token("musement", credentials, self._request_token)
+        if not self.access_token:
             return False
+        
+        # Время истечения токена
+        self.token_expires_at = datetime.fromtimestamp(manager.expires_at("musement", credentials))
+        return True
     
     def search_activities(self, **params):
         """Поиск активностей"""
-        if not self.access_token:
+        if not self.authenticate():
             print("Необходимо сначала выполнить аутентификацию")
             return None
             
@@ -85,7 +107,7 @@ class MusementAPIClient:
             print(f"Отправляем запрос поиска активностей: {url}")
             print(f"Параметры: {params}")
             
-            response = requests.get(url, headers=headers, params=params)
+            response = self.session.get(url, headers=headers, params=params)
             
             print(f"Статус ответа: {response.status_code}")
             
@@ -101,9 +123,28 @@ class MusementAPIClient:
             print(f"Ошибка при выполнении запроса: {e}")
             return None
     
+    def iter_activities(self, limit=100, max_items=None, **params):
+        """
+        Все активности по запросу, страница за страницей (limit/offset, meta.count)
+        
+        Returns:
+            Pager: Итератор активностей (None, если аутентификация не удалась)
+        """
+        if not self.authenticate():
+            print("Необходимо сначала выполнить аутентификацию")
+            return None
+        
+        return Pager(make_fetch(self.get_headers(), provider='musement', credential=self.client_id,
+                                session=self.session),
+                     f"{self.base_url}/activities",
+                     {'limit': limit, 'offset': 0, **params},
+                     items_at('data'),
+                     offset_strategy('offset', 'limit', total=lambda page: dig(page, 'meta.count')),
+                     max_items=max_items, name='musement')
+    
     def get_activity(self, activity_uuid):
         """Получить информацию об активности"""
-        if not self.access_token:
+        if not self.authenticate():
             print("Необходимо сначала выполнить аутентификацию")
             return None
             
@@ -113,7 +154,7 @@ class MusementAPIClient:
         try:
             print(f"Получаем информацию об активности: {url}")
             
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers)
             
             print(f"Статус ответа: {response.status_code}")
             
@@ -129,6 +170,23 @@ class MusementAPIClient:
             print(f"Ошибка при выполнении запроса: {e}")
             return None
 
+    def get_activities(self, activity_uuids, max_workers=6):
+        """
+        Информация о нескольких активностях параллельно
+        
+        Повторы убираются, уже полученные активности берутся из кэша.
+        
+        Returns:
+            dict: {uuid: активность}; активности, которые не удалось получить, пропускаются
+        """
+        if not self.authenticate():
+            print("Необходимо сначала выполнить аутентификацию")
+            return {}
+        
+        hydrator = DetailHydrator(fetch_one=self.get_activity, max_workers=max_workers,
+                                  cache=self.activity_cache, name="активности")
+        return hydrator.hydrate(activity_uuids)
+
 def demo_api_usage():
     """Демонстрация использования API"""
     print("=== ДЕМОНСТРАЦИЯ API MUSEMENT ===\n")
@@ -215,6 +273,8 @@ def demo_api_usage():
     
     print("Структура запроса информации об активности:")
     print(json.dumps(activity_request_example, indent=2))
+    print("Для всех найденных активностей сразу (параллельно, с кэшем):")
+    print("    client.get_activities([activity['uuid'] for activity in search_result['data']])")
     
     print("\n=== РЕЗУЛЬТАТ ДЕМОНСТРАЦИИ ===")
     print("Демонстрационный скрипт показал структуру запросов к API Musement.")
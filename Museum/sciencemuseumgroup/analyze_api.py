@@ -1,8 +1,19 @@
 import requests
 import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.projection import Projection, response_json, loads
+from common.schema import SchemaCache, describe
+from common.transport import get_session
 
 print("=== Детальный анализ API Science Museum Group ===\n")
 
+# Схемы ответов накапливаются между запусками
+SCHEMAS = SchemaCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'smg_schemas.json'))
+
 # Теперь проанализируем найденные рабочие endpoints более подробно
 def analyze_api_response(url, description):
     print(f"=== {description} ===")
@@ -19,18 +30,11 @@ def analyze_api_response(url, description):
             print(f"Content-Type: {response.headers.get('content-type')}")
             print(f"Размер ответа: {len(response.text)} символов")
             
-            # Анализируем структуру
+            # Структура ответа — из схемы эндпоинта, слитой со всеми прошлыми ответами
             print(f"\nСтруктура ответа:")
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    if isinstance(value, list):
-                        print(f"  {key}: список из {len(value)} элементов")
-                        if value and isinstance(value[0], dict):
-                            print(f"    Ключи первого элемента: {list(value[0].keys())[:5]}...")
-                    elif isinstance(value, dict):
-                        print(f"  {key}: словарь с ключами {list(value.keys())[:5]}...")
-                    else:
-                        print(f"  {key}: {type(value).__name__} = {str(value)[:50]}...")
+            schema = SCHEMAS.observe(description, data)
+            for line in describe(schema, max_depth=2):
+                print(f"  {line}")
             
             # Сохраняем полный ответ в файл для анализа
             filename = f"/home/ubuntu/api_response_{description.lower().replace(' ', '_')}.json"
@@ -120,5 +124,61 @@ for key, data in responses.items():
     else:
         print(f"\n✗ {key.replace('_', ' ').title()}: ошибка")
 
+SCHEMAS.save()
 print(f"\nВсе ответы сохранены в файлы /home/ubuntu/api_response_*.json для детального изучения.")
+print(f"Схемы ответов: {SCHEMAS.path}")
+
+
+
+# Массовый обход объектов: из ответа ~50 КБ нужны несколько полей,
+# поэтому в памяти держим только проекцию
+OBJECT_SUMMARY_FIELDS = Projection([
+    'data.id',
+    'data.attributes.title.value',
+    'data.attributes.identifier.value',
+    'data.attributes.category.name',
+    'data.attributes.creation.date.value',
+    'data.attributes.description.value',
+])
+
+
+def scan_objects(object_ids, fields=OBJECT_SUMMARY_FIELDS):
+    """
+    Загрузить объекты и оставить только нужные поля
+
+    Args:
+        object_ids (list): ID объектов ('co62245', ...)
+        fields (Projection): Поля, которые сохраняются из каждого ответа
+
+    Returns:
+        dict: {id: проекция объекта}
+    """
+    session = get_session()
+    headers = {'Accept': 'application/json', 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+    objects = {}
+    for object_id in object_ids:
+        try:
+            response = session.get(f"https://collection.sciencemuseumgroup.org.uk/objects/{object_id}", headers=headers)
+            if response.status_code == 200:
+                objects[object_id] = response_json(response, fields)
+            else:
+                print(f"Ошибка {response.status_code} для {object_id}")
+        except requests.exceptions.RequestException as e:
+            print(f"Ошибка для {object_id}: {e}")
+    return objects
+
 
+saved = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_response_конкретный_объект_co62245.json')
+if os.path.exists(saved):
+    with open(saved, 'rb') as f:
+        raw = f.read()
+    started = time.perf_counter()
+    for _ in range(100):
+        json.loads(raw)
+    full_ms = (time.perf_counter() - started) * 10
+    started = time.perf_counter()
+    for _ in range(100):
+        summary = loads(raw, OBJECT_SUMMARY_FIELDS)
+    projected_ms = (time.perf_counter() - started) * 10
+    print(f"\nРазбор co62245 ({len(raw)} байт): целиком {full_ms:.2f} мс, с проекцией {projected_ms:.2f} мс; "
+          f"проекция {len(json.dumps(summary, ensure_ascii=False))} символов")
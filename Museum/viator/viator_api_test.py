@@ -6,8 +6,11 @@
 
 import requests
 import json
+import time
 from datetime import datetime
 
+from viator_catalog import ViatorCatalog, ViatorSync
+
 # Конфигурация API
 SANDBOX_BASE_URL = "https://api.sandbox.viator.com/partner"
 DEMO_API_KEY = "bcac8986-4c33-4fa0-ad3f-75409487026c"  # Демонстрационный ключ из документации
@@ -127,10 +130,35 @@ def test_modified_since_endpoint():
     except requests.exceptions.RequestException as e:
         print(f"❌ Ошибка при выполнении запроса: {e}")
 
+def test_local_catalog(max_pages=2):
+    """
+    Синхронизирует локальный каталог через /products/modified-since
+    и читает PRODUCT_CODE из него
+    """
+    print("\n" + "="*50)
+    print("=== Локальный каталог продуктов ===")
+    
+    catalog = ViatorCatalog("viator_catalog.sqlite")
+    syncer = ViatorSync(DEMO_API_KEY, catalog, SANDBOX_BASE_URL)
+    
+    result = syncer.sync(max_pages=max_pages)
+    print(f"Синхронизация: {result}")
+    print(f"Каталог: {catalog.stats()}")
+    
+    started = time.perf_counter()
+    product = syncer.get_product(PRODUCT_CODE)
+    elapsed = (time.perf_counter() - started) * 1000
+    if product:
+        print(f"{PRODUCT_CODE}: {product.get('title', 'N/A')} ({elapsed:.2f} мс)")
+    else:
+        print(f"{PRODUCT_CODE}: не найден")
+    catalog.close()
+
 if __name__ == "__main__":
     # Тестируем оба эндпоинта
     response1 = test_product_endpoint()
     test_modified_since_endpoint()
+    test_local_catalog()
     
     print("\n" + "="*50)
     print("=== Заключение ===")
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Локальный каталог продуктов Viator с синхронизацией через modified-since
+
+Первый запуск загружает весь каталог: /products/modified-since без курсора
+отдает продукты с начала, страницами до count=500, и nextCursor для
+продолжения. Дальше синхронизация идет от сохраненного курсора и получает
+только изменения: активные продукты перезаписываются, продукты со статусом
+INACTIVE удаляются.
+
+Страница и курсор после нее сохраняются в одной транзакции SQLite: после
+сбоя синхронизация продолжается с первой неприменённой страницы.
+Детали продукта читаются из локальной базы (get_product); продукт, которого
+еще нет в каталоге, запрашивается через /products/{code} и сохраняется.
+
+Запуск:
+    python viator_catalog.py --api-key КЛЮЧ            # одна синхронизация
+    python viator_catalog.py --api-key КЛЮЧ --watch 900
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.ratelimit import get_rate_limiter
+from common.transport import get_session
+
+SANDBOX_BASE_URL = "https://api.sandbox.viator.com/partner"
+DEFAULT_DB_PATH = "viator_catalog.sqlite"
+# Максимум продуктов на страницу modified-since
+PAGE_SIZE = 500
+DEFAULT_SYNC_INTERVAL = 900
+
+
+class ViatorCatalog:
+    """Продукты Viator в SQLite и курсор синхронизации"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        """
+        Args:
+            path (str): Файл SQLite (':memory:' — в памяти)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                code TEXT PRIMARY KEY,
+                title TEXT,
+                last_modified TEXT,
+                synced_at REAL,
+                payload TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def apply_page(self, products, cursor):
+        """
+        Применить страницу изменений и сохранить курсор после нее
+
+        Args:
+            products (list): Продукты из ответа modified-since
+            cursor (str): nextCursor ответа (None — не менять)
+
+        Returns:
+            tuple: (перезаписано, удалено)
+        """
+        now = time.time()
+        upserts, deletes = [], []
+        for product in products:
+            code = product.get('productCode')
+            if not code:
+                continue
+            if product.get('status') == 'INACTIVE':
+                deletes.append((code,))
+            else:
+                upserts.append((code, product.get('title'), product.get('lastModifiedAt') or product.get('lastUpdatedAt'),
+                                now, json.dumps(product, ensure_ascii=False, separators=(',', ':'))))
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?)", upserts)
+            self.conn.executemany("DELETE FROM products WHERE code = ?", deletes)
+            if cursor:
+                self.conn.execute("INSERT OR REPLACE INTO sync_state VALUES ('cursor', ?)", (cursor,))
+            self.conn.execute("INSERT OR REPLACE INTO sync_state VALUES ('synced_at', ?)", (str(now),))
+        return len(upserts), len(deletes)
+
+    def put(self, product):
+        """Сохранить один продукт (ответ /products/{code})"""
+        self.apply_page([product], None)
+
+    def get(self, code):
+        """Продукт по коду или None"""
+        with self.lock:
+            row = self.conn.execute("SELECT payload FROM products WHERE code = ?", (code,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def state(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self):
+        """Количество продуктов, курсор и время последней синхронизации"""
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+            state = dict(self.conn.execute("SELECT key, value FROM sync_state"))
+        synced_at = float(state['synced_at']) if 'synced_at' in state else None
+        return {
+            'products': count,
+            'cursor': state.get('cursor'),
+            'age': time.time() - synced_at if synced_at else None
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class ViatorSync:
+    """Синхронизация ViatorCatalog с /products/modified-since"""
+
+    def __init__(self, api_key, catalog, base_url=SANDBOX_BASE_URL, language="en-US", page_size=PAGE_SIZE):
+        """
+        Args:
+            api_key (str): Ключ exp-api-key
+            catalog (ViatorCatalog): Локальный каталог
+            base_url (str): Базовый URL Partner API (sandbox или production)
+            language (str): Accept-Language
+            page_size (int): Продуктов на страницу (не больше 500)
+        """
+        self.api_key = api_key
+        self.catalog = catalog
+        self.base_url = base_url.rstrip('/')
+        self.page_size = min(page_size, PAGE_SIZE)
+        self.headers = {
+            "exp-api-key": api_key,
+            "Accept-Language": language,
+            "Accept": "application/json;version=2.0"
+        }
+        self.session = get_session()
+        self.rate_limiter = get_rate_limiter()
+        self.sync_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _get(self, path, params=None):
+        self.rate_limiter.acquire('viator', self.api_key)
+        try:
+            response = self.session.get(f"{self.base_url}{path}", headers=self.headers, params=params)
+            self.rate_limiter.report_response('viator', self.api_key, response)
+            if response.status_code == 200:
+                return response.json()
+            print(f"Ошибка Viator {path}: {response.status_code} {response.text[:200]}")
+        except requests.exceptions.RequestException as e:
+            print(f"Ошибка подключения к Viator {path}: {e}")
+        return None
+
+    def sync(self, max_pages=None):
+        """
+        Применить все изменения с сохраненного курсора
+
+        Args:
+            max_pages (int): Максимум страниц за вызов (None — до конца изменений)
+
+        Returns:
+            dict: {'pages', 'upserted', 'deleted', 'complete'}; complete=False —
+                запрос не удался или достигнут max_pages, продолжение с курсора
+        """
+        result = {'pages': 0, 'upserted': 0, 'deleted': 0, 'complete': False}
+        with self.sync_lock:
+            while max_pages is None or result['pages'] < max_pages:
+                cursor = self.catalog.state('cursor')
+                params = {'count': self.page_size}
+                if cursor:
+                    params['cursor'] = cursor
+                page = self._get("/products/modified-since", params)
+                if page is None:
+                    return result
+                products = page.get('products', [])
+                next_cursor = page.get('nextCursor')
+                upserted, deleted = self.catalog.apply_page(products, next_cursor)
+                result['pages'] += 1
+                result['upserted'] += upserted
+                result['deleted'] += deleted
+                # Пустая страница или тот же курсор — изменений больше нет
+                if not products or not next_cursor or next_cursor == cursor:
+                    result['complete'] = True
+                    return result
+                if self.stop_event.is_set():
+                    return result
+        return result
+
+    def get_product(self, code, fetch_missing=True):
+        """
+        Детали продукта из локального каталога
+
+        Args:
+            code (str): Код продукта ('5010SYDNEY')
+            fetch_missing (bool): Запросить /products/{code}, если продукта нет в каталоге
+
+        Returns:
+            dict: Продукт или None
+        """
+        product = self.catalog.get(code)
+        if product is None and fetch_missing:
+            product = self._get(f"/products/{code}")
+            if product is not None and product.get('status') != 'INACTIVE':
+                self.catalog.put(product)
+        return product
+
+    def start_background_sync(self, interval=DEFAULT_SYNC_INTERVAL):
+        """
+        Запустить фоновый поток: синхронизация сразу и затем раз в interval секунд
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+
+        def run():
+            while True:
+                result = self.sync()
+                if result['upserted'] or result['deleted']:
+                    print(f"Синхронизация Viator: {result}")
+                if self.stop_event.wait(interval):
+                    return
+
+        self.thread = threading.Thread(target=run, name='viator-sync', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Остановить фоновую синхронизацию (текущая страница дописывается)"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Синхронизация локального каталога Viator")
+    parser.add_argument('--api-key', default=os.environ.get('VIATOR_API_KEY'), help="Ключ exp-api-key")
+    parser.add_argument('--base-url', default=SANDBOX_BASE_URL)
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Файл SQLite")
+    parser.add_argument('--watch', type=int, help="Синхронизировать раз в N секунд до Ctrl+C")
+    parser.add_argument('--product', help="Показать продукт из каталога после синхронизации")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        print("Нужен ключ API: --api-key или VIATOR_API_KEY")
+        return 2
+    catalog = ViatorCatalog(args.db)
+    syncer = ViatorSync(args.api_key, catalog, args.base_url)
+
+    if args.watch:
+        syncer.start_background_sync(args.watch)
+        try:
+            while True:
+                time.sleep(60)
+                print(f"Каталог: {catalog.stats()}")
+        except KeyboardInterrupt:
+            syncer.stop()
+    else:
+        started = time.monotonic()
+        result = syncer.sync()
+        print(f"Синхронизация: {result} за {time.monotonic() - started:.1f} с; каталог: {catalog.stats()}")
+
+    if args.product:
+        started = time.perf_counter()
+        product = syncer.get_product(args.product)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{args.product}: {product.get('title') if product else 'не найден'} ({elapsed:.2f} мс)")
+    catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
 import requests
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import twogis_items
 
 # Тестовый запрос к API 2GIS Places
 # Попробуем сделать запрос без ключа, чтобы увидеть структуру ошибки
@@ -85,6 +90,15 @@ def test_with_demo_key():
         except requests.exceptions.RequestException as e:
             print(f"Ошибка запроса: {e}")
 
+def list_all_items(api_key, query, location, page_size=10):
+    """Все найденные объекты постранично (page/page_size, result.total)"""
+    items = twogis_items(api_key, page_size=page_size, q=query, location=location, type='branch')
+    for item in items:
+        print(f"- {item.get('name')}: {item.get('address_name', 'N/A')}")
+    print(f"Объектов: {items.stats['items']}, страниц: {items.stats['pages']}"
+          f"{'' if items.complete else ' — неполная выборка: ошибка загрузки страницы'}")
+    return {**items.stats, 'complete': items.complete}
+
 def test_different_endpoints():
     """Тестируем разные эндпоинты API"""
     endpoints = [
@@ -14,6 +14,12 @@ import requests
 import json
 import os
 from typing import Dict, List, Optional
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.ratelimit import get_rate_limiter
+from common.hydrate import DetailCache, DetailHydrator
 
 class FoursquareAPI:
     """Класс для работы с Foursquare Places API"""
@@ -31,6 +37,24 @@ class FoursquareAPI:
             "Accept": "application/json",
             "Authorization": api_key
         }
+        self.session = get_session()
+        self.rate_limiter = get_rate_limiter()
+        # Детали и фотографии мест, уже полученные этим клиентом
+        self.details_cache = DetailCache()
+        self.photos_cache = DetailCache()
+    
+    def _get(self, url: str, params: Dict) -> Dict:
+        """
+        GET-запрос с учетом квоты ключа
+        
+        Квота общая для всех потоков и процессов с этим ключом; ответ 429
+        приостанавливает их всех на время из Retry-After.
+        """
+        self.rate_limiter.acquire("foursquare", self.api_key)
+        response = self.session.get(url, headers=self.headers, params=params)
+        self.rate_limiter.report_response("foursquare", self.api_key, response)
+        response.raise_for_status()
+        return response.json()
     
     def search_places(self, 
                      query: str = None,
@@ -69,9 +93,7 @@ class FoursquareAPI:
         if limit:
             params["limit"] = limit
             
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url, params)
     
     def get_place_details(self, fsq_id: str, fields: str = None) -> Dict:
         """
@@ -90,9 +112,7 @@ class FoursquareAPI:
         if fields:
             params["fields"] = fields
             
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url, params)
     
     def get_place_photos(self, fsq_id: str, limit: int = 5) -> Dict:
         """
@@ -109,9 +129,42 @@ class FoursquareAPI:
         
         params = {"limit": limit}
         
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url, params)
+    
+    def get_places_details(self, fsq_ids: List[str], fields: str = None,
+                           with_photos: bool = False, max_workers: int = 8) -> Dict[str, Dict]:
+        """
+        Детали (и фотографии) для списка мест параллельно
+        
+        Повторяющиеся ID запрашиваются один раз, уже загруженные берутся из кэша
+        клиента. Квота ключа соблюдается в _get для каждого запроса.
+        
+        Args:
+            fsq_ids: ID мест, например из search_places
+            fields: Список полей через запятую
+            with_photos: Добавить фотографии в ключ 'photos'
+            max_workers: Максимум одновременных запросов
+            
+        Returns:
+            Словарь {fsq_id: детали}; места, которые не удалось загрузить, пропускаются
+        """
+        details = DetailHydrator(
+            fetch_one=lambda fsq_id: self.get_place_details(fsq_id, fields),
+            max_workers=max_workers,
+            # Набор полей влияет на ответ, поэтому кэш только для полных деталей
+            cache=self.details_cache if fields is None else None,
+            name="деталей места"
+        ).hydrate(fsq_ids)
+        
+        if with_photos:
+            photos = DetailHydrator(
+                fetch_one=self.get_place_photos, max_workers=max_workers,
+                cache=self.photos_cache, name="фотографий места"
+            ).hydrate(details)
+            for fsq_id, place in details.items():
+                place["photos"] = photos.get(fsq_id, [])
+        
+        return details
     
     def autocomplete(self, text: str, ll: str = None, radius: int = 1000) -> Dict:
         """
@@ -133,9 +186,7 @@ class FoursquareAPI:
         if radius:
             params["radius"] = radius
             
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url, params)
 
 def print_places(places_data: Dict):
     """Красивый вывод информации о местах"""
@@ -252,6 +303,14 @@ def main():
                 print(f"   Телефон: {details.get('tel', 'Не указан')}")
                 print(f"   Сайт: {details.get('website', 'Не указан')}")
         
+        # Пример 5: Детали и фото всех найденных кофеен одним параллельным шагом
+        fsq_ids = [place.get("fsq_id") for place in coffee_results.get("results", [])]
+        if fsq_ids:
+            print("\n5. Детали и фотографии всех кофеен:")
+            all_details = client.get_places_details(fsq_ids, with_photos=True)
+            for fsq_id, place in all_details.items():
+                print(f"   {place.get('name', fsq_id)}: фото {len(place.get('photos', []))}")
+        
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 401:
             print("❌ Ошибка авторизации: проверьте API ключ")
@@ -7,6 +7,13 @@
 import requests
 import json
 from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
+from common.auth import get_token_manager
+from common.pagination import Pager, items_at, cursor_strategy, dig
 
 class SevenRoomsAPI:
     """
@@ -28,13 +35,22 @@ class SevenRoomsAPI:
         self.client_secret = client_secret
         self.venue_group_id = venue_group_id
         self.access_token = None
+        self.session = get_session()
         
-    def authenticate(self):
+    def _token_credentials(self):
+        """Учетные данные, по которым токен хранится в общем кэше"""
+        return {
+            "base_url": self.base_url,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+    
+    def _request_token(self):
         """
-        Выполняет аутентификацию и получает токен доступа
+        Запрашивает новый токен доступа
         
         Returns:
-            bool: True если аутентификация успешна, False иначе
+            dict: Ответ сервера авторизации или None
         """
         auth_url = f"{self.base_url}/auth"
         auth_data = {
@@ -43,20 +59,38 @@ class SevenRoomsAPI:
         }
         
         try:
-            response = requests.post(auth_url, json=auth_data, timeout=30)
+            response = self.session.post(auth_url, json=auth_data)
             
             if response.status_code == 200:
-                data = response.json()
-                self.access_token = data.get('access_token')
-                return True
+                return response.json()
             else:
                 print(f"Ошибка аутентификации: {response.status_code}")
                 print(f"Ответ: {response.text}")
-                return False
+                return None
                 
         except requests.exceptions.RequestException as e:
             print(f"Ошибка подключения при аутентификации: {e}")
-            return False
+            return None
+    
+    def authenticate(self, rejected_token=None):
+        """
+        Выполняет аутентификацию и получает токен доступа
+        
+        Токен берется из общего кэша и обновляется заранее, до истечения,
+        а не только после ответа 401.
+        
+        Args:
+            rejected_token (str): Токен, отклоненный сервером (ответ 401);
+                он удаляется из кэша перед получением нового
+        
+        Returns:
+            bool: True если аутентификация успешна, False иначе
+        """
+        manager = get_token_manager()
+        if rejected_token:
+            manager.invalidate("sevenrooms", self._token_credentials(), rejected_token)
+        self.access_token = manager.get_token("sevenrooms", self._token_credentials(), self._request_token)
+        return self.access_token is not None
     
     def _make_request(self, endpoint, params=None, method='GET'):
         """
@@ -70,9 +104,8 @@ class SevenRoomsAPI:
         Returns:
             dict: Ответ API или None в случае ошибки
         """
-        if not self.access_token:
-            if not self.authenticate():
-                return None
+        if not self.authenticate():
+            return None
         
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         headers = {
@@ -88,22 +121,22 @@ class SevenRoomsAPI:
         
         try:
             if method.upper() == 'GET':
-                response = requests.get(url, params=params, headers=headers, timeout=30)
+                response = self.session.get(url, params=params, headers=headers)
             elif method.upper() == 'POST':
-                response = requests.post(url, json=params, headers=headers, timeout=30)
+                response = self.session.post(url, json=params, headers=headers)
             else:
                 raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
             
             if response.status_code == 200:
                 return response.json()
             elif response.status_code == 401:
-                # Токен истек, попробуем переаутентифицироваться
-                if self.authenticate():
+                # Токен отозван сервером, сбрасываем кэш и получаем новый
+                if self.authenticate(rejected_token=self.access_token):
                     headers['Authorization'] = f'Bearer {self.access_token}'
                     if method.upper() == 'GET':
-                        response = requests.get(url, params=params, headers=headers, timeout=30)
+                        response = self.session.get(url, params=params, headers=headers)
                     else:
-                        response = requests.post(url, json=params, headers=headers, timeout=30)
+                        response = self.session.post(url, json=params, headers=headers)
                     
                     if response.status_code == 200:
                         return response.json()
@@ -164,6 +197,28 @@ class SevenRoomsAPI:
             
         return self._make_request('clients', params)
 
+    def iter_records(self, endpoint, limit=400, **params):
+        """
+        Все записи эндпоинта с курсором (limit/cursor)
+        
+        Страницы запрашиваются по data.cursor ответа; следующая загружается
+        в фоне, пока обрабатывается текущая.
+        
+        Args:
+            endpoint (str): Эндпоинт ('reservations', 'clients')
+            limit (int): Размер страницы
+            **params: Фильтры (start_date, end_date, updated_since)
+            
+        Returns:
+            Pager: Итератор записей
+        """
+        return Pager(lambda endpoint, params: self._make_request(endpoint, dict(params)),
+                     endpoint,
+                     {'limit': limit, **{key: value for key, value in params.items() if value}},
+                     items_at('data.results'),
+                     cursor_strategy('cursor', lambda page: dig(page, 'data.cursor')),
+                     name=f'sevenrooms-{endpoint}')
+
 # Пример использования
 def example_usage():
     """
@@ -201,6 +256,13 @@ def example_usage():
     if clients:
         print(f"Найдено клиентов: {len(clients)}")
         print(json.dumps(clients[:2], indent=2))  # Показываем первых 2
+    
+    # Все клиенты, обновленные за неделю, — постранично, без загрузки всего списка в память
+    print("\nОбход клиентов, обновленных за неделю...")
+    updated = api.iter_records('clients', updated_since=start_date)
+    emails = sum(1 for client in updated if client.get('email'))
+    print(f"Клиентов с email: {emails} (страниц: {updated.stats['pages']})"
+          f"{'' if updated.complete else ' — неполная выборка: ошибка загрузки страницы'}")
 
 if __name__ == "__main__":
     print("=== Пример работы с API SevenRooms ===")
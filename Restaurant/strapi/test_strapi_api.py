@@ -5,10 +5,28 @@
 
 import requests
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.hydrate import DetailHydrator
 
 # Базовый URL для API
 BASE_URL = "http://localhost:1337/api"
 
+def fetch_restaurants(restaurant_ids):
+    """
+    Рестораны по списку ID одним запросом (фильтр filters[id][$in])
+    
+    Returns:
+        dict: {ID: ресторан}
+    """
+    params = {f"filters[id][$in][{i}]": restaurant_id for i, restaurant_id in enumerate(restaurant_ids)}
+    params["pagination[pageSize]"] = len(restaurant_ids)
+    response = requests.get(f"{BASE_URL}/restaurants", params=params)
+    response.raise_for_status()
+    return {item['id']: item for item in response.json().get('data', [])}
+
 def test_restaurants_api():
     """Тестирует API ресторанов"""
     
@@ -41,6 +59,14 @@ def test_restaurants_api():
                     print(f"   Ответ: {json.dumps(data2, indent=2, ensure_ascii=False)}")
                 else:
                     print(f"   Ошибка: {response2.text}")
+                
+                # Тест 3: Все рестораны списка — пачками вместо запроса на каждый
+                restaurant_ids = [item['id'] for item in data['data']]
+                print(f"\n3. Получение {len(restaurant_ids)} ресторанов пачками:")
+                hydrator = DetailHydrator(fetch_many=fetch_restaurants, batch_size=25, max_workers=4,
+                                          name="ресторанов")
+                restaurants = hydrator.hydrate(restaurant_ids)
+                print(f"   Получено ресторанов: {len(restaurants)}")
             else:
                 print("   Нет данных для тестирования отдельного ресторана")
         else:
@@ -7,6 +7,11 @@
 import requests
 import json
 from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import thefork_customers
 
 def test_b2b_customers_endpoint():
     """Тестирует B2B-API endpoint для получения списка клиентов"""
@@ -123,6 +128,14 @@ def test_pos_create_endpoint():
     
     print("\n" + "="*50 + "\n")
 
+def list_all_customers(group_uuid, token, start_date, end_date):
+    """Все клиенты группы за период постранично (page/limit); None, если выборка неполная"""
+    customers = thefork_customers(group_uuid, token, startDate=start_date, endDate=end_date)
+    total = sum(1 for _ in customers)
+    print(f"Клиентов: {total}, страниц: {customers.stats['pages']}"
+          f"{'' if customers.complete else ' — неполная выборка: ошибка загрузки страницы'}")
+    return total if customers.complete else None
+
 def main():
     """Основная функция для выполнения тестов"""
     print("Начинаем тестирование TheFork API")
@@ -7,6 +7,11 @@
 import requests
 import json
 from typing import Dict, Any, Optional
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.transport import get_session
 
 class TripAdvisorAPI:
     """Класс для работы с TripAdvisor Content API"""
@@ -17,6 +22,7 @@ class TripAdvisorAPI:
         self.headers = {
             "accept": "application/json"
         }
+        self.session = get_session()
     
     def get_location_details(self, location_id: int, language: str = "en", currency: str = "USD") -> Dict[str, Any]:
         """
@@ -41,7 +47,7 @@ class TripAdvisorAPI:
             print(f"Выполняю запрос к: {url}")
             print(f"Параметры: {params}")
             
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
+            response = self.session.get(url, params=params, headers=self.headers)
             
             print(f"Статус ответа: {response.status_code}")
             print(f"Заголовки ответа: {dict(response.headers)}")
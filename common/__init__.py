@@ -0,0 +1,8 @@
+"""
+Общие компоненты для клиентов провайдеров TravelPackAPI
+
+Скрипты в каталогах провайдеров подключают пакет так:
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from common.transport import get_session
+"""
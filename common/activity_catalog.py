@@ -0,0 +1,458 @@
+"""
+Локальный каталог активностей Tiqets, GetYourGuide и Musement
+
+Страницы поиска музеев и экскурсий не опрашивают три партнерских API на
+каждый просмотр: продукты Tiqets (/v2/products), туры GetYourGuide и
+активности Musement периодически выкачиваются в SQLite, приводятся к одному
+формату и ищутся локально — по тексту (FTS5 по названию, категориям и
+городу), по радиусу от точки, городу, категории и цене.
+
+Обход источника идет по областям (scope — город, локация): записи без
+изменений (тот же отпечаток) не перезаписываются, а записи области, которых
+не было в полном обходе, удаляются. Обход, прерванный ошибкой запроса,
+ничего не удаляет. Фоновый поток обновляет области, чей последний полный
+обход старше max_age источника.
+"""
+
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from common.geocache import haversine_m, normalize_query
+
+DEFAULT_MAX_AGE = 24 * 3600
+KM_PER_DEGREE = 111.32
+BATCH_SIZE = 500
+
+# Поля активности в общем формате (кроме payload)
+FIELDS = ('id', 'source', 'source_id', 'scope', 'title', 'city', 'country', 'categories',
+          'lat', 'lon', 'price', 'currency', 'rating', 'url', 'image')
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _first(*values):
+    for value in values:
+        if value not in (None, '', [], {}):
+            return value
+    return None
+
+
+def make_activity(source, source_id, title, city=None, country=None, categories=(), lat=None, lon=None,
+                  price=None, currency=None, rating=None, url=None, image=None):
+    """Активность в общем формате"""
+    return {
+        'id': f"{source}:{source_id}",
+        'source': source,
+        'source_id': str(source_id),
+        'title': title,
+        'city': city,
+        'country': country,
+        'categories': [category for category in categories if category],
+        'lat': _float(lat),
+        'lon': _float(lon),
+        'price': _float(price),
+        'currency': currency,
+        'rating': _float(rating),
+        'url': url,
+        'image': image,
+    }
+
+
+def normalize_tiqets(product):
+    """Продукт Tiqets /v2/products"""
+    if not product.get('id'):
+        return None
+    geo = product.get('geolocation') or {}
+    images = product.get('images') or [{}]
+    return make_activity(
+        'tiqets', product['id'], product.get('title'),
+        city=_first(product.get('city_name'), (product.get('city') or {}).get('name')),
+        country=product.get('country_name'),
+        categories=[tag.get('name') if isinstance(tag, dict) else tag
+                    for tag in product.get('tags') or product.get('product_type_names') or []],
+        lat=geo.get('lat'), lon=_first(geo.get('lng'), geo.get('lon')),
+        price=_first(product.get('price'), product.get('prediscount_price')),
+        currency=product.get('currency'),
+        rating=(product.get('ratings') or {}).get('average'),
+        url=product.get('product_url'),
+        image=_first(images[0].get('medium'), images[0].get('large')) if isinstance(images[0], dict) else images[0],
+    )
+
+
+def normalize_getyourguide(tour):
+    """Тур GetYourGuide /1/tours"""
+    if not tour.get('tour_id'):
+        return None
+    coordinates = tour.get('coordinates') or {}
+    location = (tour.get('locations') or [{}])[0]
+    price = tour.get('price') or {}
+    pictures = tour.get('pictures') or [{}]
+    return make_activity(
+        'getyourguide', tour['tour_id'], tour.get('title'),
+        city=_first(location.get('city'), location.get('name')),
+        country=location.get('country'),
+        categories=[category.get('name') for category in tour.get('categories') or []],
+        lat=_first(coordinates.get('lat'), location.get('coordinates', {}).get('lat')),
+        lon=_first(coordinates.get('long'), coordinates.get('lng'), location.get('coordinates', {}).get('long')),
+        price=(price.get('values') or {}).get('amount'),
+        currency=_first(price.get('currency'), (price.get('values') or {}).get('currency')),
+        rating=tour.get('overall_rating'),
+        url=tour.get('url'),
+        image=pictures[0].get('url') if pictures else None,
+    )
+
+
+def normalize_musement(activity):
+    """Активность Musement /activities"""
+    if not activity.get('uuid'):
+        return None
+    city = activity.get('city') or {}
+    price = activity.get('retail_price') or {}
+    return make_activity(
+        'musement', activity['uuid'], activity.get('title'),
+        city=city.get('name'),
+        country=(city.get('country') or {}).get('name'),
+        categories=[category.get('name') for category in activity.get('categories') or []],
+        lat=_first(activity.get('latitude'), city.get('latitude')),
+        lon=_first(activity.get('longitude'), city.get('longitude')),
+        price=price.get('value'),
+        currency=price.get('currency'),
+        rating=activity.get('reviews_avg'),
+        url=activity.get('url'),
+        image=activity.get('cover_image_url'),
+    )
+
+
+def _fts_phrase(word):
+    # Фраза FTS5: кавычки внутри удваиваются
+    return '"' + word.replace('"', '""') + '"'
+
+
+class ActivitySource:
+    """Источник активностей: обход одной области и нормализация записей"""
+
+    def __init__(self, name, pages, normalize, scopes, max_age=DEFAULT_MAX_AGE):
+        """
+        Args:
+            name (str): Имя источника ('tiqets', 'getyourguide', 'musement')
+            pages (callable): pages(scope) -> итерируемое сырых записей области; если у
+                результата есть next_page (Pager), по нему определяется полнота обхода
+            normalize (callable): normalize(запись) -> активность (make_activity) или None
+            scopes (list): Области обхода (ID города, название города, ...)
+            max_age (int): Через сколько секунд область обходится заново
+        """
+        self.name = name
+        self.pages = pages
+        self.normalize = normalize
+        self.scopes = list(scopes)
+        self.max_age = max_age
+
+
+class ActivityCatalog:
+    """Нормализованные активности в SQLite с текстовым и географическим индексом"""
+
+    def __init__(self, path=':memory:', sources=()):
+        """
+        Args:
+            path (str): Файл базы (':memory:' — только в памяти)
+            sources (list): Источники (ActivitySource) для refresh и фонового обновления
+        """
+        self.path = path
+        self.sources = {source.name: source for source in sources}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.fts = self._init_schema()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _init_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS activities (
+                id TEXT PRIMARY KEY,
+                source TEXT, source_id TEXT, scope TEXT,
+                title TEXT, city TEXT, city_key TEXT, country TEXT, categories TEXT,
+                lat REAL, lon REAL, price REAL, currency TEXT, rating REAL,
+                url TEXT, image TEXT,
+                fingerprint TEXT, seen_at REAL, updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS activities_geo ON activities (lat, lon);
+            CREATE INDEX IF NOT EXISTS activities_city ON activities (city_key);
+            CREATE INDEX IF NOT EXISTS activities_scope ON activities (source, scope, seen_at);
+            CREATE TABLE IF NOT EXISTS crawls (
+                source TEXT, scope TEXT, finished_at REAL, seen INTEGER, changed INTEGER, removed INTEGER,
+                PRIMARY KEY (source, scope)
+            );
+        """)
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts USING fts5("
+                              "title, categories, city, tokenize='unicode61 remove_diacritics 2')")
+            return True
+        except sqlite3.OperationalError:
+            # SQLite без FTS5: текстовый поиск через LIKE
+            return False
+
+    # --- запись
+
+    def _upsert(self, scope, activities, now):
+        # Возвращает число записей, которые изменились
+        changed = 0
+        with self.lock, self.conn:
+            for activity in activities:
+                fingerprint = hashlib.sha1(json.dumps(activity, sort_keys=True, ensure_ascii=False)
+                                           .encode('utf-8')).hexdigest()
+                row = self.conn.execute("SELECT rowid, fingerprint FROM activities WHERE id = ?",
+                                        (activity['id'],)).fetchone()
+                if row is not None and row[1] == fingerprint:
+                    self.conn.execute("UPDATE activities SET seen_at = ?, scope = ? WHERE rowid = ?",
+                                      (now, None if scope is None else str(scope), row[0]))
+                    continue
+                changed += 1
+                values = [activity.get(field) for field in FIELDS]
+                values[FIELDS.index('categories')] = json.dumps(activity['categories'], ensure_ascii=False)
+                values[FIELDS.index('scope')] = None if scope is None else str(scope)
+                self.conn.execute(
+                    f"INSERT INTO activities ({', '.join(FIELDS)}, city_key, fingerprint, seen_at, updated_at) "
+                    f"VALUES ({', '.join('?' * len(FIELDS))}, ?, ?, ?, ?) "
+                    f"ON CONFLICT(id) DO UPDATE SET "
+                    + ', '.join(f"{field} = excluded.{field}" for field in FIELDS[1:])
+                    + ", city_key = excluded.city_key, fingerprint = excluded.fingerprint, "
+                      "seen_at = excluded.seen_at, updated_at = excluded.updated_at",
+                    [*values, normalize_query(activity['city'] or ''), fingerprint, now, now])
+                if self.fts:
+                    rowid = self.conn.execute("SELECT rowid FROM activities WHERE id = ?",
+                                              (activity['id'],)).fetchone()[0]
+                    self.conn.execute("DELETE FROM activities_fts WHERE rowid = ?", (rowid,))
+                    self.conn.execute("INSERT INTO activities_fts (rowid, title, categories, city) VALUES (?, ?, ?, ?)",
+                                      (rowid, activity['title'] or '', ' '.join(activity['categories']),
+                                       activity['city'] or ''))
+        return changed
+
+    def add(self, activities, scope=None):
+        """Сохранить активности (make_activity) вне обхода источника"""
+        return self._upsert(scope, list(activities), time.time())
+
+    def refresh(self, source_name, scope):
+        """
+        Обойти одну область источника
+
+        Returns:
+            dict: {'seen', 'changed', 'removed', 'complete'}
+        """
+        source = self.sources[source_name]
+        started = time.time()
+        seen = changed = 0
+        batch = []
+        records = source.pages(scope)
+        for record in records:
+            activity = source.normalize(record)
+            if activity is None:
+                continue
+            batch.append(activity)
+            if len(batch) >= BATCH_SIZE:
+                changed += self._upsert(scope, batch, started)
+                seen += len(batch)
+                batch = []
+        if batch:
+            changed += self._upsert(scope, batch, started)
+            seen += len(batch)
+
+        complete = getattr(records, 'next_page', None) is None
+        removed = 0
+        with self.lock, self.conn:
+            if complete:
+                # Исчезнувшие из полного обхода записи области
+                stale = [row[0] for row in self.conn.execute(
+                    "SELECT rowid FROM activities WHERE source = ? AND scope = ? AND seen_at < ?",
+                    (source_name, str(scope), started))]
+                for rowid in stale:
+                    self.conn.execute("DELETE FROM activities WHERE rowid = ?", (rowid,))
+                    if self.fts:
+                        self.conn.execute("DELETE FROM activities_fts WHERE rowid = ?", (rowid,))
+                removed = len(stale)
+                self.conn.execute("INSERT OR REPLACE INTO crawls VALUES (?, ?, ?, ?, ?, ?)",
+                                  (source_name, str(scope), time.time(), seen, changed, removed))
+        return {'seen': seen, 'changed': changed, 'removed': removed, 'complete': complete}
+
+    def refresh_stale(self):
+        """Обойти области, чей последний полный обход старше max_age источника"""
+        results = {}
+        for source in self.sources.values():
+            for scope in source.scopes:
+                with self.lock:
+                    row = self.conn.execute("SELECT finished_at FROM crawls WHERE source = ? AND scope = ?",
+                                            (source.name, str(scope))).fetchone()
+                if row is None or time.time() - row[0] > source.max_age:
+                    try:
+                        results[(source.name, scope)] = self.refresh(source.name, scope)
+                    except Exception as e:
+                        print(f"Ошибка обхода {source.name} / {scope}: {e}")
+                if self.stop_event.is_set():
+                    return results
+        return results
+
+    def start_background_refresh(self, interval=600):
+        """
+        Запустить фоновый поток: обход устаревших областей сразу и затем раз в interval секунд
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+
+        def run():
+            while True:
+                self.refresh_stale()
+                if self.stop_event.wait(interval):
+                    return
+
+        self.thread = threading.Thread(target=run, name='activity-catalog-refresh', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Остановить фоновое обновление"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # --- запросы
+
+    def _row(self, row, columns):
+        activity = dict(zip(columns, row))
+        activity['categories'] = json.loads(activity['categories'] or '[]')
+        return activity
+
+    def search(self, text=None, lat=None, lon=None, radius_km=None, city=None, category=None,
+               min_price=None, max_price=None, sources=None, sort=None, limit=20, offset=0):
+        """
+        Поиск активностей
+
+        Args:
+            text (str): Слова в названии, категориях или городе (последнее — префикс)
+            lat, lon (float): Точка для поиска по радиусу и сортировки по расстоянию
+            radius_km (float): Радиус от точки в километрах
+            city (str): Город (без учета регистра и диакритики)
+            category (str): Слово из названия категории ('museum')
+            min_price, max_price (float): Диапазон цены (в валюте источника)
+            sources (list): Только эти источники
+            sort (str): 'relevance', 'distance', 'price', 'rating'; по умолчанию relevance
+                для текста, distance для точки, иначе rating
+            limit (int): Максимум результатов
+            offset (int): Смещение
+
+        Returns:
+            list: Активности в общем формате; при заданной точке — с distance_km
+        """
+        conditions, params = [], []
+        joins = ''
+        order = None
+        # Слова без букв и цифр токенизатор все равно отбрасывает
+        words = [word for word in normalize_query(text or '').split() if any(ch.isalnum() for ch in word)]
+        category_key = normalize_query(category or '')
+        if not any(ch.isalnum() for ch in category_key):
+            category_key = ''
+        if self.fts and (words or category_key):
+            terms = [_fts_phrase(word) for word in words]
+            if terms:
+                terms[-1] += '*'
+            if category_key:
+                terms.append(f"categories : {_fts_phrase(category_key)}*")
+            joins = " JOIN activities_fts f ON f.rowid = a.rowid"
+            conditions.append("activities_fts MATCH ?")
+            params.append(' '.join(terms))
+            order = "bm25(activities_fts, 5, 2, 1)"
+        elif not self.fts:
+            for word in words:
+                conditions.append("(a.title LIKE ? OR a.categories LIKE ? OR a.city LIKE ?)")
+                params.extend([f"%{word}%"] * 3)
+            if category_key:
+                conditions.append("a.categories LIKE ?")
+                params.append(f"%{category_key}%")
+        if lat is not None and lon is not None and radius_km is not None:
+            dlat = radius_km / KM_PER_DEGREE
+            dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+            conditions.append("a.lat BETWEEN ? AND ? AND a.lon BETWEEN ? AND ?")
+            params.extend([lat - dlat, lat + dlat, lon - dlon, lon + dlon])
+        if city:
+            conditions.append("a.city_key = ?")
+            params.append(normalize_query(city))
+        if min_price is not None:
+            conditions.append("a.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("a.price <= ?")
+            params.append(max_price)
+        if sources:
+            conditions.append(f"a.source IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+
+        geo = lat is not None and lon is not None
+        sort = sort or ('relevance' if order else 'distance' if geo else 'rating')
+        if sort == 'relevance' and order:
+            sql_order = order
+        elif sort == 'price':
+            sql_order = "a.price IS NULL, a.price"
+        elif sort in ('rating', 'relevance'):
+            sql_order = "COALESCE(a.rating, 0) DESC"
+        else:
+            sql_order = None
+        # Страница выбирается в SQL, если порядок задан в SQL и радиус не отсекает строки после выборки
+        paged = sql_order is not None and not (geo and radius_km is not None)
+
+        columns = [*FIELDS, 'updated_at']
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = f"SELECT {', '.join('a.' + column for column in columns)} FROM activities a{joins}{where}"
+        if sql_order:
+            sql += f" ORDER BY {sql_order}, a.rowid"
+        if paged:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        activities = [self._row(row, columns) for row in rows]
+
+        if geo:
+            for activity in activities:
+                activity['distance_km'] = (haversine_m(lat, lon, activity['lat'], activity['lon']) / 1000
+                                           if activity['lat'] is not None else None)
+            if radius_km is not None:
+                activities = [a for a in activities if a['distance_km'] is not None and a['distance_km'] <= radius_km]
+        if paged:
+            return activities
+
+        if sort == 'distance' and geo:
+            activities.sort(key=lambda a: (a['distance_km'] is None, a['distance_km'] or 0))
+        return activities[offset:offset + limit]
+
+    def get(self, activity_id):
+        """Активность по ID ('tiqets:1006356') или None"""
+        columns = [*FIELDS, 'updated_at']
+        with self.lock:
+            row = self.conn.execute(f"SELECT {', '.join(columns)} FROM activities WHERE id = ?",
+                                    (activity_id,)).fetchone()
+        return self._row(row, columns) if row else None
+
+    def stats(self):
+        """Количество активностей по источникам и последние обходы"""
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT source, COUNT(*) FROM activities GROUP BY source"))
+            crawls = {f"{source}/{scope}": {'age': time.time() - finished_at, 'seen': seen,
+                                             'changed': changed, 'removed': removed}
+                      for source, scope, finished_at, seen, changed, removed
+                      in self.conn.execute("SELECT * FROM crawls")}
+        return {'activities': counts, 'crawls': crawls}
+
+    def close(self):
+        self.stop()
+        with self.lock:
+            self.conn.close()
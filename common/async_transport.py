@@ -0,0 +1,86 @@
+"""
+Асинхронный HTTP транспорт для клиентов провайдеров
+
+Асинхронная пара к transport.py: один httpx.AsyncClient на event loop с
+ограниченным пулом соединений и теми же таймаутами. Если установлен пакет
+h2, клиент договаривается о HTTP/2 с провайдерами, которые его поддерживают
+(через ALPN), остальные продолжают работать по HTTP/1.1.
+"""
+
+import asyncio
+import weakref
+
+from common.transport import DEFAULT_TIMEOUT, POOL_MAXSIZE, USER_AGENT
+
+# httpx нужен только асинхронным клиентам; синхронные скрипты, которые
+# импортируют этот модуль, работают и без него
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Общий предел одновременных соединений на клиент
+MAX_CONNECTIONS = 100
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def create_async_client(timeout=DEFAULT_TIMEOUT, max_connections=MAX_CONNECTIONS,
+                        max_keepalive=POOL_MAXSIZE, http2=HTTP2_AVAILABLE):
+    """
+    Создать новый асинхронный клиент
+
+    Args:
+        timeout (tuple): Таймаут (подключение, чтение) по умолчанию
+        max_connections (int): Максимум одновременных соединений
+        max_keepalive (int): Максимум keep-alive соединений в пуле
+        http2 (bool): Разрешить HTTP/2 (требует пакет h2)
+
+    Returns:
+        httpx.AsyncClient: Настроенный клиент
+    """
+    if httpx is None:
+        raise ImportError("Для асинхронных клиентов требуется пакет httpx: pip install httpx")
+
+    connect_timeout, read_timeout = timeout
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive
+        ),
+        http2=http2,
+        headers={'User-Agent': USER_AGENT}
+    )
+
+
+def get_async_client():
+    """
+    Получить общий клиент для текущего event loop
+
+    httpx.AsyncClient привязан к циклу, в котором открыты его соединения,
+    поэтому клиент хранится отдельно для каждого цикла.
+
+    Returns:
+        httpx.AsyncClient: Общий клиент
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = create_async_client()
+        _clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Закрыть общий клиент текущего event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
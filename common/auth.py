@@ -0,0 +1,265 @@
+"""
+Общий для процесса кэш OAuth токенов
+
+Токены хранятся по ключу (провайдер, учетные данные). Менеджер:
+- считает токен просроченным за REFRESH_MARGIN секунд до истечения;
+- обновляет токены в фоновом потоке заранее, до того как они понадобятся;
+- при одновременном обращении многих потоков к просроченному токену
+  выполняет только один запрос обновления (single-flight);
+- может сохранять токены на диск в зашифрованном виде (нужен пакет
+  cryptography), чтобы перезапущенный процесс не ходил за токеном заново.
+
+Функция получения токена (fetch) остается в клиенте провайдера и возвращает
+ответ сервера авторизации: {'access_token': ..., 'expires_in': ...} или None.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+# Токен считается недействительным за столько секунд до истечения
+REFRESH_MARGIN = 60
+# Фоновое обновление начинается после этой доли срока жизни токена
+REFRESH_AHEAD_RATIO = 0.8
+# Срок жизни, если сервер не вернул expires_in
+DEFAULT_EXPIRES_IN = 1800
+
+# Переменные окружения для дискового кэша
+CACHE_PATH_ENV = 'TRAVELPACK_TOKEN_CACHE'
+CACHE_KEY_ENV = 'TRAVELPACK_TOKEN_CACHE_KEY'
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def make_key(provider, credentials):
+    """
+    Построить ключ кэша по провайдеру и учетным данным
+
+    Секреты в ключ не попадают в открытом виде — только их хэш.
+    """
+    digest = hashlib.sha256(
+        json.dumps(credentials, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{provider}:{digest[:32]}"
+
+
+class TokenManager:
+    """Кэш токенов с фоновым обновлением и single-flight"""
+
+    def __init__(self, refresh_margin=REFRESH_MARGIN, cache_path=None, cache_key=None,
+                 background_refresh=True):
+        """
+        Args:
+            refresh_margin (int): За сколько секунд до истечения токен считается просроченным
+            cache_path (str): Путь к зашифрованному файлу кэша (None — только память)
+            cache_key (str|bytes): Ключ Fernet для шифрования файла кэша
+            background_refresh (bool): Обновлять токены заранее в фоновом потоке
+        """
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self.entries = {}
+        self.fetchers = {}
+        self.key_locks = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.refresher = None
+
+        self.cipher = None
+        self.cache_path = None
+        if cache_path and cache_key:
+            if Fernet is None:
+                print("Дисковый кэш токенов отключен: требуется пакет cryptography")
+            else:
+                self.cipher = Fernet(cache_key)
+                self.cache_path = cache_path
+                self._load_cache()
+
+    def _key_lock(self, key):
+        with self.lock:
+            if key not in self.key_locks:
+                self.key_locks[key] = threading.Lock()
+            return self.key_locks[key]
+
+    def _is_valid(self, entry):
+        return entry is not None and time.time() < entry['expires_at'] - self.refresh_margin
+
+    def get_token(self, provider, credentials, fetch):
+        """
+        Получить действующий токен
+
+        Args:
+            provider (str): Имя провайдера ('amadeus', 'sabre', ...)
+            credentials (dict): Учетные данные, определяющие токен
+            fetch: Функция без аргументов, запрашивающая новый токен
+
+        Returns:
+            str: Access token или None, если получить токен не удалось
+        """
+        key = make_key(provider, credentials)
+        entry = self.entries.get(key)
+        if self._is_valid(entry):
+            return entry['token']
+
+        with self._key_lock(key):
+            # Пока ждали блокировку, токен мог обновить другой поток
+            entry = self.entries.get(key)
+            if self._is_valid(entry):
+                return entry['token']
+            self.fetchers[key] = fetch
+            entry = self._refresh(key, fetch)
+            return entry['token'] if entry else None
+
+    def _refresh(self, key, fetch):
+        token_data = fetch()
+        if not token_data or not token_data.get('access_token'):
+            return None
+
+        now = time.time()
+        expires_in = token_data.get('expires_in') or DEFAULT_EXPIRES_IN
+        entry = {
+            'token': token_data['access_token'],
+            'expires_at': now + expires_in,
+            'refresh_at': now + expires_in * REFRESH_AHEAD_RATIO
+        }
+        with self.lock:
+            self.entries[key] = entry
+            self.wakeup.notify()
+        self._save_cache()
+        self._ensure_refresher()
+        return entry
+
+    def invalidate(self, provider, credentials, token=None):
+        """
+        Сбросить токен (например, после ответа 401)
+
+        Args:
+            token (str): Отклоненный сервером токен. Если указан, запись
+                сбрасывается, только если в кэше все еще этот токен — так
+                несколько потоков, получивших 401, не запросят токен повторно.
+        """
+        key = make_key(provider, credentials)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (token is not None and entry['token'] != token):
+                return
+            del self.entries[key]
+        self._save_cache()
+
+    def expires_at(self, provider, credentials):
+        """Время истечения токена (unix time) или None"""
+        entry = self.entries.get(make_key(provider, credentials))
+        return entry['expires_at'] if entry else None
+
+    def _ensure_refresher(self):
+        if not self.background_refresh or self.refresher is not None:
+            return
+        with self.lock:
+            if self.refresher is None:
+                self.refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+                self.refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            with self.lock:
+                due = [
+                    key for key, entry in self.entries.items()
+                    if key in self.fetchers and time.time() >= entry['refresh_at']
+                ]
+                if not due:
+                    pending = [
+                        entry['refresh_at'] for key, entry in self.entries.items()
+                        if key in self.fetchers
+                    ]
+                    timeout = max(min(pending) - time.time(), 1) if pending else None
+                    self.wakeup.wait(timeout)
+                    continue
+
+            for key in due:
+                lock = self._key_lock(key)
+                if not lock.acquire(blocking=False):
+                    continue  # токен уже обновляется по запросу
+                try:
+                    entry = self.entries.get(key)
+                    if entry and time.time() >= entry['refresh_at']:
+                        try:
+                            refreshed = self._refresh(key, self.fetchers[key])
+                        except Exception as e:
+                            print(f"Ошибка фонового обновления токена {key.split(':')[0]}: {e}")
+                            refreshed = None
+                        if refreshed is None:
+                            if self._is_valid(entry):
+                                # Повторим попытку позже, старый токен пока действует
+                                entry['refresh_at'] = time.time() + self.refresh_margin / 2
+                            else:
+                                # Токен истек — дальше обновляем только по запросу
+                                self.fetchers.pop(key, None)
+                finally:
+                    lock.release()
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = json.loads(self.cipher.decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken) as e:
+            print(f"Не удалось прочитать кэш токенов: {e}")
+            return
+
+        for key, entry in data.items():
+            if self._is_valid(entry):
+                self.entries[key] = entry
+
+    def _save_cache(self):
+        if self.cipher is None:
+            return
+        with self.lock:
+            data = json.dumps(self.entries).encode()
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self.cipher.encrypt(data))
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Не удалось сохранить кэш токенов: {e}")
+
+
+def get_token_manager():
+    """
+    Получить общий для процесса менеджер токенов
+
+    Дисковый кэш включается переменными окружения TRAVELPACK_TOKEN_CACHE
+    (путь к файлу) и TRAVELPACK_TOKEN_CACHE_KEY (ключ Fernet).
+
+    Returns:
+        TokenManager: Общий менеджер
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = TokenManager(
+                    cache_path=os.getenv(CACHE_PATH_ENV),
+                    cache_key=os.getenv(CACHE_KEY_ENV)
+                )
+    return _manager
+
+
+def _reset_after_fork():
+    # Фоновый поток обновления не переживает fork
+    global _manager, _manager_lock
+    _manager = None
+    _manager_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
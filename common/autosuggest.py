@@ -0,0 +1,201 @@
+"""
+Кэш автодополнения мест с локальным префиксным деревом
+
+Автодополнение (например, Skyscanner Car Hire Autosuggest) вызывается на
+каждое нажатие клавиши: 'L', 'Lo', 'Lon', 'Lond'. Ответы вложены по
+префиксу: все места для 'Londo' входят в ответ для 'Lond'. Если ответ для
+более короткого префикса полный (мест меньше, чем лимит выдачи), ответ для
+более длинного строится локально — фильтрацией через префиксное дерево с
+сохранением порядка ранжирования провайдера.
+
+Для каждой пары рынок/локаль хранится дерево всех встреченных мест
+(entityId, type, hierarchy, location) и кэш ответов с TTL. Ответ на пустой
+запрос (популярные места) тоже кэшируется, но префиксом не считается.
+"""
+
+import threading
+import time
+import unicodedata
+
+# Сколько мест провайдер возвращает максимум: ответ короче — полный
+DEFAULT_PAGE_SIZE = 10
+DEFAULT_TTL = 24 * 3600
+# Ключ узла дерева, под которым лежат ID мест, чье слово заканчивается в этом узле
+_IDS = ''
+
+
+def normalize_term(term):
+    """Запрос для сравнения: регистр, диакритика, лишние пробелы"""
+    text = unicodedata.normalize('NFKD', str(term or ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return ' '.join(text.split())
+
+
+def _match_start(name, term):
+    """Позиция начала совпадения запроса с названием или одним из его слов, иначе -1"""
+    norm_name = normalize_term(name)
+    if norm_name.startswith(term):
+        return 0
+    position = 0
+    for word in norm_name.split(' '):
+        if word.startswith(term):
+            return position
+        position += len(word) + 1
+    return -1
+
+
+class _MarketIndex:
+    """Дерево мест и кэш ответов одной пары рынок/локаль"""
+
+    def __init__(self):
+        self.root = {}
+        self.places = {}
+        self.responses = {}
+
+    def add_place(self, place):
+        entity_id = place.get('entityId')
+        if entity_id is None:
+            return None
+        if entity_id not in self.places:
+            name = normalize_term(place.get('name'))
+            words = name.split(' ')
+            # Индексируем полное название и каждый его хвост с начала слова
+            for i in range(len(words)):
+                node = self.root
+                for ch in ' '.join(words[i:]):
+                    node = node.setdefault(ch, {})
+                node.setdefault(_IDS, set()).add(entity_id)
+        self.places[entity_id] = {key: value for key, value in place.items() if key != 'highlight'}
+        return entity_id
+
+    def matching_ids(self, term):
+        """Все известные места, название или слово названия которых начинается с term"""
+        node = self.root
+        for ch in term:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        found = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key == _IDS:
+                    found.update(child)
+                else:
+                    stack.append(child)
+        return found
+
+
+class AutosuggestCache:
+    """Автодополнение с кэшем по префиксам поверх функции запроса к провайдеру"""
+
+    def __init__(self, fetch, page_size=DEFAULT_PAGE_SIZE, ttl=DEFAULT_TTL):
+        """
+        Args:
+            fetch (callable): fetch(market, locale, term) -> ответ {'places': [...]} или None
+            page_size (int): Максимум мест в ответе провайдера
+            ttl (int): Время жизни закэшированного ответа в секундах
+        """
+        self.fetch = fetch
+        self.page_size = page_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.markets = {}
+        self.stats = {'cache': 0, 'prefix': 0, 'network': 0}
+
+    def _market(self, market, locale):
+        key = (str(market).upper(), str(locale))
+        if key not in self.markets:
+            self.markets[key] = _MarketIndex()
+        return self.markets[key]
+
+    def add_response(self, market, locale, term, response):
+        """Сохранить ответ провайдера на запрос term"""
+        places = (response or {}).get('places', [])
+        with self.lock:
+            index = self._market(market, locale)
+            ids = [entity_id for entity_id in (index.add_place(place) for place in places) if entity_id]
+            complete = len(places) < self.page_size
+            index.responses[normalize_term(term)] = (ids, complete, time.time())
+
+    def _cached(self, index, term):
+        # Точный ответ или полный ответ для более короткого префикса
+        now = time.time()
+        entry = index.responses.get(term)
+        if entry is not None and now - entry[2] <= self.ttl:
+            return 'cache', entry[0]
+        for length in range(len(term) - 1, 0, -1):
+            entry = index.responses.get(term[:length])
+            if entry is not None and entry[1] and now - entry[2] <= self.ttl:
+                matching = index.matching_ids(term)
+                return 'prefix', [entity_id for entity_id in entry[0] if entity_id in matching]
+        return None, None
+
+    def _places(self, index, ids, term):
+        places = []
+        for entity_id in ids:
+            place = dict(index.places[entity_id])
+            if term:
+                start = _match_start(place.get('name', ''), term)
+                if start >= 0:
+                    place['highlight'] = {'name': [{'start': start, 'end': start + len(term)}]}
+            places.append(place)
+        return places
+
+    def suggest(self, market, locale, term, allow_network=True):
+        """
+        Места для запроса
+
+        Args:
+            market (str): Рынок ('UK')
+            locale (str): Локаль ('en-GB')
+            term (str): Введенный текст ('' — популярные места)
+            allow_network (bool): Запрашивать провайдера, если ответа нет в кэше
+
+        Returns:
+            dict: {'places': [...], 'source': 'cache' | 'prefix' | 'network' | 'local'}
+        """
+        norm_term = normalize_term(term)
+        with self.lock:
+            index = self._market(market, locale)
+            source, ids = self._cached(index, norm_term)
+            if source is not None:
+                self.stats[source] += 1
+                return {'places': self._places(index, ids, norm_term), 'source': source}
+
+        if allow_network:
+            response = self.fetch(market, locale, term)
+            if response is not None:
+                self.add_response(market, locale, term, response)
+                with self.lock:
+                    self.stats['network'] += 1
+                return {'places': response.get('places', []), 'source': 'network'}
+
+        return {'places': self.suggest_local(market, locale, term), 'source': 'local'}
+
+    def suggest_local(self, market, locale, term, limit=None):
+        """
+        Лучшее, что известно локально, без обращения к провайдеру
+
+        Подходит для мгновенного ответа, пока идет запрос: места из дерева,
+        совпадающие по префиксу, — сначала совпадения с начала названия.
+        """
+        norm_term = normalize_term(term)
+        limit = limit or self.page_size
+        with self.lock:
+            index = self._market(market, locale)
+            if not norm_term:
+                entry = index.responses.get('')
+                ids = entry[0] if entry else list(index.places)
+            else:
+                ids = sorted(index.matching_ids(norm_term),
+                             key=lambda entity_id: (_match_start(index.places[entity_id].get('name', ''),
+                                                                 norm_term) != 0,
+                                                    index.places[entity_id].get('name', '')))
+            return self._places(index, ids[:limit], norm_term)
+
+    def place(self, market, locale, entity_id):
+        """Место по entityId из дерева или None"""
+        with self.lock:
+            return self._market(market, locale).places.get(entity_id)
@@ -0,0 +1,321 @@
+"""
+Пакетное геокодирование файла адресов через Nominatim с контрольными точками
+
+Читает CSV или JSONL потоком, повторяющиеся запросы геокодирует один раз,
+использует общий кэш (GeoCache, те же ключи, что у NominatimClient) и общий
+ограничитель частоты, пишет результаты в JSONL (или Parquet в конце).
+
+Прогресс сохраняется в файл <output>.checkpoint.json: номер следующей
+строки входа и размер уже записанного выхода. Прерванный запуск (Ctrl+C,
+kill) продолжается с того же места той же командой; недописанный хвост
+выхода отбрасывается.
+
+Запуск:
+    python -m common.bulk_geocode addresses.csv result.jsonl --column address \\
+        --user-agent "MyApp/1.0 (me@example.com)"
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import requests
+
+from common.geocache import GeoCache, normalize_query
+from common.ratelimit import get_rate_limiter
+from common.transport import get_session
+
+DEFAULT_BASE_URL = "https://nominatim.openstreetmap.org"
+DEFAULT_CACHE_PATH = "nominatim_cache.sqlite"
+# Как часто сохранять контрольную точку и печатать прогресс
+CHECKPOINT_EVERY_ROWS = 100
+CHECKPOINT_EVERY_SECONDS = 30
+PROGRESS_EVERY_SECONDS = 10
+MAX_RETRIES = 3
+
+
+def read_rows(path, fmt=None):
+    """
+    Строки входного файла по одной
+
+    Yields:
+        dict: Строка CSV (по заголовку) или объект JSONL
+    """
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def count_rows(path, fmt=None):
+    """Количество строк входа (для ETA)"""
+    return sum(1 for _ in read_rows(path, fmt))
+
+
+def build_query(row, columns):
+    """Текст запроса из одной или нескольких колонок строки"""
+    parts = [str(row.get(column) or '').strip() for column in columns]
+    return ', '.join(part for part in parts if part)
+
+
+def summarize(result):
+    """Лучший результат Nominatim в компактном виде"""
+    address = result.get('address', {})
+    return {
+        'lat': float(result['lat']),
+        'lon': float(result['lon']),
+        'display_name': result.get('display_name'),
+        'osm_id': f"{result.get('osm_type', '')[:1].upper()}{result.get('osm_id')}",
+        'type': result.get('addresstype') or result.get('type'),
+        'country_code': address.get('country_code'),
+        'importance': result.get('importance')
+    }
+
+
+class NominatimBatchGeocoder:
+    """Геокодирование запросов с кэшем, общим ограничением частоты и повторами"""
+
+    def __init__(self, user_agent, base_url=DEFAULT_BASE_URL, cache=None, limit=1):
+        """
+        Args:
+            user_agent (str): User-Agent приложения (обязателен по правилам Nominatim)
+            base_url (str): Адрес сервера Nominatim
+            cache (GeoCache): Общий кэш ответов
+            limit (int): Сколько результатов возвращать на запрос
+        """
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.headers = {'User-Agent': user_agent}
+        self.session = get_session()
+        self.rate_limiter = get_rate_limiter()
+        # Запрос и ключ кэша — с параметрами по умолчанию NominatimClient.search
+        # (limit=10), поэтому кэш общий; лишние результаты отсекаются после
+        self.params = {'format': 'json', 'addressdetails': 1, 'limit': 10}
+        self.limit = limit
+        self.requests = 0
+        self.cache_hits = 0
+
+    def search(self, query):
+        """
+        Returns:
+            list: Результаты Nominatim (пустой список — не найдено)
+
+        Raises:
+            requests.exceptions.RequestException: если все попытки неудачны
+        """
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.search_key(query, self.params)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached[:self.limit]
+
+        for attempt in range(MAX_RETRIES):
+            self.rate_limiter.acquire('nominatim', self.base_url)
+            self.requests += 1
+            try:
+                response = self.session.get(f"{self.base_url}/search", headers=self.headers,
+                                            params={**self.params, 'q': query})
+                self.rate_limiter.report_response('nominatim', self.base_url, response)
+                response.raise_for_status()
+                results = response.json()
+                if cache_key:
+                    self.cache.put(cache_key, results, kind='search')
+                return results[:self.limit]
+            except requests.exceptions.RequestException:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
+
+class Checkpoint:
+    """Контрольная точка: следующая строка входа и размер записанного выхода"""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {'next_row': 0, 'output_bytes': 0, 'counts': {}}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.state.update(json.load(f))
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def write_parquet(jsonl_path, parquet_path):
+    """Перевести итоговый JSONL в Parquet (нужен pyarrow)"""
+    try:
+        import pyarrow.json as pa_json
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Для записи Parquet требуется пакет pyarrow: pip install pyarrow")
+    pq.write_table(pa_json.read_json(jsonl_path), parquet_path)
+
+
+def run(input_path, output_path, columns, geocoder, input_format=None, total=None, restart=False):
+    """
+    Геокодировать файл
+
+    Args:
+        input_path (str): CSV или JSONL
+        output_path (str): Результат .jsonl или .parquet
+        columns (list): Колонки (поля), из которых собирается запрос
+        geocoder (NominatimBatchGeocoder): Геокодер
+        input_format (str): 'csv' или 'jsonl' (по умолчанию по расширению)
+        total (int): Количество строк входа для ETA (None — не считать)
+        restart (bool): Начать заново, игнорируя контрольную точку
+
+    Returns:
+        dict: Счетчики статусов ok / not_found / error / empty
+    """
+    parquet = output_path.endswith('.parquet')
+    jsonl_path = f"{output_path}.jsonl" if parquet else output_path
+    checkpoint = Checkpoint(f"{output_path}.checkpoint.json")
+    if restart:
+        checkpoint.remove()
+        checkpoint = Checkpoint(checkpoint.path)
+
+    state = checkpoint.state
+    counts = {'ok': 0, 'not_found': 0, 'error': 0, 'empty': 0, **state.get('counts', {})}
+    start_row = state['next_row']
+
+    # Все, что записано после последней контрольной точки, пишется заново
+    mode = 'r+b' if start_row and os.path.exists(jsonl_path) else 'wb'
+    out = open(jsonl_path, mode)
+    out.truncate(state['output_bytes'] if mode == 'r+b' else 0)
+    out.seek(0, os.SEEK_END)
+
+    if start_row:
+        print(f"Продолжение со строки {start_row} ({sum(counts.values())} уже обработано)")
+
+    resolved = {}
+    started = time.monotonic()
+    last_checkpoint = last_progress = started
+    row_number = start_row
+    processed = 0
+
+    def save_checkpoint():
+        out.flush()
+        os.fsync(out.fileno())
+        state.update(next_row=row_number, output_bytes=out.tell(), counts=counts)
+        checkpoint.save()
+
+    def report():
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        line = (f"строк {row_number}" + (f"/{total}" if total else "") +
+                f" | {rate:.1f} строк/с | запросов {geocoder.requests}, из кэша {geocoder.cache_hits}, "
+                f"повторов в файле {duplicates}")
+        if total and rate > 0:
+            line += f" | осталось ~{format_duration((total - row_number) / rate)}"
+        print(line, flush=True)
+
+    duplicates = 0
+    try:
+        for index, row in enumerate(read_rows(input_path, input_format)):
+            if index < start_row:
+                continue
+            query = build_query(row, columns)
+            key = normalize_query(query)
+            record = {'row': index, 'query': query, 'input': row}
+
+            if not key:
+                record['status'] = 'empty'
+            else:
+                if key in resolved:
+                    duplicates += 1
+                else:
+                    try:
+                        results = geocoder.search(query)
+                        resolved[key] = ('ok', summarize(results[0])) if results else ('not_found', None)
+                    except requests.exceptions.RequestException as e:
+                        # Ошибки не запоминаем: повтор этого запроса ниже по файлу попробует снова
+                        record['status'], record['error'] = 'error', str(e)
+                if 'status' not in record:
+                    record['status'], record['result'] = resolved[key]
+            counts[record['status']] += 1
+
+            out.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+            row_number = index + 1
+            processed += 1
+
+            now = time.monotonic()
+            if processed % CHECKPOINT_EVERY_ROWS == 0 or now - last_checkpoint >= CHECKPOINT_EVERY_SECONDS:
+                save_checkpoint()
+                last_checkpoint = now
+            if now - last_progress >= PROGRESS_EVERY_SECONDS:
+                report()
+                last_progress = now
+    except KeyboardInterrupt:
+        save_checkpoint()
+        out.close()
+        print(f"\nОстановлено на строке {row_number}; повторите команду, чтобы продолжить")
+        raise
+
+    save_checkpoint()
+    out.close()
+    report()
+
+    if parquet:
+        write_parquet(jsonl_path, output_path)
+        os.remove(jsonl_path)
+    checkpoint.remove()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетное геокодирование CSV/JSONL через Nominatim")
+    parser.add_argument('input', help="Входной файл .csv или .jsonl")
+    parser.add_argument('output', help="Результат .jsonl или .parquet")
+    parser.add_argument('--column', action='append', dest='columns',
+                        help="Колонка с адресом; можно указать несколько (склеиваются через запятую)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="Формат входа (по умолчанию по расширению)")
+    parser.add_argument('--user-agent', required=True, help="User-Agent (обязателен по правилам Nominatim)")
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help="Сервер Nominatim")
+    parser.add_argument('--rate', type=float, help="Запросов в секунду (для своего сервера Nominatim)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Файл кэша ('' — без кэша)")
+    parser.add_argument('--no-count', action='store_true', help="Не считать строки заранее (без ETA)")
+    parser.add_argument('--restart', action='store_true', help="Начать заново, игнорируя контрольную точку")
+    args = parser.parse_args(argv)
+
+    if args.rate:
+        get_rate_limiter().set_quota('nominatim', args.rate, max(1, int(args.rate)))
+    cache = GeoCache(args.cache) if args.cache else None
+    geocoder = NominatimBatchGeocoder(args.user_agent, args.base_url, cache)
+    total = None if args.no_count else count_rows(args.input, args.format)
+
+    try:
+        counts = run(args.input, args.output, args.columns or ['address'], geocoder,
+                     args.format, total, args.restart)
+    except KeyboardInterrupt:
+        return 130
+    print(f"Готово: {json.dumps(counts, ensure_ascii=False)}")
+    if cache:
+        print(f"Кэш: {cache.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Координатор параллельного опроса провайдеров (fan-out)
+
+Один запрос путешественника рассылается сразу нескольким провайдерам
+(отели, аренда авто, события). Координатор ограничивает параллелизм
+на каждого провайдера и глобально, соблюдает общий дедлайн и возвращает
+частичные результаты, если кто-то из провайдеров не успел ответить.
+"""
+
+import asyncio
+import functools
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Ограничения по умолчанию
+DEFAULT_GLOBAL_LIMIT = 20
+DEFAULT_PROVIDER_LIMIT = 4
+DEFAULT_DEADLINE = 15.0
+
+
+class FanOutCoordinator:
+    """Параллельный опрос провайдеров с лимитами и общим дедлайном"""
+
+    def __init__(self, global_limit=DEFAULT_GLOBAL_LIMIT, provider_limits=None,
+                 default_provider_limit=DEFAULT_PROVIDER_LIMIT, deadline=DEFAULT_DEADLINE):
+        """
+        Args:
+            global_limit (int): Максимум одновременных вызовов по всем провайдерам
+            provider_limits (dict): Лимиты по провайдерам {'hotelbeds': 2, ...}
+            default_provider_limit (int): Лимит для провайдеров без явной настройки
+            deadline (float): Общий дедлайн в секундах
+        """
+        self.global_limit = global_limit
+        self.provider_limits = dict(provider_limits or {})
+        self.default_provider_limit = default_provider_limit
+        self.deadline = deadline
+        self.calls = []
+
+    def submit(self, provider, func, *args, **kwargs):
+        """
+        Добавить вызов провайдера
+
+        Args:
+            provider (str): Имя провайдера (ключ для лимитов и результатов)
+            func: Корутинная функция или обычная функция; обычная
+                выполняется в пуле потоков
+            *args, **kwargs: Аргументы вызова
+
+        Returns:
+            int: Порядковый номер вызова
+        """
+        self.calls.append((provider, func, args, kwargs))
+        return len(self.calls) - 1
+
+    async def _call(self, provider, func, args, kwargs, global_sem, provider_sems, executor):
+        # Сначала слот провайдера, потом глобальный: ожидающий вызов
+        # не должен занимать глобальный слот
+        async with provider_sems[provider]:
+            async with global_sem:
+                if inspect.iscoroutinefunction(func):
+                    return await func(*args, **kwargs)
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+                # Обычный метод асинхронного клиента может вернуть корутину
+                # (например, search_by_coordinates у AsyncSabreGeoSearchAPI)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+
+    async def run(self, deadline=None):
+        """
+        Выполнить все добавленные вызовы
+
+        Args:
+            deadline (float): Дедлайн в секундах (по умолчанию из конструктора)
+
+        Returns:
+            dict: {
+                'results': {провайдер: [результаты в порядке submit]},
+                'errors': {провайдер: [описания ошибок]},
+                'timed_out': {провайдер: число вызовов, не успевших к дедлайну},
+                'complete': True, если ответили все,
+                'elapsed': время выполнения в секундах
+            }
+        """
+        deadline = self.deadline if deadline is None else deadline
+        started = time.monotonic()
+
+        global_sem = asyncio.Semaphore(self.global_limit)
+        provider_sems = {
+            provider: asyncio.Semaphore(self.provider_limits.get(provider, self.default_provider_limit))
+            for provider, _, _, _ in self.calls
+        }
+
+        # Свой пул для обычных функций: поток нельзя прервать, поэтому после
+        # дедлайна пул закрывается без ожидания, а не как пул по умолчанию,
+        # которого asyncio.run ждет до завершения всех вызовов
+        executor = ThreadPoolExecutor(max_workers=self.global_limit, thread_name_prefix='fanout')
+        tasks = [
+            asyncio.create_task(self._call(provider, func, args, kwargs, global_sem, provider_sems, executor))
+            for provider, func, args, kwargs in self.calls
+        ]
+
+        try:
+            if tasks:
+                _, pending = await asyncio.wait(tasks, timeout=deadline)
+            else:
+                pending = set()
+
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        summary = {
+            'results': {},
+            'errors': {},
+            'timed_out': {},
+            'complete': not pending,
+            'elapsed': time.monotonic() - started
+        }
+
+        for (provider, _, _, _), task in zip(self.calls, tasks):
+            if task in pending:
+                summary['timed_out'][provider] = summary['timed_out'].get(provider, 0) + 1
+            elif task.exception() is not None:
+                summary['errors'].setdefault(provider, []).append(str(task.exception()))
+            else:
+                summary['results'].setdefault(provider, []).append(task.result())
+
+        return summary
+
+
+def run_fanout(coordinator, deadline=None):
+    """Синхронная обертка для запуска координатора из обычного кода"""
+    return asyncio.run(coordinator.run(deadline))
+
+
+if __name__ == "__main__":
+    # Демонстрация на имитированных провайдерах с разной задержкой
+    import json
+
+    async def simulated_provider(name, delay):
+        await asyncio.sleep(delay)
+        return {'provider': name, 'delay': delay}
+
+    coordinator = FanOutCoordinator(provider_limits={'sabre': 1}, deadline=1.0)
+    coordinator.submit('hotelbeds', simulated_provider, 'hotelbeds', 0.2)
+    coordinator.submit('booking', simulated_provider, 'booking', 0.4)
+    coordinator.submit('agoda', simulated_provider, 'agoda', 3.0)  # не успеет
+    coordinator.submit('sabre', simulated_provider, 'sabre', 0.3)
+    coordinator.submit('sabre', simulated_provider, 'sabre', 0.3)  # ждет слот провайдера
+    coordinator.submit('predicthq', simulated_provider, 'predicthq', 0.1)
+
+    summary = run_fanout(coordinator)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
@@ -0,0 +1,239 @@
+"""
+Постоянный кэш ответов геокодеров с учетом координат
+
+Кэш хранится в SQLite. Ключи строятся из нормализованного запроса
+(регистр, пробелы, порядок параметров) или из округленных координат.
+Поддерживаются TTL, вытеснение давно не использованных записей (LRU)
+и ответы на обратное геокодирование по ближайшей закэшированной точке
+в пределах заданного расстояния. Счетчики попаданий показывают hit rate.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+import time
+
+# Время жизни записи по умолчанию — 30 дней
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 100000
+# Точность округления координат в ключе (5 знаков ~ 1 м)
+COORD_PRECISION = 5
+# Радиус, в пределах которого обратное геокодирование берется из соседней точки
+DEFAULT_REVERSE_RADIUS_M = 25
+
+# Как часто (в записях) проверять переполнение кэша
+EVICT_CHECK_EVERY = 64
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Расстояние между двумя точками в метрах"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def normalize_query(query):
+    """Нормализовать текст запроса: регистр и лишние пробелы"""
+    if query is None:
+        return ''
+    return ' '.join(str(query).lower().split())
+
+
+def normalize_params(params):
+    """Параметры запроса в каноническом виде (отсортированы, значения — строки)"""
+    return json.dumps(
+        {k: normalize_query(v) for k, v in sorted((params or {}).items()) if v is not None},
+        sort_keys=True, ensure_ascii=False
+    )
+
+
+class GeoCache:
+    """Кэш ответов геокодера в SQLite"""
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 reverse_radius_m=DEFAULT_REVERSE_RADIUS_M):
+        """
+        Args:
+            path (str): Путь к файлу базы (':memory:' — кэш только в памяти)
+            ttl (int): Время жизни записи в секундах
+            max_entries (int): Максимум записей, лишние вытесняются по LRU
+            reverse_radius_m (float): Радиус поиска соседней точки для reverse
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.reverse_radius_m = reverse_radius_m
+        self.hits = 0
+        self.misses = 0
+        self.puts_since_evict = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL делает частые мелкие коммиты (обновление времени доступа) дешевыми
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS geocache (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                variant TEXT NOT NULL DEFAULT '',
+                lat REAL,
+                lon REAL,
+                payload TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS geocache_point ON geocache (kind, variant, lat, lon);
+            CREATE INDEX IF NOT EXISTS geocache_accessed ON geocache (accessed);
+        ''')
+        self.conn.commit()
+
+    # --- ключи
+
+    @staticmethod
+    def search_key(query, params=None):
+        """Ключ для /search"""
+        return f"search|{normalize_query(query)}|{normalize_params(params)}"
+
+    @staticmethod
+    def reverse_key(lat, lon, params=None):
+        """Ключ для /reverse по округленным координатам"""
+        return (f"reverse|{round(float(lat), COORD_PRECISION)},{round(float(lon), COORD_PRECISION)}"
+                f"|{normalize_params(params)}")
+
+    @staticmethod
+    def lookup_key(osm_id, params=None):
+        """Ключ для /lookup одного OSM ID"""
+        return f"lookup|{str(osm_id).strip().upper()}|{normalize_params(params)}"
+
+    # --- чтение и запись
+
+    def get(self, key):
+        """
+        Получить значение по ключу
+
+        Returns:
+            Сохраненное значение или None (нет записи или истек TTL)
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT payload, created FROM geocache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.conn.execute('UPDATE geocache SET accessed = ? WHERE key = ?', (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value, kind='', lat=None, lon=None, variant=''):
+        """
+        Сохранить значение
+
+        Args:
+            key (str): Ключ (search_key / reverse_key / lookup_key)
+            value: JSON-сериализуемый ответ
+            kind (str): Тип запроса ('search', 'reverse', 'lookup')
+            lat, lon (float): Координаты точки (для поиска соседей при reverse)
+            variant (str): Нормализованные параметры (соседи ищутся только с теми же)
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO geocache (key, kind, variant, lat, lon, payload, created, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, kind, variant, lat, lon, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def get_reverse(self, lat, lon, params=None):
+        """
+        Ответ обратного геокодирования из кэша
+
+        Сначала ищется точное совпадение округленных координат, затем
+        ближайшая закэшированная точка в радиусе reverse_radius_m.
+        """
+        value = self.get(self.reverse_key(lat, lon, params))
+        if value is not None or self.reverse_radius_m <= 0:
+            return value
+
+        lat, lon = float(lat), float(lon)
+        dlat = math.degrees(self.reverse_radius_m / EARTH_RADIUS_M)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT key, lat, lon, payload FROM geocache '
+                'WHERE kind = ? AND variant = ? AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ? '
+                'AND created >= ?',
+                ('reverse', normalize_params(params), lat - dlat, lat + dlat,
+                 lon - dlon, lon + dlon, now - self.ttl)
+            ).fetchall()
+
+            best = None
+            for key, row_lat, row_lon, payload in rows:
+                distance = haversine_m(lat, lon, row_lat, row_lon)
+                if distance <= self.reverse_radius_m and (best is None or distance < best[0]):
+                    best = (distance, key, payload)
+
+            if best is None:
+                return None
+            # Промах по точному ключу уже посчитан в get(), засчитываем попадание
+            self.misses -= 1
+            self.hits += 1
+            self.conn.execute('UPDATE geocache SET accessed = ? WHERE key = ?', (now, best[1]))
+            self.conn.commit()
+        return json.loads(best[2])
+
+    def put_reverse(self, lat, lon, value, params=None):
+        """Сохранить ответ обратного геокодирования"""
+        self.put(self.reverse_key(lat, lon, params), value, kind='reverse',
+                 lat=float(lat), lon=float(lon), variant=normalize_params(params))
+
+    def _evict(self):
+        # Подсчет записей дорогой, проверяем переполнение пачками
+        self.puts_since_evict += 1
+        if self.puts_since_evict < EVICT_CHECK_EVERY:
+            return
+        self.puts_since_evict = 0
+        count = self.conn.execute('SELECT COUNT(*) FROM geocache').fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                'DELETE FROM geocache WHERE key IN '
+                '(SELECT key FROM geocache ORDER BY accessed LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def purge_expired(self):
+        """Удалить записи с истекшим TTL"""
+        with self.lock:
+            self.conn.execute('DELETE FROM geocache WHERE created < ?', (time.time() - self.ttl,))
+            self.conn.commit()
+
+    def stats(self):
+        """
+        Статистика кэша
+
+        Returns:
+            dict: hits, misses, hit_rate, entries
+        """
+        with self.lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM geocache').fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries
+        }
+
+    def close(self):
+        """Закрыть базу"""
+        with self.lock:
+            self.conn.close()
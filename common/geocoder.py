@@ -0,0 +1,596 @@
+"""
+Единый геокодер поверх нескольких провайдеров
+
+Геокодирование есть у Nominatim, HERE, Mapbox (v6), GeoDB Cities,
+Booking.com (common/locations/cities) и Amadeus (reference-data/locations/cities).
+Geocoder выбирает для каждого запроса провайдера по стоимости, текущей
+задержке и доле ошибок (скользящие средние) и по оставшейся квоте
+(ограничитель частоты и суточный лимит). Если основной провайдер отвечает
+дольше обычного, запрос дублируется следующему (hedging); результаты
+приводятся к одной модели места и объединяются.
+
+Виды запросов: geocode (адрес или название -> места), reverse (координаты
+-> места), cities (поиск городов по названию).
+"""
+
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from common.geocache import haversine_m
+from common.hotel_identity import name_similarity, normalize_name
+from common.ratelimit import get_rate_limiter
+from common.transport import get_session
+
+KINDS = ('geocode', 'reverse', 'cities')
+
+DEFAULT_DEADLINE = 5.0
+# Задержка до первого ответа, пока статистики еще нет
+DEFAULT_LATENCY = 0.5
+# Дублировать запрос, если основной провайдер не ответил за столько своих средних задержек
+HEDGE_FACTOR = 2.0
+MIN_HEDGE_DELAY = 0.1
+EWMA_ALPHA = 0.2
+
+# Вес слагаемых оценки провайдера: стоимость запроса (условные единицы),
+# ожидаемая задержка (с), доля ошибок
+COST_WEIGHT = 1.0
+LATENCY_WEIGHT = 1.0
+ERROR_WEIGHT = 5.0
+
+# Места разных провайдеров ближе этого расстояния с похожими названиями — одно место
+MERGE_RADIUS_M = {'city': 10000}
+DEFAULT_MERGE_RADIUS_M = 200
+MERGE_NAME_THRESHOLD = 0.8
+
+
+def make_place(provider, provider_id, name, latitude, longitude, place_type=None,
+               country_code=None, region=None, address=None, score=None):
+    """Место в общем формате"""
+    return {
+        'name': name,
+        'latitude': float(latitude) if latitude is not None else None,
+        'longitude': float(longitude) if longitude is not None else None,
+        'type': place_type,
+        'country_code': country_code.upper() if country_code else None,
+        'region': region,
+        'address': address,
+        'score': score,
+        'sources': [{'provider': provider, 'id': str(provider_id) if provider_id is not None else None}]
+    }
+
+
+# --- нормализация ответов
+
+def normalize_nominatim(results):
+    """Ответ Nominatim /search, /reverse или /lookup -> места"""
+    if isinstance(results, dict):
+        results = [] if 'error' in results else [results]
+    places = []
+    for result in results or []:
+        address = result.get('address', {})
+        places.append(make_place(
+            'nominatim', f"{result.get('osm_type', '')[:1].upper()}{result.get('osm_id')}",
+            result.get('name') or result.get('display_name', '').split(',')[0],
+            result.get('lat'), result.get('lon'),
+            result.get('addresstype') or result.get('type'),
+            address.get('country_code'), address.get('state'),
+            result.get('display_name'), result.get('importance')
+        ))
+    return places
+
+
+def normalize_mapbox(response):
+    """Ответ Mapbox Geocoding v6 (FeatureCollection) -> места"""
+    places = []
+    for feature in (response or {}).get('features', []):
+        props = feature.get('properties', {})
+        coords = props.get('coordinates') or {}
+        latitude, longitude = coords.get('latitude'), coords.get('longitude')
+        if latitude is None and feature.get('geometry'):
+            longitude, latitude = feature['geometry']['coordinates'][:2]
+        context = props.get('context', {})
+        places.append(make_place(
+            'mapbox', props.get('mapbox_id') or feature.get('id'), props.get('name'),
+            latitude, longitude, props.get('feature_type'),
+            context.get('country', {}).get('country_code'), context.get('region', {}).get('name'),
+            props.get('full_address') or props.get('place_formatted'),
+            props.get('match_code', {}).get('confidence') if isinstance(props.get('match_code'), dict) else None
+        ))
+    return places
+
+
+def normalize_here(response):
+    """Ответ HERE Geocoder 6.2 (reversegeocode, в том числе retrieveLandmarks) -> места"""
+    places = []
+    for view in (response or {}).get('Response', {}).get('View', []):
+        for result in view.get('Result', []):
+            location = result.get('Location', {})
+            position = location.get('DisplayPosition', {})
+            address = location.get('Address', {})
+            places.append(make_place(
+                'here', location.get('LocationId'), location.get('Name') or address.get('Label'),
+                position.get('Latitude'), position.get('Longitude'),
+                location.get('LocationType') or result.get('MatchLevel'),
+                None, address.get('State'), address.get('Label'), result.get('Relevance')
+            ))
+    return places
+
+
+def normalize_geodb(response):
+    """Ответ GeoDB Cities /v1/geo/cities -> места"""
+    places = []
+    for city in (response or {}).get('data', []):
+        places.append(make_place(
+            'geodb', city.get('wikiDataId') or city.get('id'), city.get('name') or city.get('city'),
+            city.get('latitude'), city.get('longitude'), (city.get('type') or 'city').lower(),
+            city.get('countryCode'), city.get('region'), None, city.get('population')
+        ))
+    return places
+
+
+def normalize_booking_cities(response, language='en-gb'):
+    """Ответ Booking.com common/locations/cities -> места"""
+    places = []
+    for city in (response or {}).get('data', []):
+        name = city.get('name')
+        if isinstance(name, dict):
+            name = name.get(language) or next(iter(name.values()), None)
+        location = city.get('location') or city.get('coordinates') or {}
+        places.append(make_place(
+            'booking', city.get('id'), name, location.get('latitude'), location.get('longitude'),
+            'city', city.get('country'), None, None, city.get('number_of_accommodations')
+        ))
+    return places
+
+
+def normalize_amadeus_cities(response):
+    """Ответ Amadeus reference-data/locations/cities (или результат AmadeusClient.search_cities) -> места"""
+    data = (response or {}).get('data', {})
+    if isinstance(data, dict):
+        data = data.get('data', [])
+    places = []
+    for city in data or []:
+        geo = city.get('geoCode', {})
+        address = city.get('address', {})
+        places.append(make_place(
+            'amadeus', city.get('iataCode') or city.get('id'), city.get('name'),
+            geo.get('latitude'), geo.get('longitude'), (city.get('subType') or 'city').lower(),
+            address.get('countryCode'), address.get('stateCode'), None, None
+        ))
+    return places
+
+
+# --- провайдеры
+
+class GeocoderProvider:
+    """Провайдер геокодирования: функции по видам запросов, стоимость и статистика"""
+
+    def __init__(self, name, geocode=None, reverse=None, cities=None, cost=0.0,
+                 daily_quota=None, rate_limit=None, cities_need_country=False):
+        """
+        Args:
+            name (str): Имя провайдера
+            geocode (callable): geocode(query, limit) -> места
+            reverse (callable): reverse(latitude, longitude, limit) -> места
+            cities (callable): cities(keyword, country_code, limit) -> места
+            cost (float): Стоимость запроса в условных единицах (0 — бесплатно)
+            daily_quota (int): Максимум запросов в сутки (UTC), None — без ограничения
+            rate_limit (tuple): (провайдер, ключ) в общем ограничителе частоты
+            cities_need_country (bool): Поиск городов работает только с кодом страны
+        """
+        self.name = name
+        self.functions = {'geocode': geocode, 'reverse': reverse, 'cities': cities}
+        self.cost = cost
+        self.daily_quota = daily_quota
+        self.rate_limit = rate_limit
+        self.cities_need_country = cities_need_country
+        self.lock = threading.Lock()
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.day = None
+        self.used_today = 0
+
+    def supports(self, kind, params):
+        if self.functions.get(kind) is None:
+            return False
+        if kind == 'cities' and self.cities_need_country and not params.get('country_code'):
+            return False
+        return True
+
+    def _today(self):
+        today = datetime.now(timezone.utc).date()
+        if self.day != today:
+            self.day = today
+            self.used_today = 0
+
+    def quota_left(self):
+        """Сколько запросов осталось на сегодня (None — без ограничения)"""
+        with self.lock:
+            self._today()
+            return None if self.daily_quota is None else self.daily_quota - self.used_today
+
+    def expected_latency(self):
+        """Ожидаемая задержка ответа в секундах, с учетом ожидания квоты частоты"""
+        latency = DEFAULT_LATENCY if self.latency is None else self.latency
+        if self.rate_limit is not None:
+            latency += get_rate_limiter().wait_time(*self.rate_limit)
+        return latency
+
+    def score(self):
+        """Оценка для выбора: чем меньше, тем лучше"""
+        return (COST_WEIGHT * self.cost + LATENCY_WEIGHT * self.expected_latency()
+                + ERROR_WEIGHT * self.error_rate)
+
+    def call(self, kind, params):
+        """Выполнить запрос и обновить статистику"""
+        with self.lock:
+            self._today()
+            self.used_today += 1
+        started = time.monotonic()
+        try:
+            func = self.functions[kind]
+            if kind == 'geocode':
+                result = func(params['query'], params.get('limit', 10))
+            elif kind == 'reverse':
+                result = func(params['latitude'], params['longitude'], params.get('limit', 10))
+            else:
+                result = func(params['keyword'], params.get('country_code'), params.get('limit', 10))
+        except Exception:
+            self._record(time.monotonic() - started, failed=True)
+            raise
+        # None — ошибка провайдера (клиенты репозитория возвращают None вместо исключения)
+        self._record(time.monotonic() - started, failed=result is None)
+        if result is None:
+            raise RuntimeError(f"{self.name}: нет ответа")
+        return result
+
+    def _record(self, elapsed, failed):
+        with self.lock:
+            self.calls += 1
+            self.errors += int(failed)
+            self.error_rate += EWMA_ALPHA * (float(failed) - self.error_rate)
+            if not failed:
+                self.latency = elapsed if self.latency is None else \
+                    self.latency + EWMA_ALPHA * (elapsed - self.latency)
+
+    def stats(self):
+        """Статистика провайдера"""
+        with self.lock:
+            self._today()
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'error_rate': round(self.error_rate, 3),
+                'latency': round(self.latency, 3) if self.latency is not None else None,
+                'used_today': self.used_today,
+                'cost': self.cost
+            }
+
+
+def nominatim_provider(client, cost=0.0):
+    """
+    Провайдер на основе NominatimClient (все виды запросов)
+
+    search/reverse клиента при ошибке печатают ее и возвращают []/None, и пустой
+    список не отличить от "ничего не найдено". Поэтому запросы идут через
+    client._get (с тем же кэшем и ограничением частоты), а ошибка HTTP
+    поднимается исключением и учитывается в статистике провайдера.
+    """
+    cache = getattr(client, 'cache', None)
+
+    def request(path, params):
+        client._wait_if_needed()
+        response = client._get(f"{client.base_url}/{path}", params)
+        response.raise_for_status()
+        return response.json()
+
+    def search(query, **params):
+        request_params = {'format': 'json', 'addressdetails': 1, 'limit': 10, **params}
+        cache_key = cache.search_key(query, request_params) if cache else None
+        cached = cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return normalize_nominatim(cached)
+        results = request('search', {**request_params, 'q': query})
+        if cache_key:
+            cache.put(cache_key, results, kind='search')
+        return normalize_nominatim(results)
+
+    def reverse(latitude, longitude, limit):
+        variant_params = {'format': 'json', 'addressdetails': 1}
+        cached = cache.get_reverse(latitude, longitude, variant_params) if cache else None
+        if cached is not None:
+            return normalize_nominatim(cached)
+        result = request('reverse', {'lat': latitude, 'lon': longitude, **variant_params})
+        # "Unable to geocode" — корректный ответ без мест, в кэш не попадает
+        if cache and 'error' not in result:
+            cache.put_reverse(latitude, longitude, result, variant_params)
+        return normalize_nominatim(result)
+
+    def cities(keyword, country_code, limit):
+        params = {'featureType': 'city', 'limit': limit}
+        if country_code:
+            params['countrycodes'] = country_code.lower()
+        return search(keyword, **params)
+
+    return GeocoderProvider(
+        'nominatim',
+        geocode=lambda query, limit: search(query, limit=limit),
+        reverse=reverse, cities=cities, cost=cost, rate_limit=('nominatim', client.base_url)
+    )
+
+
+def here_provider(api, radius=1000, cost=1.0, daily_quota=None):
+    """Провайдер на основе HereGeocoderAPI (обратное геокодирование с достопримечательностями)"""
+    def reverse(latitude, longitude, limit):
+        response = api.search_landmarks(latitude, longitude, radius)
+        return None if response is None else normalize_here(response)[:limit]
+
+    return GeocoderProvider('here', reverse=reverse, cost=cost, daily_quota=daily_quota)
+
+
+def mapbox_provider(access_token, cost=0.75, daily_quota=None):
+    """Провайдер Mapbox Geocoding v6 (прямое и обратное геокодирование)"""
+    session = get_session()
+    base_url = "https://api.mapbox.com/search/geocode/v6"
+
+    def request(path, params):
+        response = session.get(f"{base_url}/{path}", params={**params, 'access_token': access_token})
+        if response.status_code != 200:
+            print(f"Mapbox: ошибка {response.status_code}: {response.text[:200]}")
+            return None
+        return normalize_mapbox(response.json())
+
+    def cities(keyword, country_code, limit):
+        params = {'q': keyword, 'types': 'place', 'limit': limit}
+        if country_code:
+            params['country'] = country_code.lower()
+        return request('forward', params)
+
+    return GeocoderProvider(
+        'mapbox',
+        geocode=lambda query, limit: request('forward', {'q': query, 'limit': limit}),
+        reverse=lambda latitude, longitude, limit: request(
+            'reverse', {'latitude': latitude, 'longitude': longitude, 'limit': limit}),
+        cities=cities, cost=cost, daily_quota=daily_quota
+    )
+
+
+def geodb_provider(api_key, cost=0.5, daily_quota=None):
+    """Провайдер GeoDB Cities через RapidAPI (поиск городов)"""
+    session = get_session()
+    headers = {'X-RapidAPI-Key': api_key, 'X-RapidAPI-Host': 'wft-geo-db.p.rapidapi.com'}
+
+    def cities(keyword, country_code, limit):
+        params = {'namePrefix': keyword, 'limit': min(limit, 10), 'types': 'CITY'}
+        if country_code:
+            params['countryIds'] = country_code.upper()
+        get_rate_limiter().acquire('rapidapi', api_key)
+        response = session.get("https://wft-geo-db.p.rapidapi.com/v1/geo/cities",
+                               headers=headers, params=params)
+        get_rate_limiter().report_response('rapidapi', api_key, response)
+        if response.status_code != 200:
+            print(f"GeoDB: ошибка {response.status_code}: {response.text[:200]}")
+            return None
+        return normalize_geodb(response.json())
+
+    return GeocoderProvider('geodb', cities=cities, cost=cost, daily_quota=daily_quota,
+                            rate_limit=('rapidapi', api_key))
+
+
+def booking_cities_provider(api_key, affiliate_id, language='en-gb', cost=0.0):
+    """
+    Провайдер Booking.com common/locations/cities
+
+    Эндпоинт отдает города страны, поэтому поиск по названию выполняется
+    локально и только при заданном коде страны.
+    """
+    session = get_session()
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'X-Affiliate-Id': str(affiliate_id),
+        'Content-Type': 'application/json'
+    }
+
+    def cities(keyword, country_code, limit):
+        response = session.post("https://demandapi.booking.com/3.1/common/locations/cities",
+                                headers=headers, json={'country': country_code.lower(), 'languages': [language]})
+        if response.status_code != 200:
+            print(f"Booking.com: ошибка {response.status_code}: {response.text[:200]}")
+            return None
+        prefix = normalize_name(keyword)
+        return [place for place in normalize_booking_cities(response.json(), language)
+                if normalize_name(place['name']).startswith(prefix)][:limit]
+
+    return GeocoderProvider('booking', cities=cities, cost=cost, cities_need_country=True)
+
+
+def amadeus_provider(client, cost=0.0):
+    """Провайдер на основе AmadeusClient (поиск городов)"""
+    def cities(keyword, country_code, limit):
+        result = client.search_cities(keyword, country_code=country_code, max_results=limit)
+        return None if not result.get('success') else normalize_amadeus_cities(result)
+
+    return GeocoderProvider('amadeus', cities=cities, cost=cost, rate_limit=('amadeus', client.api_key))
+
+
+# --- объединение результатов
+
+def merge_places(result_lists):
+    """
+    Объединить места разных провайдеров
+
+    Списки идут в порядке предпочтения провайдеров; совпадающие места
+    (рядом и с похожими названиями) сливаются: поля берутся у первого
+    провайдера, недостающие — у следующих, источники накапливаются.
+    """
+    merged = []
+    for places in result_lists:
+        for place in places:
+            name = normalize_name(place['name'])
+            match = None
+            if place['latitude'] is not None:
+                radius = MERGE_RADIUS_M.get(place['type'], DEFAULT_MERGE_RADIUS_M)
+                for candidate in merged:
+                    if candidate['latitude'] is None:
+                        continue
+                    if haversine_m(place['latitude'], place['longitude'],
+                                   candidate['latitude'], candidate['longitude']) <= radius and \
+                            name_similarity(name, normalize_name(candidate['name'])) >= MERGE_NAME_THRESHOLD:
+                        match = candidate
+                        break
+            if match is None:
+                merged.append({**place, 'sources': list(place['sources'])})
+                continue
+            for key, value in place.items():
+                if key != 'sources' and match.get(key) is None and value is not None:
+                    match[key] = value
+            match['sources'].extend(place['sources'])
+    return merged
+
+
+class Geocoder:
+    """Фасад геокодирования с выбором провайдера, hedging и объединением результатов"""
+
+    def __init__(self, providers, deadline=DEFAULT_DEADLINE, hedge=True, max_parallel=2):
+        """
+        Args:
+            providers (list): Провайдеры GeocoderProvider
+            deadline (float): Общий дедлайн запроса в секундах
+            hedge (bool): Дублировать запрос следующему провайдеру, если основной медлит
+            max_parallel (int): Максимум провайдеров, опрашиваемых одновременно
+        """
+        self.providers = list(providers)
+        self.deadline = deadline
+        self.hedge = hedge
+        self.max_parallel = max_parallel
+        self.pool = ThreadPoolExecutor(max_workers=max(4, len(self.providers) * max_parallel),
+                                       thread_name_prefix='geocoder')
+
+    def route(self, kind, params):
+        """Провайдеры, способные выполнить запрос, от лучшего к худшему"""
+        candidates = []
+        for provider in self.providers:
+            if not provider.supports(kind, params):
+                continue
+            quota_left = provider.quota_left()
+            if quota_left is not None and quota_left <= 0:
+                continue
+            candidates.append((provider.score(), provider))
+        candidates.sort(key=lambda item: item[0])
+        return [provider for _, provider in candidates]
+
+    def _run(self, kind, params, merge):
+        started = time.monotonic()
+        queue = self.route(kind, params)
+        summary = {'places': [], 'providers': [], 'errors': {}, 'hedged': False}
+        if not queue:
+            summary['errors']['geocoder'] = f"нет провайдера для запроса {kind}"
+            return summary
+
+        running = {}
+        answered = []
+
+        def launch():
+            provider = queue.pop(0)
+            running[self.pool.submit(provider.call, kind, params)] = provider
+            return provider
+
+        launch()
+        while running:
+            remaining = self.deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            # Пока есть запасной провайдер и место — ждем основного не дольше его обычной задержки
+            timeout = remaining
+            have_answer = any(places for _, places in answered)
+            can_hedge = self.hedge and queue and len(running) < self.max_parallel and not have_answer
+            if can_hedge:
+                slowest = max(provider.latency or DEFAULT_LATENCY for provider in running.values())
+                timeout = min(remaining, max(HEDGE_FACTOR * slowest, MIN_HEDGE_DELAY))
+
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if can_hedge:
+                    launch()
+                    summary['hedged'] = True
+                continue
+
+            for future in done:
+                provider = running.pop(future)
+                try:
+                    answered.append((provider, future.result()))
+                except Exception as e:
+                    summary['errors'][provider.name] = str(e)
+
+            # Ответил хотя бы один — без merge остальных не ждем
+            if any(places for _, places in answered) and not merge:
+                break
+            if not running and queue and not any(places for _, places in answered):
+                launch()
+
+        # Порядок предпочтения — порядок маршрута, а не порядок ответов
+        order = {provider: i for i, provider in enumerate(self.route(kind, params))}
+        answered.sort(key=lambda item: order.get(item[0], len(order)))
+        summary['providers'] = [provider.name for provider, _ in answered]
+        summary['places'] = merge_places([places for _, places in answered])
+        summary['pending'] = [provider.name for provider in running.values()]
+        summary['elapsed'] = time.monotonic() - started
+        return summary
+
+    def geocode(self, query, limit=10, merge=False):
+        """
+        Прямое геокодирование: адрес или название -> места
+
+        Returns:
+            dict: {'places': [...], 'providers': [...], 'errors': {...}, 'hedged': bool,
+                   'pending': [...], 'elapsed': float}
+        """
+        return self._run('geocode', {'query': query, 'limit': limit}, merge)
+
+    def reverse(self, latitude, longitude, limit=10, merge=False):
+        """Обратное геокодирование: координаты -> места (формат как у geocode)"""
+        return self._run('reverse', {'latitude': latitude, 'longitude': longitude, 'limit': limit}, merge)
+
+    def search_cities(self, keyword, country_code=None, limit=10, merge=False):
+        """Поиск городов по названию (формат как у geocode)"""
+        return self._run('cities', {'keyword': keyword, 'country_code': country_code, 'limit': limit}, merge)
+
+    def stats(self):
+        """Статистика всех провайдеров"""
+        return {provider.name: provider.stats() for provider in self.providers}
+
+    def close(self):
+        """Остановить пул потоков (незавершенные запросы не ждем)"""
+        self.pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    # Демонстрация на имитированных провайдерах
+    import json
+    import random
+
+    def simulated(name, latency, fail_rate=0.0):
+        def cities(keyword, country_code, limit):
+            time.sleep(latency * random.uniform(0.8, 1.5))
+            if random.random() < fail_rate:
+                return None
+            return [make_place(name, f"{name}-1", keyword.title(), 55.7558 + random.uniform(-0.01, 0.01),
+                               37.6176, 'city', 'RU')]
+        return cities
+
+    random.seed(1)
+    geocoder = Geocoder([
+        GeocoderProvider('amadeus', cities=simulated('amadeus', 0.05, fail_rate=0.5)),
+        GeocoderProvider('geodb', cities=simulated('geodb', 0.08), cost=0.05),
+        GeocoderProvider('mapbox', cities=simulated('mapbox', 0.3), cost=0.2),
+    ], deadline=2.0)
+    for _ in range(20):
+        geocoder.search_cities('moscow', 'RU')
+    result = geocoder.search_cities('moscow', 'RU', merge=True)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(json.dumps(geocoder.stats(), indent=2, ensure_ascii=False))
+    geocoder.close()
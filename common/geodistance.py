@@ -0,0 +1,396 @@
+"""
+Векторные расстояния по поверхности Земли и поиск ближайших точек
+
+Точки передаются массивами float формы (N, 2) — широта и долгота в
+градусах. points_from() собирает такой массив из ответов провайдеров:
+городов и аэропортов Amadeus (geoCode), отелей Sabre (GeoCode), станций
+Sixt (coordinates) и любых словарей с latitude/longitude.
+
+- haversine_km / one_to_many / pairwise — расстояния в километрах
+- nearest — k ближайших перебором (для небольших наборов)
+- GeoIndex — сеточный индекс для k ближайших на больших наборах:
+  ближайший аэропорт для 50 тысяч отелей считается за доли секунды
+
+Нужен пакет numpy.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EARTH_RADIUS_KM = 6371.0
+
+# Размер блока строк при переборе, чтобы матрица расстояний помещалась в память
+CHUNK_ROWS = 2048
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Для векторных расстояний требуется пакет numpy: pip install numpy")
+
+
+def _coords(item):
+    if not isinstance(item, dict):
+        # Записи common/records.py (Place, CarLocation, ...)
+        lat, lon = getattr(item, 'lat', None), getattr(item, 'lon', None)
+        return (math.nan, math.nan) if lat is None or lon is None else (float(lat), float(lon))
+    for container, lat_key, lon_key in (
+            ('geoCode', 'latitude', 'longitude'),       # Amadeus
+            ('GeoCode', 'Latitude', 'Longitude'),       # Sabre
+            ('coordinates', 'latitude', 'longitude'),   # Sixt
+            ('location', 'latitude', 'longitude'),
+            (None, 'latitude', 'longitude'),
+            (None, 'Latitude', 'Longitude'),
+            (None, 'lat', 'lon')):
+        source = item.get(container) if container else item
+        if isinstance(source, dict) and source.get(lat_key) is not None \
+                and source.get(lon_key) is not None:
+            return float(source[lat_key]), float(source[lon_key])
+    return math.nan, math.nan
+
+
+def points_from(items):
+    """
+    Массив координат (N, 2) из списка объектов провайдеров
+
+    Объекты без координат получают NaN (расстояния до них тоже NaN).
+
+    Args:
+        items (list): Словари городов, аэропортов, отелей или станций,
+            записи common/records.py либо пары (широта, долгота)
+
+    Returns:
+        numpy.ndarray: Массив формы (N, 2)
+    """
+    _require_numpy()
+    rows = [item if isinstance(item, (tuple, list)) else _coords(item) for item in items]
+    return np.asarray(rows, dtype=np.float64).reshape(-1, 2)
+
+
+def _as_points(points):
+    _require_numpy()
+    if hasattr(points, 'points'):
+        # RecordBatch из common/records.py
+        return points.points()
+    if not isinstance(points, np.ndarray) and len(points) \
+            and (isinstance(points[0], dict) or hasattr(points[0], 'lat')):
+        return points_from(points)
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Расстояние по формуле гаверсинуса в километрах
+
+    Аргументы — числа или массивы NumPy (с поддержкой broadcasting).
+    """
+    _require_numpy()
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def one_to_many(point, points):
+    """
+    Расстояния от одной точки до набора точек
+
+    Args:
+        point (tuple): (широта, долгота)
+        points: Массив (N, 2) или список объектов провайдеров
+
+    Returns:
+        numpy.ndarray: Расстояния в километрах, форма (N,)
+    """
+    points = _as_points(points)
+    return haversine_km(point[0], point[1], points[:, 0], points[:, 1])
+
+
+def pairwise(points_a, points_b=None):
+    """
+    Матрица расстояний между двумя наборами точек
+
+    Args:
+        points_a: Массив (N, 2) или список объектов
+        points_b: Массив (M, 2) или список объектов (None — points_a с собой)
+
+    Returns:
+        numpy.ndarray: Матрица (N, M) в километрах
+    """
+    a = _as_points(points_a)
+    b = a if points_b is None else _as_points(points_b)
+    return haversine_km(a[:, 0:1], a[:, 1:2], b[None, :, 0], b[None, :, 1])
+
+
+def nearest(points, targets, k=1):
+    """
+    k ближайших целей для каждой точки (перебор блоками)
+
+    Подходит для наборов до десятков тысяч пар; для больших используйте GeoIndex.
+
+    Returns:
+        tuple: (расстояния (N, k) в км, индексы целей (N, k))
+    """
+    points = _as_points(points)
+    targets = _as_points(targets)
+    k = min(k, len(targets))
+    distances = np.empty((len(points), k))
+    indices = np.empty((len(points), k), dtype=np.int64)
+    for start in range(0, len(points), CHUNK_ROWS):
+        block = pairwise(points[start:start + CHUNK_ROWS], targets)
+        block = np.where(np.isnan(block), np.inf, block)
+        idx = np.argpartition(block, k - 1, axis=1)[:, :k] if k < block.shape[1] else \
+            np.tile(np.arange(block.shape[1]), (len(block), 1))
+        dist = np.take_along_axis(block, idx, axis=1)
+        order = np.argsort(dist, axis=1)
+        distances[start:start + CHUNK_ROWS] = np.take_along_axis(dist, order, axis=1)
+        indices[start:start + CHUNK_ROWS] = np.take_along_axis(idx, order, axis=1)
+    return distances, indices
+
+
+def _to_xyz(points):
+    lat = np.radians(points[:, 0])
+    lon = np.radians(points[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+# Упаковка трех индексов ячейки в один int64 (по 21 биту на ось)
+_CELL_BITS = 21
+_CELL_OFFSET = 1 << (_CELL_BITS - 1)
+# Наименьшая ячейка (хорда), при которой номера ячеек помещаются в _CELL_BITS (~12 м)
+_MIN_CELL = 2.0 / _CELL_OFFSET
+# Среднее число соседей по ячейке на точку, выше которого ячейки уменьшаются вдвое
+CELL_OCCUPANCY = 8
+# Слоев сетки на запрос; оставшиеся запросы (далеко от всех точек) считаются перебором
+GRID_SHELLS = 8
+# Элементов во временном массиве перебора (запросы × точки × 3)
+BRUTE_ELEMENTS = 3_000_000
+
+
+def _pack(cells):
+    cells = cells + _CELL_OFFSET
+    return (cells[..., 0] << (2 * _CELL_BITS)) | (cells[..., 1] << _CELL_BITS) | cells[..., 2]
+
+
+def _cell_size(xyz):
+    # Ячейка по площади, которую занимают точки: сторона sqrt(площадь / N).
+    # Для точек одного города это сотни метров, а не сотни километров, как при
+    # расчете на всю сферу. Если точки сгруппированы в несколько плотных
+    # скоплений, ячейка уменьшается, пока в среднем на точку приходится не
+    # больше CELL_OCCUPANCY соседей по ячейке (иначе запрос квадратичен)
+    if len(xyz) == 0:
+        return 1.0
+    extent = np.sort(xyz.max(axis=0) - xyz.min(axis=0))[::-1]
+    area = extent[0] * extent[1] or extent[0] ** 2
+    cell = max(math.sqrt(area / len(xyz)), _MIN_CELL)
+    while cell / 2 >= _MIN_CELL:
+        _, counts = np.unique(_pack(np.floor(xyz / cell).astype(np.int64)), return_counts=True)
+        if (counts.astype(np.float64) ** 2).sum() / len(xyz) <= CELL_OCCUPANCY:
+            break
+        cell /= 2
+    return cell
+
+
+def _expand(starts, counts):
+    # Конкатенация диапазонов [start, start + count) без цикла
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+
+class GeoIndex:
+    """
+    Сеточный индекс точек для поиска k ближайших
+
+    Точки переводятся в единичные векторы и раскладываются по кубическим
+    ячейкам в трехмерном пространстве: хорда монотонна расстоянию по
+    поверхности, а сетка одинакова на всех широтах (без искажений у
+    полюсов и на 180-м меридиане). Запрос просматривает ячейки слоями
+    вокруг ячейки точки, пока k-й найденный сосед не окажется ближе
+    непросмотренных слоев. Все запросы обрабатываются вместе, массивами.
+    Запросы, которым не хватило GRID_SHELLS слоев (далеко от всех точек),
+    досчитываются перебором.
+    """
+
+    def __init__(self, points, cell_km=None):
+        """
+        Args:
+            points: Массив (N, 2) или список объектов провайдеров
+            cell_km (float): Размер ячейки; по умолчанию подбирается по площади,
+                которую занимают точки, и их скоплениям (около одной точки на ячейку)
+        """
+        points = _as_points(points)
+        valid = ~np.isnan(points).any(axis=1)
+        self.points = points
+        self.ids = np.flatnonzero(valid)
+        xyz = _to_xyz(points[self.ids])
+        self.cell = _cell_size(xyz) if cell_km is None else cell_km / EARTH_RADIUS_KM
+
+        keys = _pack(np.floor(xyz / self.cell).astype(np.int64))
+        order = np.argsort(keys, kind='stable')
+        self.xyz = xyz[order]
+        self.ids = self.ids[order]
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(
+            keys[order], return_index=True, return_counts=True
+        )
+        self._shells = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _shell(self, radius):
+        # Смещения ячеек слоя radius (max(|dx|, |dy|, |dz|) == radius)
+        if radius not in self._shells:
+            span = np.arange(-radius, radius + 1)
+            grid = np.stack(np.meshgrid(span, span, span, indexing='ij'), axis=-1).reshape(-1, 3)
+            self._shells[radius] = grid[np.abs(grid).max(axis=1) == radius]
+        return self._shells[radius]
+
+    def query(self, points, k=1, max_km=None):
+        """
+        k ближайших точек индекса для каждой точки запроса
+
+        Args:
+            points: Массив (Q, 2) или список объектов провайдеров
+            k (int): Количество соседей
+            max_km (float): Не искать дальше этого расстояния
+
+        Returns:
+            tuple: (расстояния (Q, k) в км, индексы исходных точек (Q, k));
+                где соседей не хватило — inf и -1
+        """
+        queries = _as_points(points)
+        count = len(queries)
+        best_chord = np.full((count, k), np.inf)
+        best_pos = np.full((count, k), -1, dtype=np.int64)
+        if count == 0 or len(self.ids) == 0:
+            return best_chord, best_pos
+
+        valid = ~np.isnan(queries).any(axis=1)
+        qxyz = np.zeros((count, 3))
+        qxyz[valid] = _to_xyz(queries[valid])
+        qcell = np.floor(qxyz / self.cell).astype(np.int64)
+        max_chord = math.inf if max_km is None else 2 * math.sin(min(max_km / EARTH_RADIUS_KM, math.pi) / 2)
+        # Хорда не длиннее 2, значит слоев дальше 2 / cell не бывает
+        max_radius = int(math.ceil(2 / self.cell)) + 1
+
+        # Расстояние от точки запроса до ближайшей грани ее ячейки
+        offset = qxyz - qcell * self.cell
+        face = np.minimum(offset, self.cell - offset).min(axis=1)
+
+        active = np.flatnonzero(valid)
+        radius = 0
+        while len(active) and radius <= min(max_radius, GRID_SHELLS):
+            self._scan_shell(active, radius, qxyz, qcell, best_chord, best_pos, k)
+            # Непросмотренные ячейки лежат дальше radius * cell + face от точки запроса
+            bound = radius * self.cell + face[active]
+            done = (best_chord[active, k - 1] <= bound) | (bound > max_chord)
+            active = active[~done]
+            radius += 1
+        if len(active):
+            # Запросы вдали от скоплений точек: слоев понадобилось бы тысячи
+            self._scan_all(active, qxyz, best_chord, best_pos, k)
+
+        too_far = best_chord > max_chord
+        best_chord[too_far] = np.inf
+        best_pos[too_far] = -1
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(best_chord / 2, 0.0, 1.0))
+        distances[best_pos < 0] = np.inf
+        indices = np.where(best_pos >= 0, self.ids[np.maximum(best_pos, 0)], -1)
+        return distances, indices
+
+    def _scan_all(self, active, qxyz, best_chord, best_pos, k):
+        # Точный перебор всех точек индекса порциями запросов
+        size = min(k, len(self.xyz))
+        rows = max(1, BRUTE_ELEMENTS // (3 * len(self.xyz)))
+        for start in range(0, len(active), rows):
+            part = active[start:start + rows]
+            chords = np.linalg.norm(self.xyz[None, :, :] - qxyz[part][:, None, :], axis=2)
+            nearest = np.argpartition(chords, size - 1, axis=1)[:, :size]
+            nearest_chords = np.take_along_axis(chords, nearest, axis=1)
+            order = np.argsort(nearest_chords, axis=1)
+            best_chord[part, :size] = np.take_along_axis(nearest_chords, order, axis=1)
+            best_pos[part, :size] = np.take_along_axis(nearest, order, axis=1)
+
+    def _scan_shell(self, active, radius, qxyz, qcell, best_chord, best_pos, k):
+        shell = self._shell(radius)
+        # Соседние ячейки ищутся один раз для всех запросов из одной ячейки
+        query_keys, first, group = np.unique(_pack(qcell[active]), return_index=True,
+                                             return_inverse=True)
+        cells = qcell[active[first]][:, None, :] + shell[None, :, :]
+        keys = _pack(cells).ravel()
+        slots = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        found = np.flatnonzero(self.cell_keys[slots] == keys)
+        if not len(found):
+            return
+        pair_group, slots = found // len(shell), slots[found]
+
+        # Кандидаты каждой группы: точки всех найденных соседних ячеек подряд
+        counts = self.cell_counts[slots]
+        group_positions = _expand(self.cell_starts[slots], counts)
+        group_sizes = np.bincount(pair_group, weights=counts, minlength=len(query_keys)).astype(np.int64)
+        group_offsets = np.cumsum(group_sizes) - group_sizes
+
+        # Разворачиваем группы в пары (запрос, кандидат)
+        sizes = group_sizes[group]
+        query_ids = np.repeat(active, sizes)
+        positions = group_positions[_expand(group_offsets[group], sizes)]
+        chords = np.linalg.norm(self.xyz[positions] - qxyz[query_ids], axis=1)
+        closer = chords < best_chord[query_ids, k - 1]
+        query_ids, chords, positions = query_ids[closer], chords[closer], positions[closer]
+        if not len(query_ids):
+            return
+
+        if k == 1:
+            # Кандидаты сгруппированы по запросу: минимум группы без сортировки
+            starts = np.flatnonzero(np.r_[True, query_ids[1:] != query_ids[:-1]])
+            group_min = np.minimum.reduceat(chords, starts)
+            owners = query_ids[starts]
+            is_min = chords == np.repeat(group_min, np.diff(np.r_[starts, len(chords)]))
+            first = np.unique(query_ids[is_min], return_index=True)[1]
+            best_chord[owners, 0] = group_min
+            best_pos[owners, 0] = positions[is_min][first]
+            return
+
+        # Объединяем с уже найденными соседями и оставляем k лучших на запрос
+        owners = np.unique(query_ids)
+        query_ids = np.concatenate((np.repeat(owners, k), query_ids))
+        chords = np.concatenate((best_chord[owners].ravel(), chords))
+        positions = np.concatenate((best_pos[owners].ravel(), positions))
+        order = np.lexsort((chords, query_ids))
+        query_ids, chords, positions = query_ids[order], chords[order], positions[order]
+        rank = np.arange(len(query_ids)) - np.searchsorted(query_ids, query_ids, side='left')
+        keep = rank < k
+        best_chord[query_ids[keep], rank[keep]] = chords[keep]
+        best_pos[query_ids[keep], rank[keep]] = positions[keep]
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(42)
+    airports = np.column_stack((rng.uniform(-60, 70, 4000), rng.uniform(-180, 180, 4000)))
+    hotels = np.column_stack((rng.uniform(-60, 70, 50000), rng.uniform(-180, 180, 50000)))
+
+    started = time.perf_counter()
+    index = GeoIndex(airports)
+    built = time.perf_counter()
+    distances, indices = index.query(hotels, k=1)
+    finished = time.perf_counter()
+    print(f"Индекс {len(index)} аэропортов: {(built - started) * 1000:.1f} мс")
+    print(f"Ближайший аэропорт для {len(hotels)} отелей: {(finished - built) * 1000:.1f} мс")
+
+    check_d, check_i = nearest(hotels[:2000], airports, k=1)
+    print("Совпадает с перебором:", bool(np.array_equal(check_i[:, 0], indices[:2000, 0])))
+
+    # Записи common/records.py вместо словарей провайдеров
+    from common.records import Place, RecordBatch
+    places = [Place(name=f"P{i}", lat=lat, lon=lon) for i, (lat, lon) in enumerate(airports[:100])]
+    batch = RecordBatch(Place, places)
+    by_records = [one_to_many((0, 0), places), pairwise(places[:5], places)[0], nearest(places[:5], places)[1][:, 0],
+                  GeoIndex(places).query(places[:5])[1][:, 0]]
+    by_arrays = [one_to_many((0, 0), airports[:100]), pairwise(airports[:5], airports[:100])[0],
+                 nearest(airports[:5], airports[:100])[1][:, 0], GeoIndex(batch).query(batch)[1][:5, 0]]
+    print("Записи и массивы дают одно и то же:",
+          all(np.allclose(a, b) for a, b in zip(by_records, by_arrays)))
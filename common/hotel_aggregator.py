@@ -0,0 +1,542 @@
+"""
+Единый поиск отелей по всем поставщикам с потоковой выдачей
+
+Один нормализованный запрос (даты, гости, место) отправляется сразу всем
+подключенным поставщикам: Hotelbeds, Booking.com, Agoda, RateHawk,
+Expedia Rapid и Sabre Geo Search. Предложения приводятся к общему виду и
+отдаются вызывающему коду по мере ответа каждого поставщика, не дожидаясь
+остальных. Самая низкая цена по каждому отелю пересчитывается на лету.
+
+Нормализованное предложение (dict):
+    supplier, hotel_id, name, latitude, longitude, price, currency,
+    room, board, refundable, property_key
+
+price = None означает, что поставщик вернул отель без цены (Sabre Geo Search).
+"""
+
+import asyncio
+import base64
+import inspect
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from common.async_transport import get_async_client
+
+DEFAULT_DEADLINE = 15.0
+
+RATEHAWK_GEO_URL = "https://api.worldota.net/api/b2b/v3/search/serp/geo/"
+EXPEDIA_AVAILABILITY_URL = "https://api.ean.com/v3/properties/availability"
+
+
+class HotelSearch:
+    """Нормализованный запрос поиска отелей"""
+
+    def __init__(self, checkin, checkout, adults=2, children_ages=None, rooms=1,
+                 latitude=None, longitude=None, radius_km=5, destinations=None,
+                 currency='EUR', language='en', residency='gb'):
+        """
+        Args:
+            checkin, checkout (str): Даты заезда и выезда (YYYY-MM-DD)
+            adults (int): Взрослых в номере
+            children_ages (list): Возраст детей
+            rooms (int): Количество номеров
+            latitude, longitude (float): Центр поиска по координатам
+            radius_km (float): Радиус поиска по координатам
+            destinations (dict): Место в терминах поставщиков, например
+                {'hotelbeds': 'BCN', 'booking': -372490, 'agoda': [12157],
+                 'expedia': ['12345']}
+            currency (str): Валюта цен
+            language (str): Язык ответа
+            residency (str): Страна гражданства гостя (для RateHawk)
+        """
+        self.checkin = checkin
+        self.checkout = checkout
+        self.adults = adults
+        self.children_ages = list(children_ages or [])
+        self.rooms = rooms
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_km = radius_km
+        self.destinations = dict(destinations or {})
+        self.currency = currency
+        self.language = language
+        self.residency = residency
+
+    @property
+    def nights(self):
+        """Количество ночей"""
+        return (date.fromisoformat(self.checkout) - date.fromisoformat(self.checkin)).days
+
+    @property
+    def has_coordinates(self):
+        return self.latitude is not None and self.longitude is not None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def make_offer(supplier, hotel_id, name=None, latitude=None, longitude=None, price=None,
+               currency=None, room=None, board=None, refundable=None):
+    """Собрать нормализованное предложение"""
+    return {
+        'supplier': supplier,
+        'hotel_id': str(hotel_id),
+        'name': name,
+        'latitude': _to_float(latitude),
+        'longitude': _to_float(longitude),
+        'price': _to_float(price),
+        'currency': currency,
+        'room': room,
+        'board': board,
+        'refundable': refundable,
+    }
+
+
+# --- Нормализация ответов поставщиков
+
+def normalize_hotelbeds(response):
+    """Ответ Hotelbeds /hotel-api/1.0/hotels -> предложения"""
+    if isinstance(response, dict) and 'response' in response:
+        response = response['response']
+    if not isinstance(response, dict):
+        return []
+    offers = []
+    for hotel in response.get('hotels', {}).get('hotels', []):
+        for room in hotel.get('rooms', []):
+            for rate in room.get('rates', []):
+                offers.append(make_offer(
+                    'hotelbeds', hotel.get('code'), hotel.get('name'),
+                    hotel.get('latitude'), hotel.get('longitude'),
+                    rate.get('net'), hotel.get('currency'),
+                    room.get('name'), rate.get('boardName'),
+                    rate.get('rateClass') != 'NRF'
+                ))
+    return offers
+
+
+def normalize_booking(response):
+    """Ответ Booking.com /accommodations/search -> предложения"""
+    if not isinstance(response, dict):
+        return []
+    offers = []
+    for accommodation in response.get('data', response.get('accommodations', [])):
+        currency = accommodation.get('currency')
+        if isinstance(currency, dict):
+            currency = currency.get('booker') or currency.get('accommodation')
+        products = accommodation.get('products') or [accommodation]
+        for product in products:
+            price = product.get('price', {})
+            cancellation = product.get('policies', {}).get('cancellation', {})
+            offers.append(make_offer(
+                'booking', accommodation.get('id'), accommodation.get('name'),
+                accommodation.get('location', {}).get('coordinates', {}).get('latitude'),
+                accommodation.get('location', {}).get('coordinates', {}).get('longitude'),
+                price.get('total', price.get('book')) if isinstance(price, dict) else price,
+                currency, product.get('room'), product.get('policies', {}).get('meal_plan', {}).get('plan'),
+                cancellation.get('type') == 'free_cancellation' if cancellation else None
+            ))
+    return offers
+
+
+def normalize_agoda(response):
+    """Ответ Agoda JSON Search -> предложения"""
+    if isinstance(response, dict) and 'content' in response:
+        try:
+            response = json.loads(response['content'])
+        except ValueError:
+            return []  # вместо JSON пришла HTML-страница
+    if not isinstance(response, dict):
+        return []
+    offers = []
+    for prop in response.get('properties', []):
+        for room in prop.get('rooms', []):
+            for rate in room.get('rates', []):
+                policy = rate.get('cancellationPolicy') or ''
+                offers.append(make_offer(
+                    'agoda', prop.get('propertyId'), prop.get('propertyName'),
+                    prop.get('latitude'), prop.get('longitude'),
+                    rate.get('totalPrice'), rate.get('currency'),
+                    room.get('roomName'), None,
+                    policy.lower().startswith('free cancellation') if policy else None
+                ))
+    return offers
+
+
+def normalize_ratehawk(response):
+    """Ответ RateHawk search/serp/geo -> предложения"""
+    if not isinstance(response, dict):
+        return []
+    offers = []
+    for hotel in (response.get('data') or {}).get('hotels', []):
+        for rate in hotel.get('rates', []):
+            payment_types = rate.get('payment_options', {}).get('payment_types', [])
+            payment = payment_types[0] if payment_types else {}
+            offers.append(make_offer(
+                'ratehawk', hotel.get('id'), None, None, None,
+                payment.get('show_amount', payment.get('amount')),
+                payment.get('show_currency_code', payment.get('currency_code')),
+                rate.get('room_name'), rate.get('meal'),
+                bool(payment.get('cancellation_penalties', {}).get('free_cancellation_before'))
+            ))
+    return offers
+
+
+def normalize_expedia(response, occupancy=None):
+    """
+    Ответ Expedia Rapid /properties/availability -> предложения
+
+    Цена берется для занятости occupancy ('2', '2-9,4'), по умолчанию первой в ответе.
+    """
+    if not isinstance(response, list):
+        return []
+    offers = []
+    for prop in response:
+        for room in prop.get('rooms', []):
+            for rate in room.get('rates', []):
+                pricing = rate.get('occupancy_pricing', {})
+                pricing = pricing.get(occupancy) or next(iter(pricing.values()), {})
+                total = pricing.get('totals', {}).get('inclusive', {}).get('request_currency', {})
+                offers.append(make_offer(
+                    'expedia', prop.get('property_id'), None, None, None,
+                    total.get('value'), total.get('currency'),
+                    room.get('room_name'), None, rate.get('refundable')
+                ))
+    return offers
+
+
+def normalize_sabre(response):
+    """Ответ Sabre Geo Search (Category HOTEL) -> отели без цен"""
+    if not isinstance(response, dict):
+        return []
+    results = response.get('GeoSearchRS', {}).get('GeoSearchResults', {}).get('GeoSearchResult', [])
+    return [
+        make_offer('sabre', result.get('HotelCode'), result.get('HotelName'),
+                   result.get('GeoCode', {}).get('Latitude'), result.get('GeoCode', {}).get('Longitude'))
+        for result in results
+    ]
+
+
+# --- Адаптеры поставщиков: HotelSearch -> вызов клиента
+
+def hotelbeds_supplier(client):
+    """Поставщик на основе HotelbedsAPI / AsyncHotelbedsAPI"""
+    def search(query):
+        code = query.destinations.get('hotelbeds')
+        if code is None:
+            return None
+        return client.search_hotels(code, query.checkin, query.checkout,
+                                    adults=query.adults, children=len(query.children_ages))
+    return 'hotelbeds', search, normalize_hotelbeds
+
+
+def booking_supplier(client):
+    """Поставщик на основе BookingAPIClient / AsyncBookingAPIClient"""
+    def search(query):
+        city_id = query.destinations.get('booking')
+        if city_id is None:
+            return None
+        return client.search_accommodations(city_id, query.checkin, query.checkout,
+                                            country=query.residency, num_rooms=query.rooms,
+                                            num_adults=query.adults,
+                                            num_children=len(query.children_ages))
+    return 'booking', search, normalize_booking
+
+
+def agoda_supplier(client):
+    """Поставщик на основе AgodaAPIClient / AsyncAgodaAPIClient"""
+    def search(query):
+        property_ids = query.destinations.get('agoda')
+        if not property_ids:
+            return None
+        return client.search_hotels_json(property_ids, query.checkin, query.checkout,
+                                         rooms=query.rooms, adults=query.adults,
+                                         children=len(query.children_ages),
+                                         children_ages=query.children_ages,
+                                         currency=query.currency)
+    return 'agoda', search, normalize_agoda
+
+
+def sabre_supplier(client):
+    """Поставщик на основе SabreGeoSearchAPI (токен должен быть получен заранее)"""
+    def search(query):
+        if not query.has_coordinates:
+            return None
+        return client.search_by_coordinates(query.latitude, query.longitude,
+                                            radius=query.radius_km, category="HOTEL", uom="KM")
+    return 'sabre', search, normalize_sabre
+
+
+def ratehawk_supplier(key_id, api_key):
+    """Поставщик RateHawk (поиск по координатам, HTTP Basic Authentication)"""
+    auth = base64.b64encode(f"{key_id}:{api_key}".encode()).decode()
+
+    async def search(query):
+        if not query.has_coordinates:
+            return None
+        payload = {
+            "checkin": query.checkin,
+            "checkout": query.checkout,
+            "residency": query.residency,
+            "language": query.language,
+            "guests": [{"adults": query.adults, "children": query.children_ages}] * query.rooms,
+            "longitude": query.longitude,
+            "latitude": query.latitude,
+            # RateHawk принимает радиус в метрах
+            "radius": int(query.radius_km * 1000),
+            "currency": query.currency
+        }
+        response = await get_async_client().post(
+            RATEHAWK_GEO_URL, json=payload,
+            headers={"Content-Type": "application/json", "Authorization": f"Basic {auth}"}
+        )
+        response.raise_for_status()
+        return response.json()
+    return 'ratehawk', search, normalize_ratehawk
+
+
+def expedia_supplier(authorization, test_header=None):
+    """
+    Поставщик Expedia Rapid (availability по списку property_id)
+
+    Args:
+        authorization (str): Значение заголовка Authorization (EAN APIKey=...,Signature=...)
+        test_header (str): Значение заголовка test ('standard') для тестовых ответов
+    """
+    async def search(query):
+        property_ids = query.destinations.get('expedia')
+        if not property_ids:
+            return None
+        occupancy = str(query.adults)
+        if query.children_ages:
+            occupancy += '-' + ','.join(str(age) for age in query.children_ages)
+        headers = {"Accept": "application/json", "Authorization": authorization}
+        if test_header:
+            headers["test"] = test_header
+        params = {
+            "checkin": query.checkin,
+            "checkout": query.checkout,
+            "occupancy": [occupancy] * query.rooms,
+            "property_id": list(property_ids),
+            "currency": query.currency,
+            "language": query.language,
+            "rate_plan_count": 1
+        }
+        response = await get_async_client().get(EXPEDIA_AVAILABILITY_URL, params=params,
+                                                headers=headers)
+        response.raise_for_status()
+        return response.json()
+    return 'expedia', search, normalize_expedia
+
+
+# --- Агрегатор
+
+def default_property_key(offer):
+    """Ключ отеля для выбора лучшей цены: поставщик + его ID отеля"""
+    return f"{offer['supplier']}:{offer['hotel_id']}"
+
+
+class HotelAggregator:
+    """Параллельный поиск отелей у всех подключенных поставщиков"""
+
+    def __init__(self, deadline=DEFAULT_DEADLINE, property_key=default_property_key):
+        """
+        Args:
+            deadline (float): Общий дедлайн поиска в секундах
+            property_key: Функция offer -> ключ отеля; одинаковые ключи у разных
+                поставщиков означают один физический отель
+        """
+        self.deadline = deadline
+        self.property_key = property_key
+        self.suppliers = []
+        self.cheapest = {}
+        self.errors = {}
+        self.timed_out = []
+        self.currency = None
+
+    def add_supplier(self, name, search, normalize):
+        """
+        Подключить поставщика
+
+        Args:
+            name (str): Имя поставщика
+            search: Функция HotelSearch -> ответ поставщика (корутинная или обычная);
+                None означает, что поставщик не участвует в этом поиске
+            normalize: Функция ответ -> список нормализованных предложений
+        """
+        self.suppliers.append((name, search, normalize))
+
+    async def _query(self, name, search, normalize, query, executor):
+        if inspect.iscoroutinefunction(search):
+            response = await search(query)
+        else:
+            # Синхронные клиенты выполняются в пуле потоков этого поиска
+            response = await asyncio.get_running_loop().run_in_executor(executor, search, query)
+            if inspect.isawaitable(response):
+                response = await response
+        return [] if response is None else normalize(response)
+
+    def _assign_keys(self, offers):
+        for offer in offers:
+            offer['property_key'] = self.property_key(offer)
+        return offers
+
+    def _update_cheapest(self, offer):
+        key = offer['property_key']
+        if offer['price'] is None:
+            return
+        best = self.cheapest.get(key)
+        if best is None:
+            self.cheapest[key] = offer
+        elif best['currency'] == offer['currency']:
+            if offer['price'] < best['price']:
+                self.cheapest[key] = offer
+        elif offer['currency'] == self.currency:
+            # Цены в разных валютах не сравниваем, предпочитаем валюту запроса
+            self.cheapest[key] = offer
+
+    async def stream(self, query, deadline=None):
+        """
+        Искать отели и отдавать предложения по мере ответа поставщиков
+
+        Args:
+            query (HotelSearch): Запрос
+            deadline (float): Дедлайн в секундах (по умолчанию из конструктора)
+
+        Yields:
+            dict: Нормализованное предложение
+
+        Если чтение нужно прервать раньше, используйте contextlib.aclosing,
+        чтобы незавершенные запросы были отменены сразу.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        stop_at = time.monotonic() + deadline
+        self.cheapest = {}
+        self.errors = {}
+        self.timed_out = []
+        self.currency = query.currency
+
+        # Свой пул для синхронных клиентов: поток нельзя прервать, поэтому после
+        # дедлайна пул закрывается без ожидания (пул по умолчанию asyncio.run
+        # ждал бы до конца самого медленного запроса), как в FanOutCoordinator
+        # Лишний поток — для сопоставления отелей, чтобы оно не ждало медленных поставщиков
+        executor = ThreadPoolExecutor(max_workers=len(self.suppliers) + 1, thread_name_prefix='hotels')
+        loop = asyncio.get_running_loop()
+        tasks = {
+            asyncio.create_task(self._query(name, search, normalize, query, executor)): name
+            for name, search, normalize in self.suppliers
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                timeout = stop_at - time.monotonic()
+                if timeout <= 0:
+                    self.timed_out = [tasks[task] for task in pending]
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        self.errors[tasks[task]] = str(task.exception())
+                        continue
+                    offers = task.result()
+                    if self.property_key is default_property_key:
+                        self._assign_keys(offers)
+                    elif offers:
+                        # Свой property_key (HotelIdentityIndex) сопоставляет и пишет в SQLite:
+                        # один вызов в пуле на ответ поставщика, цикл событий не блокируется
+                        await loop.run_in_executor(executor, self._assign_keys, offers)
+                    for offer in offers:
+                        self._update_cheapest(offer)
+                        yield offer
+        finally:
+            # Дедлайн истек или потребитель прекратил чтение: отменяем оставшиеся
+            # запросы и забираем результаты всех задач, чтобы не терять исключения
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def best_rates(self):
+        """
+        Лучшая цена по каждому отелю среди полученных предложений
+
+        Returns:
+            list: Предложения, отсортированные по цене
+        """
+        return sorted(self.cheapest.values(), key=lambda offer: offer['price'])
+
+    async def search(self, query, on_offer=None, deadline=None):
+        """
+        Выполнить поиск целиком
+
+        Args:
+            on_offer: Функция, вызываемая для каждого предложения по мере поступления
+
+        Returns:
+            dict: {'offers': [...], 'best_rates': [...], 'errors': {...},
+                   'timed_out': [...], 'complete': bool}
+        """
+        offers = []
+        async for offer in self.stream(query, deadline):
+            offers.append(offer)
+            if on_offer:
+                on_offer(offer)
+        return {
+            'offers': offers,
+            'best_rates': self.best_rates(),
+            'errors': dict(self.errors),
+            'timed_out': list(self.timed_out),
+            'complete': not self.timed_out
+        }
+
+
+def run_search(aggregator, query, on_offer=None, deadline=None):
+    """Синхронная обертка для запуска поиска из обычного кода"""
+    return asyncio.run(aggregator.search(query, on_offer, deadline))
+
+
+if __name__ == "__main__":
+    # Демонстрация на имитированных поставщиках с разной задержкой
+    async def simulated_hotelbeds(query):
+        await asyncio.sleep(0.2)
+        return {'hotels': {'hotels': [
+            {'code': 1533, 'name': 'Hotel Arts', 'currency': 'EUR', 'rooms': [
+                {'name': 'Double', 'rates': [{'net': '410.00', 'boardName': 'ROOM ONLY', 'rateClass': 'NOR'}]}
+            ]}
+        ]}}
+
+    async def simulated_ratehawk(query):
+        await asyncio.sleep(0.5)
+        return {'data': {'hotels': [
+            {'id': 'hotel_arts_barcelona', 'rates': [
+                {'meal': 'nomeal', 'payment_options': {'payment_types': [
+                    {'amount': '399.00', 'currency_code': 'EUR'}
+                ]}}
+            ]}
+        ]}}
+
+    async def simulated_slow(query):
+        await asyncio.sleep(5)
+        return []
+
+    search_query = HotelSearch('2025-10-22', '2025-10-25', latitude=41.386, longitude=2.196,
+                               destinations={'hotelbeds': 'BCN'})
+    aggregator = HotelAggregator(deadline=1.0)
+    aggregator.add_supplier('hotelbeds', simulated_hotelbeds, normalize_hotelbeds)
+    aggregator.add_supplier('ratehawk', simulated_ratehawk, normalize_ratehawk)
+    aggregator.add_supplier('agoda', simulated_slow, normalize_agoda)  # не успеет
+
+    started = time.monotonic()
+    summary = run_search(
+        aggregator, search_query,
+        on_offer=lambda offer: print(f"{time.monotonic() - started:.1f}s "
+                                     f"{offer['supplier']}: {offer['price']} {offer['currency']}")
+    )
+    print(json.dumps({k: summary[k] for k in ('best_rates', 'errors', 'timed_out')},
+                     indent=2, ensure_ascii=False))
@@ -0,0 +1,279 @@
+"""
+Индекс соответствия ID отелей разных поставщиков
+
+Коды Hotelbeds, ID Booking.com, propertyId Agoda, HotelCode Sabre,
+hotelCode TravelgateX и partner_hotel_id Google часто обозначают один и тот
+же физический отель. Индекс сопоставляет их по названию, адресу и
+координатам и присваивает каждому отелю общий canonical_id.
+
+Сопоставление выполняется при добавлении отеля: кандидаты берутся только из
+соседних ячеек координатной сетки (spatial blocking), названия сравниваются
+нечетко. Во время поиска проверка — один поиск в словаре, поэтому агрегатор
+может объединять дубли предложений без попарного сравнения.
+
+Индекс хранится в SQLite и целиком загружается в память при открытии.
+"""
+
+import difflib
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+
+from common.geocache import haversine_m
+
+# Размер ячейки сетки в градусах широты (~1.1 км)
+CELL_DEG = 0.01
+# Максимальное расстояние между координатами одного отеля у разных поставщиков
+MATCH_RADIUS_M = 300
+# Минимальное сходство названий; для очень близких точек порог ниже
+NAME_THRESHOLD = 0.85
+NEAR_RADIUS_M = 50
+NEAR_NAME_THRESHOLD = 0.65
+
+# Слова, которые поставщики добавляют к названию по-разному
+NAME_STOPWORDS = {'hotel', 'hotels', 'the', 'and', 'by', 'a', 'an', 'de', 'la', 'le', 'el'}
+
+
+def normalize_name(name):
+    """Название отеля для сравнения: без диакритики, пунктуации и служебных слов"""
+    if not name:
+        return ''
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = text.replace('&', ' and ')
+    words = re.findall(r'[a-z0-9а-яё]+', text)
+    return ' '.join(word for word in words if word not in NAME_STOPWORDS)
+
+
+def name_similarity(a, b):
+    """
+    Сходство нормализованных названий от 0 до 1
+
+    Среднее посимвольного сходства и доли общих слов: общее слово с названием
+    города ('Arts Barcelona' и 'W Barcelona') не делает названия похожими.
+    Если все слова одного названия входят в другое ('Arts' и 'Arts Barcelona'),
+    сходство высокое; почти полное посимвольное совпадение прощает опечатки.
+    """
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    ratio = difflib.SequenceMatcher(None, a, b).ratio()
+    words_a, words_b = set(a.split()), set(b.split())
+    jaccard = len(words_a & words_b) / len(words_a | words_b)
+    score = (ratio + jaccard) / 2
+    if words_a <= words_b or words_b <= words_a:
+        score = max(score, 0.9)
+    if ratio >= 0.95:
+        score = max(score, ratio)
+    return score
+
+
+def grid_cell(latitude, longitude):
+    """Ячейка сетки для координат (по долготе ячейка растягивается к полюсам)"""
+    cell_y = math.floor(latitude / CELL_DEG)
+    lon_step = CELL_DEG / max(math.cos(math.radians(latitude)), 0.01)
+    return cell_y, math.floor(longitude / lon_step)
+
+
+class HotelIdentityIndex:
+    """Постоянный индекс (поставщик, ID отеля) -> canonical_id"""
+
+    def __init__(self, path=':memory:'):
+        """
+        Args:
+            path (str): Файл базы SQLite (':memory:' — только в памяти)
+        """
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS properties (
+                canonical_id INTEGER PRIMARY KEY,
+                name TEXT,
+                address TEXT,
+                latitude REAL,
+                longitude REAL
+            );
+            CREATE TABLE IF NOT EXISTS supplier_ids (
+                supplier TEXT NOT NULL,
+                hotel_id TEXT NOT NULL,
+                canonical_id INTEGER NOT NULL,
+                PRIMARY KEY (supplier, hotel_id)
+            );
+        ''')
+        self.conn.commit()
+
+        # Данные в памяти: поиск по ID и кандидаты по ячейкам сетки
+        self.ids = {}
+        self.properties = {}
+        self.cells = {}
+        self._load()
+
+    def _load(self):
+        for canonical_id, name, address, latitude, longitude in self.conn.execute(
+                'SELECT canonical_id, name, address, latitude, longitude FROM properties'):
+            self._remember(canonical_id, name, address, latitude, longitude)
+        for supplier, hotel_id, canonical_id in self.conn.execute(
+                'SELECT supplier, hotel_id, canonical_id FROM supplier_ids'):
+            self.ids[(supplier, hotel_id)] = canonical_id
+
+    def _remember(self, canonical_id, name, address, latitude, longitude):
+        self.properties[canonical_id] = (normalize_name(name), normalize_name(address),
+                                         latitude, longitude)
+        if latitude is not None and longitude is not None:
+            self.cells.setdefault(grid_cell(latitude, longitude), []).append(canonical_id)
+
+    def lookup(self, supplier, hotel_id):
+        """
+        canonical_id отеля поставщика
+
+        Returns:
+            int: canonical_id или None, если отель еще не в индексе
+        """
+        return self.ids.get((supplier, str(hotel_id)))
+
+    def property_key(self, offer):
+        """
+        Ключ отеля для HotelAggregator(property_key=...)
+
+        Известные отели получают общий ключ 'hotel:<canonical_id>'. Новые отели
+        с названием и координатами сопоставляются и добавляются в индекс; без
+        координат ключ остается ключом поставщика. Сопоставление и запись в
+        SQLite выполняются синхронно, поэтому HotelAggregator вызывает эту
+        функцию в пуле потоков, а не в цикле событий.
+        """
+        canonical_id = self.lookup(offer['supplier'], offer['hotel_id'])
+        if canonical_id is None and offer.get('latitude') is not None and offer.get('name'):
+            canonical_id = self.add(offer['supplier'], offer['hotel_id'], offer['name'],
+                                    offer['latitude'], offer['longitude'])
+        if canonical_id is None:
+            return f"{offer['supplier']}:{offer['hotel_id']}"
+        return f"hotel:{canonical_id}"
+
+    def find_match(self, name, latitude, longitude, address=None):
+        """
+        Найти уже известный отель, совпадающий с описанием
+
+        Returns:
+            int: canonical_id лучшего кандидата или None
+        """
+        norm_name = normalize_name(name)
+        norm_address = normalize_name(address)
+        cell_y, cell_x = grid_cell(latitude, longitude)
+
+        best = None
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                for canonical_id in self.cells.get((cell_y + dy, cell_x + dx), ()):
+                    cand_name, cand_address, cand_lat, cand_lon = self.properties[canonical_id]
+                    distance = haversine_m(latitude, longitude, cand_lat, cand_lon)
+                    if distance > MATCH_RADIUS_M:
+                        continue
+                    score = name_similarity(norm_name, cand_name)
+                    # Совпадающий адрес компенсирует расхождения в названии
+                    if norm_address and cand_address and \
+                            name_similarity(norm_address, cand_address) >= NAME_THRESHOLD:
+                        score = min(score + 0.15, 1.0)
+                    threshold = NEAR_NAME_THRESHOLD if distance <= NEAR_RADIUS_M else NAME_THRESHOLD
+                    if score >= threshold and (best is None or score > best[0]):
+                        best = (score, canonical_id)
+        return best[1] if best else None
+
+    def add(self, supplier, hotel_id, name, latitude, longitude, address=None):
+        """
+        Добавить отель поставщика в индекс
+
+        Если отель уже сопоставлен, возвращается его canonical_id; иначе ищется
+        совпадение среди известных отелей, а при его отсутствии заводится новый.
+
+        Returns:
+            int: canonical_id
+        """
+        key = (supplier, str(hotel_id))
+        with self.lock:
+            if key in self.ids:
+                return self.ids[key]
+
+            canonical_id = None
+            if latitude is not None and longitude is not None:
+                canonical_id = self.find_match(name, latitude, longitude, address)
+            if canonical_id is None:
+                cursor = self.conn.execute(
+                    'INSERT INTO properties (name, address, latitude, longitude) VALUES (?, ?, ?, ?)',
+                    (name, address, latitude, longitude)
+                )
+                canonical_id = cursor.lastrowid
+                self._remember(canonical_id, name, address, latitude, longitude)
+
+            self.conn.execute(
+                'INSERT OR REPLACE INTO supplier_ids (supplier, hotel_id, canonical_id) VALUES (?, ?, ?)',
+                (supplier, key[1], canonical_id)
+            )
+            self.conn.commit()
+            self.ids[key] = canonical_id
+            return canonical_id
+
+    def add_many(self, records):
+        """
+        Добавить отели пачкой
+
+        Args:
+            records: Итерируемое словарей supplier, hotel_id, name, latitude,
+                longitude и необязательный address (например, из контент-API)
+
+        Returns:
+            int: Количество обработанных записей
+        """
+        count = 0
+        for record in records:
+            self.add(record['supplier'], record['hotel_id'], record.get('name'),
+                     record.get('latitude'), record.get('longitude'), record.get('address'))
+            count += 1
+        return count
+
+    def link(self, supplier, hotel_id, canonical_id):
+        """Вручную привязать ID поставщика к отелю (исправление ошибок сопоставления)"""
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO supplier_ids (supplier, hotel_id, canonical_id) VALUES (?, ?, ?)',
+                (supplier, str(hotel_id), canonical_id)
+            )
+            self.conn.commit()
+            self.ids[(supplier, str(hotel_id))] = canonical_id
+
+    def supplier_ids(self, canonical_id):
+        """Все ID поставщиков для отеля: {поставщик: [ID, ...]}"""
+        result = {}
+        for (supplier, hotel_id), cid in self.ids.items():
+            if cid == canonical_id:
+                result.setdefault(supplier, []).append(hotel_id)
+        return result
+
+    def stats(self):
+        """Количество отелей и привязанных ID поставщиков"""
+        return {'properties': len(self.properties), 'supplier_ids': len(self.ids)}
+
+    def close(self):
+        """Закрыть базу"""
+        with self.lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    index = HotelIdentityIndex()
+    index.add_many([
+        {'supplier': 'hotelbeds', 'hotel_id': 1533, 'name': 'Hotel Arts Barcelona',
+         'latitude': 41.3865, 'longitude': 2.1963, 'address': 'Carrer de la Marina 19-21'},
+        {'supplier': 'booking', 'hotel_id': 10507360, 'name': 'Arts Barcelona',
+         'latitude': 41.3868, 'longitude': 2.1960},
+        {'supplier': 'agoda', 'hotel_id': 69001, 'name': 'The Hotel Arts, Barcelona',
+         'latitude': 41.3862, 'longitude': 2.1966},
+        {'supplier': 'sabre', 'hotel_id': 'HC123', 'name': 'W Barcelona',
+         'latitude': 41.3684, 'longitude': 2.1900},
+    ])
+    print(index.stats())
+    canonical_id = index.lookup('booking', 10507360)
+    print(canonical_id, index.supplier_ids(canonical_id))
@@ -0,0 +1,197 @@
+"""
+Загрузка деталей для списков ID (list-then-detail)
+
+Многие сценарии сначала получают список (станции Sixt, места Foursquare,
+отели Booking.com, активности Musement, рестораны Strapi), а потом по
+одному запрашивают детали каждого элемента. DetailHydrator принимает поток
+ID, убирает повторы, берет уже загруженные детали из кэша, а остальные
+запрашивает пачками через bulk-эндпоинт провайдера (если он есть) или
+параллельными одиночными запросами с ограничением числа потоков.
+
+Ошибки (None или исключение из функции загрузки) не кэшируются.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CACHE_TTL = 3600
+DEFAULT_CACHE_SIZE = 10000
+
+
+class DetailCache:
+    """Потокобезопасный LRU-кэш деталей в памяти с TTL"""
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            ttl (int): Время жизни записи в секундах (None — без ограничения)
+            max_entries (int): Максимум записей, лишние вытесняются по LRU
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Детали по ключу или None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (self.ttl is not None and time.monotonic() - entry[0] > self.ttl):
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Сохранить детали"""
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        """Размер кэша и счетчики попаданий"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+class DetailHydrator:
+    """Дедупликация, кэш и параллельная загрузка деталей по ID"""
+
+    def __init__(self, fetch_one=None, fetch_many=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_workers=DEFAULT_MAX_WORKERS, cache=None, name='details'):
+        """
+        Args:
+            fetch_one (callable): fetch_one(id) -> детали или None
+            fetch_many (callable): fetch_many([id, ...]) -> {id: детали}; если задан,
+                используется вместо fetch_one
+            batch_size (int): Максимум ID в одном вызове fetch_many
+            max_workers (int): Максимум одновременных запросов
+            cache (DetailCache): Кэш деталей (None — без кэша)
+            name (str): Имя для сообщений об ошибках
+        """
+        if fetch_one is None and fetch_many is None:
+            raise ValueError("Нужна функция fetch_one или fetch_many")
+        self.fetch_one = fetch_one
+        self.fetch_many = fetch_many
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.cache = cache
+        self.name = name
+
+    def _load(self, keys):
+        # Одна задача пула: пачка для fetch_many или один ID для fetch_one
+        try:
+            if self.fetch_many is not None:
+                found = self.fetch_many(keys) or {}
+                return [(key, found.get(key)) for key in keys]
+            return [(keys[0], self.fetch_one(keys[0]))]
+        except Exception as e:
+            print(f"Ошибка загрузки {self.name} для {keys}: {e}")
+            return [(key, None) for key in keys]
+
+    def stream(self, ids):
+        """
+        Загрузить детали, выдавая их по мере готовности
+
+        ID читаются из итератора постепенно: в работе одновременно не больше
+        max_workers задач, поэтому поток ID может быть длинным или ленивым.
+
+        Args:
+            ids: Итерируемое ID (повторы пропускаются)
+
+        Yields:
+            tuple: (id, детали или None)
+        """
+        seen = set()
+        group_size = self.batch_size if self.fetch_many is not None else 1
+
+        def groups():
+            group = []
+            for key in ids:
+                if key is None or key in seen:
+                    continue
+                seen.add(key)
+                if self.cache is not None:
+                    cached = self.cache.get(key)
+                    if cached is not None:
+                        yield None, (key, cached)
+                        continue
+                group.append(key)
+                if len(group) >= group_size:
+                    yield group, None
+                    group = []
+            if group:
+                yield group, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = set()
+            for group, cached in groups():
+                if cached is not None:
+                    yield cached
+                    continue
+                pending.add(pool.submit(self._load, group))
+                while len(pending) >= self.max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self._collect(done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._collect(done)
+
+    def _collect(self, futures):
+        for future in futures:
+            for key, value in future.result():
+                if value is not None and self.cache is not None:
+                    self.cache.put(key, value)
+                yield key, value
+
+    def hydrate(self, ids):
+        """
+        Загрузить детали для списка ID
+
+        Returns:
+            dict: {id: детали} в порядке первого появления ID; ID, которые
+                не удалось загрузить, отсутствуют
+        """
+        ids = list(ids)
+        loaded = dict(self.stream(ids))
+        return {key: loaded[key] for key in dict.fromkeys(ids) if loaded.get(key) is not None}
+
+
+if __name__ == "__main__":
+    # Имитация: одиночный запрос — 0.1 с, bulk-запрос — 0.15 с на пачку
+    def slow_detail(item_id):
+        time.sleep(0.1)
+        return {'id': item_id}
+
+    def slow_bulk(item_ids):
+        time.sleep(0.15)
+        return {item_id: {'id': item_id} for item_id in item_ids}
+
+    ids = [i % 40 for i in range(60)]
+    for title, hydrator in [
+        ('по одному, 8 потоков', DetailHydrator(fetch_one=slow_detail, cache=DetailCache())),
+        ('bulk по 10', DetailHydrator(fetch_many=slow_bulk, batch_size=10, cache=DetailCache())),
+    ]:
+        started = time.monotonic()
+        result = hydrator.hydrate(ids)
+        first = time.monotonic() - started
+        started = time.monotonic()
+        hydrator.hydrate(ids)
+        print(f"{title}: {len(result)} деталей за {first:.2f} с, повторно за "
+              f"{time.monotonic() - started:.3f} с, кэш {hydrator.cache.stats()}")
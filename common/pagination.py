@@ -0,0 +1,434 @@
+"""
+Потоковая постраничная выборка списков с упреждающей загрузкой
+
+Каждый провайдер листает списки по-своему: Ticketmaster — page/size и
+page.totalPages, Cleveland — limit/skip, GetYourGuide — limit/offset,
+Europeana — rows/cursor, Eventbrite — continuation, 2GIS — page/page_size.
+Pager сводит это к одному генератору: правило перехода (стратегия)
+по ответу строит запрос следующей страницы, а фоновый поток загружает
+ее, пока вызывающий код обрабатывает текущую.
+
+В памяти одновременно не больше prefetch + 2 страниц (очередь, страница
+в загрузке и текущая), поэтому обход всего каталога идет за постоянную
+память. Если вызывающий код прекращает итерацию, фоновая загрузка
+останавливается.
+
+Ошибка загрузки страницы (fetch вернул None) завершает обход досрочно;
+pager.complete остается False, поэтому счетчики такого обхода нельзя
+считать полными.
+"""
+
+import queue
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urljoin, urlsplit
+
+import requests
+
+from common.ratelimit import get_rate_limiter
+from common.transport import get_session
+
+# Сколько страниц загружать заранее (0 — без фонового потока)
+DEFAULT_PREFETCH = 1
+MAX_RETRIES = 3
+# Маркер конца выборки в очереди
+_DONE = object()
+
+
+def make_fetch(headers=None, provider=None, credential=None, session=None, retries=MAX_RETRIES):
+    """
+    Функция загрузки страницы через общую сессию
+
+    Args:
+        headers (dict): Заголовки запросов
+        provider (str): Имя провайдера для общего RateLimiter (None — без ограничения)
+        credential (str): Ключ/учетная запись для RateLimiter
+        session: Сессия requests (по умолчанию общая из common.transport)
+        retries (int): Попыток на страницу при сетевых ошибках и 429/5xx
+
+    Returns:
+        callable: fetch(url, params) -> dict или None при ошибке
+    """
+    session = session or get_session()
+
+    def fetch(url, params):
+        for attempt in range(retries):
+            if provider:
+                get_rate_limiter().acquire(provider, credential)
+            try:
+                response = session.get(url, params=params, headers=headers)
+                if provider:
+                    get_rate_limiter().report_response(provider, credential, response)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                if attempt == retries - 1 or (status is not None and status < 500 and status != 429):
+                    print(f"Ошибка загрузки страницы {url} {params}: {e}")
+                    return None
+                time.sleep(2 ** attempt)
+        return None
+
+    return fetch
+
+
+def dig(data, path, default=None):
+    """Значение по пути 'a.b.c' во вложенных словарях"""
+    for key in path.split('.'):
+        if not isinstance(data, dict) or key not in data:
+            return default
+        data = data[key]
+    return data
+
+
+def items_at(path):
+    """Функция извлечения списка элементов страницы по пути 'a.b'"""
+    def get_items(page):
+        items = dig(page, path)
+        return items if isinstance(items, list) else []
+    return get_items
+
+
+# Стратегии перехода: next_request(page, url, params, items) -> (url, params) или None
+
+def offset_strategy(offset_param='offset', limit_param='limit', total=None, max_offset=None):
+    """
+    Смещение и размер страницы (limit/offset, limit/skip)
+
+    Args:
+        offset_param (str): Параметр смещения
+        limit_param (str): Параметр размера страницы
+        total (callable): total(page) -> общее количество или None
+        max_offset (int): Предел глубины выдачи провайдера
+    """
+    def next_request(page, url, params, items):
+        limit = int(params.get(limit_param) or len(items))
+        offset = int(params.get(offset_param) or 0) + limit
+        count = total(page) if total else None
+        if len(items) < limit or (count is not None and offset >= count):
+            return None
+        if max_offset is not None and offset >= max_offset:
+            return None
+        return url, {**params, offset_param: offset}
+    return next_request
+
+
+def page_strategy(page_param='page', size_param='size', first_page=1, total_pages=None,
+                  total=None, max_results=None, has_next=None):
+    """
+    Номер страницы (page/size, page/page_size)
+
+    Args:
+        page_param (str): Параметр номера страницы
+        size_param (str): Параметр размера страницы
+        first_page (int): Номер первой страницы (0 или 1)
+        total_pages (callable): total_pages(page) -> число страниц или None
+        total (callable): total(page) -> общее количество элементов или None
+        max_results (int): Предел глубины выдачи (номер * размер)
+        has_next (callable): has_next(page) -> False, если провайдер явно сообщает о конце
+    """
+    def next_request(page, url, params, items):
+        size = int(params.get(size_param) or len(items))
+        number = int(params.get(page_param, first_page)) + 1
+        offset = (number - first_page) * size
+        pages = total_pages(page) if total_pages else None
+        count = total(page) if total else None
+        if has_next is not None and not has_next(page):
+            return None
+        if len(items) < size or (pages is not None and number - first_page >= pages):
+            return None
+        if (count is not None and offset >= count) or (max_results is not None and offset >= max_results):
+            return None
+        return url, {**params, page_param: number}
+    return next_request
+
+
+def cursor_strategy(cursor_param, next_cursor, has_more=None):
+    """
+    Курсор (Europeana nextCursor, Eventbrite continuation, SevenRooms cursor)
+
+    Глубина выдачи не ограничена: курсор не требует от сервера пропускать
+    предыдущие страницы.
+
+    Args:
+        cursor_param (str): Параметр курсора в запросе
+        next_cursor (callable): next_cursor(page) -> курсор следующей страницы или None
+        has_more (callable): has_more(page) -> False, если страниц больше нет
+    """
+    def next_request(page, url, params, items):
+        cursor = next_cursor(page)
+        if not cursor or cursor == params.get(cursor_param):
+            return None
+        if has_more is not None and not has_more(page):
+            return None
+        return url, {**params, cursor_param: cursor}
+    return next_request
+
+
+def link_strategy(next_link, keep_params=()):
+    """
+    Ссылка на следующую страницу в ответе (HAL _links.next, next_page_url)
+
+    Args:
+        next_link (callable): next_link(page) -> относительный или абсолютный URL или None
+        keep_params (tuple): Параметры запроса, которые провайдер не включает в ссылку (ключ API)
+    """
+    def next_request(page, url, params, items):
+        link = next_link(page)
+        if not link:
+            return None
+        # Шаблонные части HAL вида {&sort} не являются частью адреса
+        parts = urlsplit(urljoin(url, re.sub(r'\{[^}]*\}', '', link)))
+        next_params = dict(parse_qsl(parts.query))
+        next_params.update({key: params[key] for key in keep_params if key in params})
+        return parts._replace(query='').geturl(), next_params
+    return next_request
+
+
+class Pager:
+    """Генератор элементов списка с упреждающей загрузкой страниц"""
+
+    def __init__(self, fetch, url, params, get_items, next_request, prefetch=DEFAULT_PREFETCH,
+                 max_pages=None, max_items=None, name='pages'):
+        """
+        Args:
+            fetch (callable): fetch(url, params) -> ответ страницы (dict) или None при ошибке
+            url (str): URL (или эндпоинт, понятный fetch) первой страницы
+            params (dict): Параметры первой страницы
+            get_items (callable): get_items(page) -> список элементов страницы
+            next_request (callable): Стратегия перехода (offset_strategy, page_strategy, ...)
+            prefetch (int): Сколько страниц загружать заранее (0 — без фонового потока)
+            max_pages (int): Максимум страниц (None — до конца списка)
+            max_items (int): Максимум элементов (None — до конца списка)
+            name (str): Имя для сообщений
+        """
+        self.fetch = fetch
+        self.url = url
+        self.params = dict(params or {})
+        self.get_items = get_items
+        self.next_request = next_request
+        self.prefetch = prefetch
+        self.max_pages = max_pages
+        self.max_items = max_items
+        self.name = name
+        self.stats = {'pages': 0, 'items': 0, 'fetch_seconds': 0.0, 'wait_seconds': 0.0}
+        # Запрос страницы, которая загрузилась бы следующей; после полного обхода — None
+        self.next_page = (url, self.params)
+        # True, если выборка дошла до конца списка (или до max_pages/max_items)
+        self.complete = False
+
+    def _walk(self, stop):
+        # Загрузка страниц по порядку: (страница, элементы)
+        url, params = self.url, self.params
+        pages = 0
+        self.complete = False
+        while url is not None and not stop.is_set():
+            started = time.monotonic()
+            page = self.fetch(url, params)
+            self.stats['fetch_seconds'] += time.monotonic() - started
+            if page is None:
+                print(f"{self.name}: обход прерван на странице {pages + 1}, выборка неполная")
+                return
+            items = self.get_items(page) or []
+            pages += 1
+            following = None
+            if items and (self.max_pages is None or pages < self.max_pages):
+                following = self.next_request(page, url, params, items)
+            yield page, items, following
+            url, params = following if following else (None, None)
+        if url is None:
+            self.complete = True
+
+    def _produce(self, out, stop):
+        def put(entry):
+            # Очередь ограничена: поток ждет, пока потребитель заберет страницу
+            while not stop.is_set():
+                try:
+                    out.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for entry in self._walk(stop):
+                if not put(entry):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    def _entries(self):
+        stop = threading.Event()
+        if self.prefetch <= 0:
+            yield from self._walk(stop)
+            return
+
+        out = queue.Queue(maxsize=self.prefetch)
+        thread = threading.Thread(target=self._produce, args=(out, stop),
+                                  name=f"pager-{self.name}", daemon=True)
+        thread.start()
+        try:
+            while True:
+                started = time.monotonic()
+                entry = out.get()
+                self.stats['wait_seconds'] += time.monotonic() - started
+                if entry is _DONE:
+                    return
+                if isinstance(entry, Exception):
+                    raise entry
+                yield entry
+        finally:
+            stop.set()
+
+    def pages(self):
+        """
+        Страницы по порядку
+
+        Yields:
+            tuple: (ответ страницы, список элементов)
+        """
+        for page, items, following in self._entries():
+            self.stats['pages'] += 1
+            self.next_page = following
+            yield page, items
+
+    def __iter__(self):
+        """Элементы всех страниц по одному"""
+        count = 0
+        for _, items in self.pages():
+            for item in items:
+                if self.max_items is not None and count >= self.max_items:
+                    self.complete = True
+                    return
+                count += 1
+                self.stats['items'] += 1
+                yield item
+
+
+# Провайдеры
+
+def ticketmaster_events(api_key, size=200, prefetch=DEFAULT_PREFETCH, max_items=None, **params):
+    """
+    События Ticketmaster Discovery (page/size)
+
+    Discovery API отдает не глубже 1000 элементов (size * page < 1000);
+    для полного обхода сужайте запрос (по датам, городу, classificationName).
+    Конец выборки — отсутствие _links.next или page.totalPages.
+    """
+    return Pager(make_fetch(provider='ticketmaster', credential=api_key),
+                 "https://app.ticketmaster.com/discovery/v2/events.json",
+                 {'apikey': api_key, 'size': size, 'page': 0, **params},
+                 items_at('_embedded.events'),
+                 page_strategy('page', 'size', first_page=0,
+                               total_pages=lambda page: dig(page, 'page.totalPages'),
+                               max_results=1000,
+                               has_next=lambda page: dig(page, '_links.next') is not None),
+                 prefetch=prefetch, max_items=max_items, name='ticketmaster')
+
+
+def cleveland_artworks(limit=1000, prefetch=DEFAULT_PREFETCH, max_items=None, **params):
+    """Произведения Cleveland Museum of Art Open Access (limit/skip, info.total)"""
+    return Pager(make_fetch(provider='cleveland'),
+                 "https://openaccess-api.clevelandart.org/api/artworks",
+                 {'limit': limit, 'skip': 0, **params},
+                 items_at('data'),
+                 offset_strategy('skip', 'limit', total=lambda page: dig(page, 'info.total')),
+                 prefetch=prefetch, max_items=max_items, name='cleveland')
+
+
+def europeana_search(api_key, query='*', rows=100, prefetch=DEFAULT_PREFETCH, max_items=None, **params):
+    """
+    Поиск Europeana с курсором (rows/cursor)
+
+    cursor='*' начинает обход, следующий курсор — nextCursor ответа. В отличие
+    от start, курсор не ограничен глубиной выдачи (start + rows <= 1000).
+    """
+    return Pager(make_fetch(provider='europeana', credential=api_key),
+                 "https://api.europeana.eu/record/v2/search.json",
+                 {'wskey': api_key, 'query': query, 'rows': rows, 'cursor': '*', **params},
+                 items_at('items'),
+                 cursor_strategy('cursor', lambda page: page.get('nextCursor')),
+                 prefetch=prefetch, max_items=max_items, name='europeana')
+
+
+def eventbrite_organization_events(organization_id, token, prefetch=DEFAULT_PREFETCH, max_items=None, **params):
+    """События организации Eventbrite (pagination.continuation / has_more_items)"""
+    return Pager(make_fetch({'Authorization': f'Bearer {token}'}, provider='eventbrite', credential=token),
+                 f"https://www.eventbriteapi.com/v3/organizations/{organization_id}/events/",
+                 dict(params),
+                 items_at('events'),
+                 cursor_strategy('continuation', lambda page: dig(page, 'pagination.continuation'),
+                                 has_more=lambda page: dig(page, 'pagination.has_more_items', False)),
+                 prefetch=prefetch, max_items=max_items, name='eventbrite')
+
+
+def twogis_items(api_key, page_size=50, prefetch=DEFAULT_PREFETCH, max_items=None, **params):
+    """
+    Объекты 2GIS Places (page/page_size, result.total)
+
+    Демо-ключи ограничены page_size <= 10 и первыми страницами выдачи.
+    """
+    return Pager(make_fetch(provider='2gis', credential=api_key),
+                 "https://catalog.api.2gis.com/3.0/items",
+                 {'key': api_key, 'page': 1, 'page_size': page_size, **params},
+                 items_at('result.items'),
+                 page_strategy('page', 'page_size', first_page=1, total=lambda page: dig(page, 'result.total')),
+                 prefetch=prefetch, max_items=max_items, name='2gis')
+
+
+def thefork_customers(group_uuid, token, limit=100, prefetch=DEFAULT_PREFETCH, max_items=None, **params):
+    """Клиенты группы ресторанов TheFork B2B (page/limit)"""
+    return Pager(make_fetch({'Authorization': f'Bearer {token}', 'Accept': 'application/json'},
+                            provider='thefork', credential=group_uuid),
+                 "https://api.thefork.io/manager/v1/customers",
+                 {'groupUuid': group_uuid, 'limit': limit, 'page': 1, **params},
+                 items_at('data'),
+                 page_strategy('page', 'limit', first_page=1),
+                 prefetch=prefetch, max_items=max_items, name='thefork')
+
+
+def tiqets_products(api_key, page_size=100, base_url="https://api.tiqets.com/v2",
+                    prefetch=DEFAULT_PREFETCH, max_items=None, **params):
+    """Продукты Tiqets Distributor API (page/page_size, pagination.total)"""
+    return Pager(make_fetch({'Authorization': f'Token {api_key}', 'Accept': 'application/json'},
+                            provider='tiqets', credential=api_key),
+                 f"{base_url.rstrip('/')}/products",
+                 {'page': 1, 'page_size': page_size, **params},
+                 items_at('products'),
+                 page_strategy('page', 'page_size', first_page=1, total=lambda page: dig(page, 'pagination.total')),
+                 prefetch=prefetch, max_items=max_items, name='tiqets')
+
+
+if __name__ == "__main__":
+    # Имитация: 20 страниц по 100 элементов, загрузка страницы 0.05 с,
+    # обработка страницы вызывающим кодом 0.05 с
+    def fake_fetch(url, params):
+        time.sleep(0.05)
+        skip = params['skip']
+        return {'info': {'total': 2000}, 'data': list(range(skip, min(skip + params['limit'], 2000)))}
+
+    for prefetch in (0, 1):
+        pager = Pager(fake_fetch, 'fake', {'limit': 100, 'skip': 0}, items_at('data'),
+                      offset_strategy('skip', 'limit', total=lambda page: dig(page, 'info.total')),
+                      prefetch=prefetch)
+        started = time.monotonic()
+        total = 0
+        for _, items in pager.pages():
+            time.sleep(0.05)
+            total += len(items)
+        print(f"prefetch={prefetch}: {total} элементов, {pager.stats['pages']} страниц за "
+              f"{time.monotonic() - started:.2f} с, ожидание страниц {pager.stats['wait_seconds']:.2f} с, "
+              f"полная выборка: {pager.complete}")
+
+    # Ошибка на третьей странице: обход завершается, complete = False
+    def failing_fetch(url, params):
+        return None if params['skip'] >= 200 else fake_fetch(url, params)
+
+    pager = Pager(failing_fetch, 'fake', {'limit': 100, 'skip': 0}, items_at('data'),
+                  offset_strategy('skip', 'limit', total=lambda page: dig(page, 'info.total')))
+    print(f"С ошибкой: {sum(1 for _ in pager)} элементов, полная выборка: {pager.complete}")
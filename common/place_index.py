@@ -0,0 +1,304 @@
+"""
+Локальный пространственный индекс мест из ответов Sabre Geo Search
+
+Каждый отель (или другой объект категории), встреченный в ответах Geo
+Search, сохраняется в SQLite с R-tree индексом по координатам. Вместе с
+ним запоминаются уже обысканные круги (центр, радиус, категория) и
+координаты опорных точек — аэропортов и городов, которые Sabre
+возвращает в центре ответа.
+
+Запрос по радиусу, который целиком лежит внутри обысканного круга,
+выполняется локально, с фильтрами по категории, сети и звездности.
+Сеть нужна только для еще не покрытых областей.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from common.geocache import haversine_m
+
+KM_PER_MILE = 1.609344
+KM_PER_DEGREE = 111.32
+
+
+def radius_km(radius, uom='KM'):
+    """Радиус в километрах (Sabre принимает KM и MI)"""
+    return float(radius) * (KM_PER_MILE if str(uom).upper() == 'MI' else 1.0)
+
+
+class PlaceIndex:
+    """Индекс мест и обысканных областей в SQLite"""
+
+    def __init__(self, path=':memory:', max_age=None):
+        """
+        Args:
+            path (str): Файл базы (':memory:' — только в памяти)
+            max_age (int): Через сколько секунд обысканная область считается
+                устаревшей (None — никогда)
+        """
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS places (
+                rowid INTEGER PRIMARY KEY,
+                category TEXT NOT NULL,
+                code TEXT NOT NULL,
+                name TEXT,
+                chain_code TEXT,
+                star_rating REAL,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                payload TEXT NOT NULL,
+                updated REAL NOT NULL,
+                UNIQUE (category, code)
+            );
+            CREATE TABLE IF NOT EXISTS coverage (
+                category TEXT NOT NULL,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                radius_km REAL NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS coverage_category ON coverage (category, latitude);
+            CREATE TABLE IF NOT EXISTS anchors (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                PRIMARY KEY (kind, value)
+            );
+        ''')
+        try:
+            self.conn.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree '
+                'USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+            )
+            self.rtree = True
+        except sqlite3.OperationalError:
+            # SQLite собран без R-tree — используем обычный индекс по координатам
+            self.conn.execute('CREATE INDEX IF NOT EXISTS places_point ON places (latitude, longitude)')
+            self.rtree = False
+        self.conn.commit()
+
+    # --- запись
+
+    def add_response(self, response_data, category=None, search_center=None, searched_radius_km=None):
+        """
+        Сохранить ответ Geo Search: места и обысканную область
+
+        Args:
+            response_data (dict): Ответ API (GeoSearchRS)
+            category (str): Категория поиска (по умолчанию из ответа)
+            search_center (tuple): Центр поиска, если его нет в ответе
+            searched_radius_km (float): Радиус поиска в км (по умолчанию из ответа)
+
+        Returns:
+            int: Количество сохраненных мест
+        """
+        results = (response_data or {}).get('GeoSearchRS', {}).get('GeoSearchResults', {})
+        if not results:
+            return 0
+        category = category or results.get('Category', 'HOTEL')
+        places = results.get('GeoSearchResult', [])
+        now = time.time()
+
+        with self.lock:
+            saved = 0
+            for place in places:
+                geo = place.get('GeoCode', {})
+                code = place.get('HotelCode') or place.get('Code') or place.get('Id')
+                if code is None or geo.get('Latitude') is None or geo.get('Longitude') is None:
+                    continue
+                lat, lon = float(geo['Latitude']), float(geo['Longitude'])
+                self.conn.execute(
+                    'INSERT INTO places (category, code, name, chain_code, star_rating, latitude, longitude, '
+                    'payload, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (category, code) DO UPDATE SET name = excluded.name, '
+                    'chain_code = excluded.chain_code, star_rating = excluded.star_rating, '
+                    'latitude = excluded.latitude, longitude = excluded.longitude, '
+                    'payload = excluded.payload, updated = excluded.updated',
+                    (category, str(code), place.get('HotelName') or place.get('Name'),
+                     place.get('ChainCode'), place.get('StarRating'), lat, lon,
+                     json.dumps(place, ensure_ascii=False), now)
+                )
+                if self.rtree:
+                    rowid = self.conn.execute(
+                        'SELECT rowid FROM places WHERE category = ? AND code = ?', (category, str(code))
+                    ).fetchone()[0]
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO places_rtree VALUES (?, ?, ?, ?, ?)',
+                        (rowid, lat, lat, lon, lon)
+                    )
+                saved += 1
+
+            center = search_center
+            if results.get('Latitude') is not None and results.get('Longitude') is not None:
+                center = (float(results['Latitude']), float(results['Longitude']))
+            radius = searched_radius_km
+            if radius is None and results.get('Radius') is not None:
+                radius = radius_km(results['Radius'], results.get('UOM', 'KM'))
+
+            if center is not None and radius:
+                max_results = results.get('MaxSearchResults')
+                if max_results and len(places) >= int(max_results) and places:
+                    # Ответ обрезан лимитом — покрыт только круг до самого дальнего результата
+                    radius = min(radius, max(
+                        haversine_m(center[0], center[1],
+                                    float(p['GeoCode']['Latitude']), float(p['GeoCode']['Longitude'])) / 1000
+                        for p in places if p.get('GeoCode', {}).get('Latitude') is not None
+                    ))
+                self.conn.execute(
+                    'INSERT INTO coverage (category, latitude, longitude, radius_km, created) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (category, center[0], center[1], radius, now)
+                )
+            self.conn.commit()
+            return saved
+
+    def set_anchor(self, kind, value, latitude, longitude):
+        """Запомнить координаты опорной точки ('airport', 'SVO' / 'city', 'moscow')"""
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO anchors (kind, value, latitude, longitude) VALUES (?, ?, ?, ?)',
+                (kind, str(value).strip().lower(), float(latitude), float(longitude))
+            )
+            self.conn.commit()
+
+    # --- чтение
+
+    def anchor(self, kind, value):
+        """Координаты опорной точки или None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT latitude, longitude FROM anchors WHERE kind = ? AND value = ?',
+                (kind, str(value).strip().lower())
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def is_covered(self, latitude, longitude, radius, category='HOTEL'):
+        """
+        Лежит ли круг целиком внутри уже обысканной области
+
+        Круг покрыт, если он помещается в один из обысканных кругов той же категории.
+        """
+        now = time.time()
+        # Кандидаты — круги, центр которых не дальше самого большого радиуса
+        with self.lock:
+            max_radius = self.conn.execute(
+                'SELECT MAX(radius_km) FROM coverage WHERE category = ?', (category,)
+            ).fetchone()[0]
+            if max_radius is None or max_radius < radius:
+                return False
+            dlat = max_radius / KM_PER_DEGREE
+            rows = self.conn.execute(
+                'SELECT latitude, longitude, radius_km, created FROM coverage '
+                'WHERE category = ? AND latitude BETWEEN ? AND ? AND radius_km >= ?',
+                (category, latitude - dlat, latitude + dlat, radius)
+            ).fetchall()
+        for lat, lon, covered_radius, created in rows:
+            if self.max_age is not None and now - created > self.max_age:
+                continue
+            if haversine_m(latitude, longitude, lat, lon) / 1000 + radius <= covered_radius:
+                return True
+        return False
+
+    def query(self, latitude, longitude, radius, category='HOTEL', chain_codes=None,
+              min_stars=None, max_stars=None, limit=None):
+        """
+        Места в радиусе из локального индекса
+
+        Args:
+            latitude, longitude (float): Центр
+            radius (float): Радиус в км
+            category (str): Категория ('HOTEL', ...)
+            chain_codes (list): Только эти сети (ChainCode)
+            min_stars, max_stars (float): Диапазон звездности
+            limit (int): Максимум результатов
+
+        Returns:
+            list: Места (как в GeoSearchResult) с пересчитанным Distance, по возрастанию расстояния
+        """
+        dlat = radius / KM_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+        conditions = ['p.category = ?']
+        params = [category]
+        if chain_codes:
+            conditions.append(f"p.chain_code IN ({','.join('?' * len(chain_codes))})")
+            params.extend(chain_codes)
+        if min_stars is not None:
+            conditions.append('p.star_rating >= ?')
+            params.append(min_stars)
+        if max_stars is not None:
+            conditions.append('p.star_rating <= ?')
+            params.append(max_stars)
+
+        if self.rtree:
+            # R-tree хранит float32 с округлением наружу — ищем пересечение, а не вложение
+            sql = ('SELECT p.latitude, p.longitude, p.payload FROM places_rtree r '
+                   'JOIN places p ON p.rowid = r.id '
+                   'WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ? AND ')
+        else:
+            sql = ('SELECT p.latitude, p.longitude, p.payload FROM places p '
+                   'WHERE p.latitude BETWEEN ? AND ? AND p.longitude BETWEEN ? AND ? AND ')
+        sql += ' AND '.join(conditions)
+        bbox = [latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon]
+
+        with self.lock:
+            rows = self.conn.execute(sql, bbox + params).fetchall()
+
+        places = []
+        for lat, lon, payload in rows:
+            distance = haversine_m(latitude, longitude, lat, lon) / 1000
+            if distance <= radius:
+                place = json.loads(payload)
+                place['Distance'] = round(distance, 2)
+                places.append(place)
+        places.sort(key=lambda place: place['Distance'])
+        return places[:limit] if limit else places
+
+    def as_response(self, latitude, longitude, radius, category='HOTEL', uom='KM', **filters):
+        """
+        Результат query() в формате ответа Geo Search (для analyze_response)
+
+        radius и Distance в ответе — в единицах uom ('KM' или 'MI')
+        """
+        km = radius_km(radius, uom)
+        places = self.query(latitude, longitude, km, category, **filters)
+        # query() считает Distance в км, ответ — в единицах запроса, как у Sabre
+        km_per_unit = radius_km(1, uom)
+        for place in places:
+            place['Distance'] = round(place['Distance'] / km_per_unit, 2)
+        return {
+            'GeoSearchRS': {
+                'ApplicationResults': {'Success': {'TimeStamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}},
+                'GeoSearchResults': {
+                    'Radius': radius,
+                    'UOM': uom,
+                    'Category': category,
+                    'Latitude': latitude,
+                    'Longitude': longitude,
+                    'MaxSearchResults': len(places),
+                    'GeoSearchResult': places
+                }
+            },
+            'source': 'local_index'
+        }
+
+    def stats(self):
+        """Количество мест, обысканных областей и опорных точек"""
+        with self.lock:
+            return {
+                'places': self.conn.execute('SELECT COUNT(*) FROM places').fetchone()[0],
+                'covered_areas': self.conn.execute('SELECT COUNT(*) FROM coverage').fetchone()[0],
+                'anchors': self.conn.execute('SELECT COUNT(*) FROM anchors').fetchone()[0]
+            }
+
+    def close(self):
+        """Закрыть базу"""
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,374 @@
+"""
+Колоночное хранилище цен Google Hotels (priceViews)
+
+Каждая строка perItineraryPrices сохраняется один раз в набор
+append-only колонок (по файлу на колонку, фиксированный тип NumPy).
+Чтение идет через memory map, поэтому аналитика по тысячам отелей и дат
+заезда — это векторные операции над массивами без повторного разбора JSON.
+
+Строковые значения (ID отеля, валюта) хранятся в колонках как индексы
+словарей, которые лежат рядом в текстовых файлах (по строке на значение).
+
+Запись идет под блокировкой файла store.lock (fcntl, где он есть), поэтому
+в один каталог могут писать несколько процессов. Если прошлая запись
+прервалась между колонками, перед новой колонки обрезаются до общего
+числа строк.
+
+Нужен пакет numpy.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Колонки и их типы
+COLUMNS = {
+    'hotel': 'int32',        # индекс в hotels.txt
+    'checkin': 'int32',      # дата заезда, дней от 1970-01-01
+    'los': 'int16',          # продолжительность проживания, ночей
+    'price': 'float64',
+    'taxes': 'float64',
+    'fees': 'float64',
+    'currency': 'int16',     # индекс в currencies.txt
+    'updated': 'int64',      # updateTime из ответа, unix time
+    'fetched': 'int64',      # время сохранения, unix time
+}
+
+EPOCH = date(1970, 1, 1)
+
+
+def _checkin_days(value):
+    if isinstance(value, dict):
+        return (date(value['year'], value['month'], value['day']) - EPOCH).days
+    return (date.fromisoformat(str(value)) - EPOCH).days
+
+
+def _amount(value):
+    # Цена может прийти числом, строкой или объектом Money ({'units': '150', 'nanos': 0})
+    if value is None:
+        return np.nan
+    if isinstance(value, dict):
+        return float(value.get('units', 0)) + value.get('nanos', 0) / 1e9
+    return float(value)
+
+
+def _timestamp(value):
+    if not value:
+        return 0
+    return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp())
+
+
+def days_to_date(days):
+    """Номер дня от 1970-01-01 -> 'YYYY-MM-DD'"""
+    return (EPOCH + timedelta(days=int(days))).isoformat()
+
+
+class PriceStore:
+    """Append-only колоночное хранилище цен с чтением через memory map"""
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Каталог хранилища (создается при необходимости)
+        """
+        if np is None:
+            raise ImportError("Для хранилища цен требуется пакет numpy: pip install numpy")
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hotels = self._load_dictionary('hotels.txt')
+        self.currencies = self._load_dictionary('currencies.txt')
+        self.hotel_index = {name: i for i, name in enumerate(self.hotels)}
+        self.currency_index = {name: i for i, name in enumerate(self.currencies)}
+        self._columns = None
+
+    # --- словари строковых значений
+
+    def _load_dictionary(self, filename):
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as f:
+            return [line.rstrip('\n') for line in f]
+
+    def _code(self, value, values, index, filename):
+        code = index.get(value)
+        if code is None:
+            code = len(values)
+            values.append(value)
+            index[value] = code
+            with open(os.path.join(self.directory, filename), 'a', encoding='utf-8') as f:
+                f.write(value + '\n')
+        return code
+
+    # --- запись
+
+    @contextmanager
+    def _file_lock(self):
+        # Блокировка между процессами; без fcntl (Windows) — только threading.Lock
+        with open(os.path.join(self.directory, 'store.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _row_count(self):
+        # Число полных строк: запись могла прерваться между колонками
+        sizes = []
+        for name, dtype in COLUMNS.items():
+            path = self._column_path(name)
+            sizes.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def _repair_columns(self):
+        # Колонки длиннее общего числа строк обрезаются, иначе новые строки
+        # встанут в них со сдвигом
+        count = self._row_count()
+        for name, dtype in COLUMNS.items():
+            path = self._column_path(name)
+            if os.path.exists(path) and os.path.getsize(path) != count * np.dtype(dtype).itemsize:
+                os.truncate(path, count * np.dtype(dtype).itemsize)
+
+    def append_price_view(self, partner_hotel_id, price_view_data):
+        """
+        Сохранить ответ priceViews
+
+        Args:
+            partner_hotel_id (str): ID отеля партнера
+            price_view_data (dict): Результат GoogleHotelsAPIClient.get_price_view
+                или сам ответ API (с ключом perItineraryPrices)
+
+        Returns:
+            int: Количество сохраненных строк
+        """
+        data = price_view_data.get('data', price_view_data)
+        if not isinstance(data, dict):
+            return 0
+        prices = data.get('perItineraryPrices', [])
+        if not prices:
+            return 0
+
+        with self.lock, self._file_lock():
+            # Словари могли пополниться другим процессом
+            self.hotels = self._load_dictionary('hotels.txt')
+            self.currencies = self._load_dictionary('currencies.txt')
+            self.hotel_index = {name: i for i, name in enumerate(self.hotels)}
+            self.currency_index = {name: i for i, name in enumerate(self.currencies)}
+            self._repair_columns()
+            hotel = self._code(str(partner_hotel_id), self.hotels, self.hotel_index, 'hotels.txt')
+            fetched = int(time.time())
+            rows = {name: [] for name in COLUMNS}
+            for item in prices:
+                if 'checkinDate' not in item:
+                    continue
+                rows['hotel'].append(hotel)
+                rows['checkin'].append(_checkin_days(item['checkinDate']))
+                rows['los'].append(item.get('lengthOfStayDays', 1))
+                rows['price'].append(_amount(item.get('price')))
+                rows['taxes'].append(_amount(item.get('taxes', 0)))
+                rows['fees'].append(_amount(item.get('fees', 0)))
+                rows['currency'].append(self._code(item.get('currencyCode') or '', self.currencies,
+                                                   self.currency_index, 'currencies.txt'))
+                rows['updated'].append(_timestamp(item.get('updateTime')))
+                rows['fetched'].append(fetched)
+
+            for name, dtype in COLUMNS.items():
+                with open(self._column_path(name), 'ab') as f:
+                    f.write(np.asarray(rows[name], dtype=dtype).tobytes())
+            self._columns = None
+            return len(rows['hotel'])
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    # --- чтение
+
+    def columns(self):
+        """
+        Все колонки как массивы, отображенные в память
+
+        Returns:
+            dict: {имя колонки: numpy.ndarray}
+        """
+        if self._columns is not None:
+            return self._columns
+
+        # Запись могла прерваться между колонками — читаем только полные строки
+        count = self._row_count()
+
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            if count == 0:
+                columns[name] = np.empty(0, dtype=dtype)
+            else:
+                columns[name] = np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(count,))
+        self._columns = columns
+        return columns
+
+    def refresh(self):
+        """Перечитать данные, дописанные другими процессами"""
+        with self.lock:
+            self.hotels = self._load_dictionary('hotels.txt')
+            self.currencies = self._load_dictionary('currencies.txt')
+            self.hotel_index = {name: i for i, name in enumerate(self.hotels)}
+            self.currency_index = {name: i for i, name in enumerate(self.currencies)}
+            self._columns = None
+
+    def __len__(self):
+        return len(self.columns()['hotel'])
+
+    def select(self, hotels=None, checkin_from=None, checkin_to=None, currency=None, latest=True):
+        """
+        Индексы строк по условиям
+
+        Args:
+            hotels (list): ID отелей партнера (None — все)
+            checkin_from, checkin_to (str): Диапазон дат заезда включительно (YYYY-MM-DD)
+            currency (str): Только цены в этой валюте
+            latest (bool): Для каждого маршрута (отель, заезд, ночи) только последняя загрузка
+
+        Returns:
+            numpy.ndarray: Индексы выбранных строк
+        """
+        cols = self.columns()
+        mask = np.ones(len(cols['hotel']), dtype=bool)
+        if hotels is not None:
+            codes = [self.hotel_index[h] for h in map(str, hotels) if h in self.hotel_index]
+            mask &= np.isin(cols['hotel'], codes)
+        if checkin_from is not None:
+            mask &= cols['checkin'] >= _checkin_days(checkin_from)
+        if checkin_to is not None:
+            mask &= cols['checkin'] <= _checkin_days(checkin_to)
+        if currency is not None:
+            mask &= cols['currency'] == self.currency_index.get(currency, -1)
+
+        rows = np.flatnonzero(mask)
+        if latest and len(rows):
+            # Строки дописываются по времени, поэтому последняя строка маршрута — самая свежая
+            keys = (cols['hotel'][rows].astype(np.int64) << 32) | \
+                   (cols['checkin'][rows].astype(np.int64) << 16) | cols['los'][rows].astype(np.int64)
+            _, last = np.unique(keys[::-1], return_index=True)
+            rows = np.sort(rows[len(rows) - 1 - last])
+        return rows
+
+    def analyze(self, **filters):
+        """
+        Статистика цен по выбранным строкам
+
+        Формат совпадает с GoogleHotelsAPIClient.analyze_price_data (без
+        detailed_breakdown), но считается сразу по всем отелям.
+
+        Args:
+            **filters: Условия select()
+
+        Returns:
+            dict: total_itineraries, price_statistics, currency_info, date_range
+        """
+        cols = self.columns()
+        rows = self.select(**filters)
+        analysis = {
+            'total_itineraries': int(len(rows)),
+            'price_statistics': {},
+            'currency_info': {},
+            'date_range': {}
+        }
+        if not len(rows):
+            return analysis
+
+        prices = cols['price'][rows]
+        analysis['price_statistics'] = {
+            'min_price': float(np.nanmin(prices)),
+            'max_price': float(np.nanmax(prices)),
+            'avg_price': float(np.nanmean(prices)),
+            'total_revenue': float(np.nansum(prices)),
+            'avg_taxes': float(np.nanmean(cols['taxes'][rows])),
+            'avg_fees': float(np.nanmean(cols['fees'][rows]))
+        }
+
+        currency_codes, counts = np.unique(cols['currency'][rows], return_counts=True)
+        currencies = [self.currencies[code] for code in currency_codes]
+        analysis['currency_info'] = {
+            'currencies_used': currencies,
+            'primary_currency': currencies[int(np.argmax(counts))]
+        }
+
+        checkins = cols['checkin'][rows]
+        analysis['date_range'] = {
+            'earliest_date': days_to_date(checkins.min()),
+            'latest_date': days_to_date(checkins.max()),
+            'total_dates': int(len(np.unique(checkins)))
+        }
+        return analysis
+
+    def hotel_statistics(self, **filters):
+        """
+        Минимальная, максимальная и средняя цена по каждому отелю
+
+        Returns:
+            dict: {partner_hotel_id: {'min_price', 'max_price', 'avg_price', 'itineraries'}}
+        """
+        cols = self.columns()
+        rows = self.select(**filters)
+        if not len(rows):
+            return {}
+
+        hotels = cols['hotel'][rows]
+        prices = cols['price'][rows]
+        valid = ~np.isnan(prices)
+        hotels, prices = hotels[valid], prices[valid]
+
+        size = len(self.hotels)
+        counts = np.bincount(hotels, minlength=size)
+        sums = np.bincount(hotels, weights=prices, minlength=size)
+        mins = np.full(size, np.inf)
+        maxs = np.full(size, -np.inf)
+        np.minimum.at(mins, hotels, prices)
+        np.maximum.at(maxs, hotels, prices)
+
+        return {
+            self.hotels[code]: {
+                'min_price': float(mins[code]),
+                'max_price': float(maxs[code]),
+                'avg_price': float(sums[code] / counts[code]),
+                'itineraries': int(counts[code])
+            }
+            for code in np.flatnonzero(counts)
+        }
+
+    def cheapest_checkin(self, hotel, **filters):
+        """
+        Дата заезда с минимальной ценой за ночь для отеля
+
+        Returns:
+            dict: {'checkin_date', 'length_of_stay', 'price', 'price_per_night'} или None
+        """
+        cols = self.columns()
+        rows = self.select(hotels=[hotel], **filters)
+        if not len(rows):
+            return None
+        per_night = cols['price'][rows] / np.maximum(cols['los'][rows], 1)
+        if np.all(np.isnan(per_night)):
+            return None
+        best = rows[int(np.nanargmin(per_night))]
+        return {
+            'checkin_date': days_to_date(cols['checkin'][best]),
+            'length_of_stay': int(cols['los'][best]),
+            'price': float(cols['price'][best]),
+            'price_per_night': float(np.nanmin(per_night))
+        }
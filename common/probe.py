@@ -0,0 +1,230 @@
+"""
+Параллельная проверка эндпоинтов (probe)
+
+Исследовательские скрипты (AXSAPITester, поиск JSON API Science Museum
+Group, каталоги StubHub, swagger Europeana, explore_avis_api) перебирают
+базовые URL × пути по одному запросу, и полный обход занимает минуты.
+EndpointProber проверяет те же URL параллельно:
+
+- одновременных запросов не больше per_host_limit на хост и global_limit всего;
+- сначала HEAD; GET (с чтением только превью) — если HEAD ответил 2xx или
+  сервер не поддерживает HEAD (405, 501);
+- хост, который ни разу не ответил и дважды не принял соединение, считается
+  недоступным: его запросы в очереди пропускаются, а выполняющиеся отменяются;
+- результаты пишутся в JSONL по мере готовности, read_results читает их
+  обратно по одному для анализа.
+
+Цель — строка URL или словарь {'url', 'variants': [заголовки, ...], 'label'}:
+варианты заголовков пробуются по очереди, пока один не даст 2xx.
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import urljoin, urlsplit
+
+from common.async_transport import create_async_client, httpx
+
+DEFAULT_PER_HOST_LIMIT = 4
+DEFAULT_GLOBAL_LIMIT = 32
+DEFAULT_TIMEOUT = (5, 10)
+# Подряд неудачных подключений, после которых хост считается недоступным
+DEFAULT_DEAD_AFTER = 2
+PREVIEW_BYTES = 500
+# Ответы на HEAD, после которых нужен GET
+HEAD_UNSUPPORTED = (405, 501)
+
+
+class HostUnavailable(Exception):
+    """Хост признан недоступным, пока запрос ждал ответа"""
+
+
+def _target(target):
+    if isinstance(target, str):
+        return {'url': target, 'variants': [{}], 'label': None}
+    return {'url': target['url'], 'variants': target.get('variants') or [{}], 'label': target.get('label')}
+
+
+class EndpointProber:
+    """Параллельная проверка списка URL с лимитами по хостам"""
+
+    def __init__(self, headers=None, per_host_limit=DEFAULT_PER_HOST_LIMIT, global_limit=DEFAULT_GLOBAL_LIMIT,
+                 timeout=DEFAULT_TIMEOUT, head_first=True, dead_after=DEFAULT_DEAD_AFTER,
+                 preview_bytes=PREVIEW_BYTES, client=None):
+        """
+        Args:
+            headers (dict): Заголовки всех запросов (варианты цели дополняют их)
+            per_host_limit (int): Максимум одновременных запросов к одному хосту
+            global_limit (int): Максимум одновременных запросов всего
+            timeout (tuple): Таймаут (подключение, чтение)
+            head_first (bool): Проверять HEAD перед GET
+            dead_after (int): Подряд неудачных подключений до признания хоста недоступным
+            preview_bytes (int): Сколько байт тела ответа сохранять в превью
+            client (httpx.AsyncClient): Клиент (по умолчанию создается на время run)
+        """
+        self.headers = dict(headers or {})
+        self.per_host_limit = per_host_limit
+        self.global_limit = global_limit
+        self.timeout = timeout
+        self.head_first = head_first
+        self.dead_after = dead_after
+        self.preview_bytes = preview_bytes
+        self.client = client
+        self.hosts = {}
+
+    def _host(self, host):
+        # Состояние хоста создается в цикле событий run
+        state = self.hosts.get(host)
+        if state is None:
+            state = {'sem': asyncio.Semaphore(self.per_host_limit), 'dead': asyncio.Event(),
+                     'answered': False, 'failures': 0, 'error': None}
+            self.hosts[host] = state
+        return state
+
+    def _connection_failed(self, state, error):
+        state['failures'] += 1
+        state['error'] = error
+        if not state['answered'] and state['failures'] >= self.dead_after:
+            state['dead'].set()
+
+    async def _guarded(self, state, coro):
+        # Запрос выполняется, пока хост не признан недоступным
+        request = asyncio.ensure_future(coro)
+        dead = asyncio.ensure_future(state['dead'].wait())
+        done, _ = await asyncio.wait({request, dead}, return_when=asyncio.FIRST_COMPLETED)
+        if request in done:
+            dead.cancel()
+            return request.result()
+        request.cancel()
+        await asyncio.gather(request, return_exceptions=True)
+        raise HostUnavailable(state['error'])
+
+    async def _send(self, client, method, url, headers):
+        # Ответ без тела для HEAD, с превью не длиннее preview_bytes для GET
+        async with client.stream(method, url, headers=headers, follow_redirects=True) as response:
+            preview = b''
+            if method == 'GET':
+                async for chunk in response.aiter_bytes():
+                    preview += chunk
+                    if len(preview) >= self.preview_bytes:
+                        break
+            return response, preview[:self.preview_bytes]
+
+    def _record(self, result, method, response, preview):
+        content_type = response.headers.get('content-type', '')
+        result.update({
+            'method': method,
+            'status_code': response.status_code,
+            'final_url': str(response.url),
+            'content_type': content_type,
+            'content_length': int(response.headers.get('content-length') or len(preview)),
+            'headers': dict(response.headers),
+            'response_preview': preview.decode(response.encoding or 'utf-8', errors='replace') if preview else '',
+        })
+
+    async def _probe(self, client, target, global_sem):
+        url = target['url']
+        host = urlsplit(url).netloc
+        state = self._host(host)
+        result = {'url': url, 'host': host, 'label': target['label'], 'status_code': None}
+        started = time.monotonic()
+
+        async with state['sem']:
+            if state['dead'].is_set():
+                result.update({'skipped': 'host_unavailable', 'error': state['error']})
+                return result
+            async with global_sem:
+                try:
+                    for index, variant in enumerate(target['variants']):
+                        headers = {**self.headers, **variant}
+                        result['variant'] = index
+                        if self.head_first:
+                            response, _ = await self._guarded(state, self._send(client, 'HEAD', url, headers))
+                            state['answered'] = True
+                            self._record(result, 'HEAD', response, b'')
+                            if response.status_code >= 300 and response.status_code not in HEAD_UNSUPPORTED:
+                                continue
+                        response, preview = await self._guarded(state, self._send(client, 'GET', url, headers))
+                        state['answered'] = True
+                        self._record(result, 'GET', response, preview)
+                        if response.status_code < 300:
+                            break
+                except HostUnavailable as e:
+                    result.update({'skipped': 'host_unavailable', 'error': str(e)})
+                except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                    self._connection_failed(state, f"{type(e).__name__}: {e}")
+                    result['error'] = f"{type(e).__name__}: {e}"
+                except httpx.HTTPError as e:
+                    result['error'] = f"{type(e).__name__}: {e}"
+
+        result['elapsed'] = round(time.monotonic() - started, 3)
+        return result
+
+    async def iter_probe(self, targets, results_path=None):
+        """
+        Проверить цели и отдавать результаты по мере готовности
+
+        Args:
+            targets (list): URL или словари {'url', 'variants', 'label'}
+            results_path (str): JSONL, куда дописывается каждый результат
+
+        Yields:
+            dict: {'url', 'host', 'label', 'method', 'status_code', 'content_type',
+                'content_length', 'response_preview', 'elapsed', ...}; при ошибке —
+                'error', для недоступного хоста — 'skipped'
+        """
+        self.hosts = {}
+        targets = [_target(target) for target in targets]
+        client = self.client or create_async_client(timeout=self.timeout, max_connections=self.global_limit)
+        global_sem = asyncio.Semaphore(self.global_limit)
+        out = open(results_path, 'a', encoding='utf-8') if results_path else None
+        tasks = [asyncio.ensure_future(self._probe(client, target, global_sem)) for target in targets]
+        try:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                if out is not None:
+                    out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    out.flush()
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if out is not None:
+                out.close()
+            if self.client is None:
+                await client.aclose()
+
+    async def probe_all(self, targets, results_path=None):
+        """Все результаты списком (в порядке готовности)"""
+        return [result async for result in self.iter_probe(targets, results_path)]
+
+
+def run_probe(prober, targets, results_path=None):
+    """Синхронная обертка для запуска проверки из обычного кода"""
+    return asyncio.run(prober.probe_all(targets, results_path))
+
+
+def read_results(path):
+    """
+    Результаты из JSONL по одному (в том числе файл, который еще дописывается)
+
+    Yields:
+        dict: Результат проверки
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def expand_targets(base_urls, paths, variants=None):
+    """
+    Цели для всех комбинаций базовых URL и путей (сам базовый URL — первым)
+
+    Returns:
+        list: Словари целей для EndpointProber
+    """
+    return [{'url': url, 'variants': variants, 'label': base_url}
+            for base_url in base_urls
+            for url in [base_url] + [urljoin(base_url, path) for path in paths]]
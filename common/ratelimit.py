@@ -0,0 +1,301 @@
+"""
+Ограничение частоты запросов к провайдерам (token bucket)
+
+Для каждой пары (провайдер, учетные данные) ведется отдельное ведро
+токенов. Состояние ведер хранится в SQLite-файле, поэтому его разделяют
+все потоки и все рабочие процессы на машине: вместе они не превышают
+квоту провайдера и не оставляют ее неиспользованной.
+
+Ответ 429 с заголовком Retry-After блокирует ведро до указанного времени
+для всех процессов сразу.
+"""
+
+import email.utils
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Квоты по умолчанию: провайдер -> (запросов в секунду, размер всплеска).
+# Значения для платных тарифов нужно уточнять по договору / плану.
+DEFAULT_QUOTAS = {
+    'nominatim': (1.0, 1),          # политика OSMF: не больше 1 запроса в секунду
+    'amadeus': (10.0, 1),           # тестовая среда: 10 TPS, не чаще 1 запроса в 100 мс
+    'foursquare': (50.0, 50),       # Places API
+    'rapidapi': (5.0, 5),           # базовый план RapidAPI
+    'sixt': (5.0, 5),
+}
+# Квота для провайдеров, которых нет в таблице
+FALLBACK_QUOTA = (10.0, 10)
+# Пауза после 429 без заголовка Retry-After
+DEFAULT_RETRY_AFTER = 5.0
+
+DB_PATH_ENV = 'TRAVELPACK_RATELIMIT_DB'
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def bucket_key(provider, credential=None):
+    """Ключ ведра: провайдер + хэш учетных данных (сами данные не сохраняются)"""
+    if credential is None:
+        return provider
+    digest = hashlib.sha256(str(credential).encode()).hexdigest()[:16]
+    return f"{provider}:{digest}"
+
+
+def parse_retry_after(value):
+    """
+    Разобрать заголовок Retry-After
+
+    Returns:
+        float: Пауза в секундах или None
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class RateLimiter:
+    """Token bucket с общим для процессов состоянием в SQLite"""
+
+    def __init__(self, path=None, quotas=None):
+        """
+        Args:
+            path (str): Файл состояния; None — состояние только в памяти процесса
+            quotas (dict): Квоты {провайдер: (запросов в секунду, всплеск)}
+        """
+        self.path = path or ':memory:'
+        self.quotas = dict(DEFAULT_QUOTAS)
+        self.quotas.update(quotas or {})
+        self.local = threading.local()
+        # Для ':memory:' все потоки работают с одной базой через одно соединение
+        self.shared_conn = None
+        self.shared_lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        if self.path == ':memory:':
+            if self.shared_conn is None:
+                self.shared_conn = sqlite3.connect(':memory:', check_same_thread=False,
+                                                   isolation_level=None)
+                self._init_schema(self.shared_conn)
+            return self.shared_conn
+
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._init_schema(conn)
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def _init_schema(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0
+            )
+        ''')
+
+    def set_quota(self, provider, rate, burst=1):
+        """Задать квоту провайдера (запросов в секунду и размер всплеска)"""
+        self.quotas[provider] = (float(rate), burst)
+
+    def _quota(self, provider, tokens=1):
+        rate, burst = self.quotas.get(provider, FALLBACK_QUOTA)
+        # Ведро не наполняется выше burst: больше токенов не дождаться никогда
+        if tokens > burst:
+            raise ValueError(f"{provider}: запрошено {tokens} токенов при размере всплеска {burst}")
+        return rate, burst
+
+    def _transaction(self, func):
+        conn = self._connect()
+        if conn is self.shared_conn:
+            with self.shared_lock:
+                return self._run_transaction(conn, func)
+        return self._run_transaction(conn, func)
+
+    @staticmethod
+    def _run_transaction(conn, func):
+        # BEGIN IMMEDIATE берет блокировку записи сразу: чтение и списание
+        # токена атомарны для всех процессов
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(conn)
+            conn.execute('COMMIT')
+            return result
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def try_acquire(self, provider, credential=None, tokens=1):
+        """
+        Попробовать взять токены без ожидания
+
+        Returns:
+            float: 0, если токены получены, иначе сколько секунд подождать
+
+        Raises:
+            ValueError: tokens больше размера всплеска квоты
+        """
+        key = bucket_key(provider, credential)
+        rate, burst = self._quota(provider, tokens)
+
+        def take(conn):
+            now = time.time()
+            row = conn.execute(
+                'SELECT tokens, updated, blocked_until FROM buckets WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                available, blocked_until = float(burst), 0.0
+            else:
+                available = min(float(burst), row[0] + (now - row[1]) * rate)
+                blocked_until = row[2]
+
+            if now < blocked_until:
+                wait = blocked_until - now
+            elif available >= tokens:
+                available -= tokens
+                wait = 0.0
+            else:
+                wait = (tokens - available) / rate
+
+            conn.execute(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated, blocked_until) VALUES (?, ?, ?, ?)',
+                (key, available, now, blocked_until)
+            )
+            return wait
+
+        return self._transaction(take)
+
+    def wait_time(self, provider, credential=None, tokens=1):
+        """
+        Сколько секунд пришлось бы ждать токенов сейчас (без списания)
+
+        Returns:
+            float: 0, если токены есть
+        """
+        key = bucket_key(provider, credential)
+        rate, burst = self._quota(provider, tokens)
+        conn = self._connect()
+        if conn is self.shared_conn:
+            with self.shared_lock:
+                row = conn.execute(
+                    'SELECT tokens, updated, blocked_until FROM buckets WHERE key = ?', (key,)
+                ).fetchone()
+        else:
+            row = conn.execute(
+                'SELECT tokens, updated, blocked_until FROM buckets WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return 0.0
+        now = time.time()
+        if now < row[2]:
+            return row[2] - now
+        available = min(float(burst), row[0] + (now - row[1]) * rate)
+        return 0.0 if available >= tokens else (tokens - available) / rate
+
+    def acquire(self, provider, credential=None, tokens=1, timeout=None):
+        """
+        Дождаться токенов для запроса
+
+        Args:
+            provider (str): Имя провайдера ('nominatim', 'amadeus', ...)
+            credential (str): Учетные данные (ключ API), для которых действует квота
+            tokens (int): Сколько токенов списать
+            timeout (float): Максимальное ожидание в секундах (None — без ограничения)
+
+        Returns:
+            bool: True, если токены получены; False, если истек timeout
+
+        Raises:
+            ValueError: tokens больше размера всплеска квоты
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(provider, credential, tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def block(self, provider, credential=None, seconds=DEFAULT_RETRY_AFTER):
+        """Заблокировать ведро на заданное время (для всех процессов)"""
+        key = bucket_key(provider, credential)
+
+        def update(conn):
+            now = time.time()
+            conn.execute(
+                'INSERT INTO buckets (key, tokens, updated, blocked_until) VALUES (?, 0, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = 0, updated = excluded.updated, '
+                'blocked_until = MAX(blocked_until, excluded.blocked_until)',
+                (key, now, now + seconds)
+            )
+
+        self._transaction(update)
+
+    def report_response(self, provider, credential, response):
+        """
+        Учесть ответ провайдера: при 429 заблокировать ведро на Retry-After
+
+        Args:
+            response: Ответ requests/httpx (нужны status_code и headers)
+
+        Returns:
+            float: Пауза в секундах, если ответ 429, иначе None
+        """
+        if response.status_code != 429:
+            return None
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER
+        self.block(provider, credential, retry_after)
+        return retry_after
+
+
+def get_rate_limiter():
+    """
+    Получить общий ограничитель
+
+    Файл состояния по умолчанию лежит во временном каталоге, поэтому все
+    процессы пользователя делят квоты; путь можно задать переменной
+    окружения TRAVELPACK_RATELIMIT_DB.
+
+    Returns:
+        RateLimiter: Общий ограничитель
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                path = os.getenv(DB_PATH_ENV) or os.path.join(
+                    tempfile.gettempdir(), 'travelpack_ratelimit.sqlite'
+                )
+                _limiter = RateLimiter(path)
+    return _limiter
+
+
+def _reset_after_fork():
+    # Соединения SQLite нельзя использовать в дочернем процессе
+    global _limiter, _limiter_lock
+    _limiter = None
+    _limiter_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
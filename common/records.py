@@ -0,0 +1,414 @@
+"""
+Компактные записи нормализованных сущностей
+
+Анализаторы держат результаты вложенными словарями; когда для ранжирования
+в памяти миллион мест и предложений, большую часть памяти занимают сами
+словари. Здесь те же данные — записи со __slots__ (Place, HotelOffer,
+CarLocation, Event, Artwork, Restaurant) и их колоночная форма RecordBatch.
+
+- Конструкторы from_* берут значения прямо из разобранного JSON: строки не
+  копируются, а короткие повторяющиеся значения (страна, валюта, источник)
+  интернируются — миллион записей ссылаются на одну строку 'EUR'.
+- RecordBatch хранит числа в array('d') (None — NaN), категории — кодами в
+  array('i') со словарем значений, остальное — списками. Фильтры, сортировка
+  и выборка работают по колонкам; to_numpy отдает колонку без копирования.
+"""
+
+import math
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Виды полей
+FLOAT = 'float'
+TEXT = 'text'
+CATEGORY = 'category'
+OBJECT = 'object'
+
+
+def _float(value):
+    if value is None or type(value) is float:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _first(items):
+    return items[0] if isinstance(items, list) and items else {}
+
+
+class Record:
+    """База записей: поля и их виды задаются в FIELDS"""
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # __init__ с явными параметрами, без цикла по полям
+        names = [name for name, _ in cls.FIELDS]
+        convert = {FLOAT: '_float({})', CATEGORY: '_intern({})'}
+        lines = [f"def __init__(self, {', '.join(f'{name}=None' for name in names)}):"]
+        lines += [f"    self.{name} = {convert.get(kind, '{}').format(name)}" for name, kind in cls.FIELDS]
+        namespace = {'_float': _float, '_intern': _intern}
+        exec('\n'.join(lines), namespace)
+        cls.__init__ = namespace['__init__']
+
+    def to_dict(self):
+        """Запись в виде словаря"""
+        return {name: getattr(self, name) for name, _ in self.FIELDS}
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(
+            getattr(self, name) == getattr(other, name) for name, _ in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        shown = ', '.join(f"{name}={getattr(self, name)!r}" for name, _ in self.FIELDS[:4])
+        return f"{type(self).__name__}({shown}, ...)"
+
+
+class Place(Record):
+    """Место: город, аэропорт, достопримечательность"""
+
+    FIELDS = (('source', CATEGORY), ('place_id', TEXT), ('name', TEXT), ('kind', CATEGORY),
+              ('lat', FLOAT), ('lon', FLOAT), ('city', TEXT), ('country', CATEGORY),
+              ('code', TEXT), ('related', OBJECT))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+    @classmethod
+    def from_amadeus(cls, location):
+        """Город или аэропорт Amadeus (reference-data/locations)"""
+        geo = location.get('geoCode') or {}
+        address = location.get('address') or {}
+        return cls('amadeus', location.get('id'), location.get('name'), location.get('subType'),
+                   geo.get('latitude'), geo.get('longitude'), address.get('cityName'),
+                   address.get('countryCode'), location.get('iataCode'),
+                   [rel.get('id') for rel in location.get('relationships') or [] if rel.get('type') == 'Airport'])
+
+
+class HotelOffer(Record):
+    """Предложение отеля: цена поставщика на дату"""
+
+    FIELDS = (('supplier', CATEGORY), ('hotel_id', TEXT), ('name', TEXT),
+              ('lat', FLOAT), ('lon', FLOAT), ('price', FLOAT), ('taxes', FLOAT), ('fees', FLOAT),
+              ('currency', CATEGORY), ('checkin', TEXT), ('nights', FLOAT), ('room', TEXT),
+              ('board', CATEGORY), ('refundable', OBJECT), ('updated', TEXT))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+    @classmethod
+    def from_offer(cls, offer):
+        """Предложение hotel_aggregator.make_offer"""
+        return cls(offer.get('supplier'), offer.get('hotel_id'), offer.get('name'),
+                   offer.get('latitude'), offer.get('longitude'), offer.get('price'),
+                   currency=offer.get('currency'), room=offer.get('room'), board=offer.get('board'),
+                   refundable=offer.get('refundable'))
+
+    @classmethod
+    def from_google_price(cls, hotel_id, item):
+        """Строка perItineraryPrices Google Hotels priceViews"""
+        checkin = item.get('checkinDate')
+        if isinstance(checkin, dict):
+            checkin = f"{checkin.get('year')}-{checkin.get('month', 0):02d}-{checkin.get('day', 0):02d}"
+        return cls('google', hotel_id, price=item.get('price'), taxes=item.get('taxes'), fees=item.get('fees'),
+                   currency=item.get('currencyCode'), checkin=checkin, nights=item.get('lengthOfStayDays'),
+                   updated=item.get('updateTime'))
+
+    @property
+    def total(self):
+        """Цена с налогами и сборами"""
+        return (self.price or 0) + (self.taxes or 0) + (self.fees or 0)
+
+
+class CarLocation(Record):
+    """Точка выдачи автомобилей или результат геопоиска рядом с ней"""
+
+    FIELDS = (('provider', CATEGORY), ('code', TEXT), ('name', TEXT), ('kind', CATEGORY),
+              ('lat', FLOAT), ('lon', FLOAT), ('address', TEXT), ('city', TEXT), ('country', CATEGORY),
+              ('distance_km', FLOAT), ('direction', CATEGORY))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+    @classmethod
+    def from_sabre(cls, result, category=None):
+        """Элемент GeoSearchResult ответа Sabre Geo Search"""
+        geo = result.get('GeoCode') or {}
+        address = result.get('Address') or {}
+        return cls('sabre', result.get('HotelCode') or result.get('LocationCode') or result.get('Code'),
+                   result.get('HotelName') or result.get('Name'), category,
+                   geo.get('Latitude'), geo.get('Longitude'), address.get('Street'), address.get('City'),
+                   address.get('CountryCode'), result.get('Distance'), result.get('Direction'))
+
+
+class Event(Record):
+    """Событие: концерт, спектакль, матч"""
+
+    FIELDS = (('source', CATEGORY), ('event_id', TEXT), ('name', TEXT), ('start', TEXT),
+              ('status', CATEGORY), ('segment', CATEGORY), ('genre', CATEGORY), ('venue', TEXT),
+              ('city', TEXT), ('country', CATEGORY), ('lat', FLOAT), ('lon', FLOAT),
+              ('min_price', FLOAT), ('max_price', FLOAT), ('currency', CATEGORY), ('url', TEXT))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+    @classmethod
+    def from_ticketmaster(cls, event):
+        """Событие Ticketmaster Discovery (_embedded.events)"""
+        dates = event.get('dates') or {}
+        start = dates.get('start') or {}
+        classification = _first(event.get('classifications'))
+        venue = _first((event.get('_embedded') or {}).get('venues'))
+        location = venue.get('location') or {}
+        price = _first(event.get('priceRanges'))
+        return cls('ticketmaster', event.get('id'), event.get('name'),
+                   start.get('dateTime') or start.get('localDate'),
+                   (dates.get('status') or {}).get('code'),
+                   (classification.get('segment') or {}).get('name'),
+                   (classification.get('genre') or {}).get('name'),
+                   venue.get('name'), (venue.get('city') or {}).get('name'),
+                   (venue.get('country') or {}).get('countryCode'),
+                   location.get('latitude'), location.get('longitude'),
+                   price.get('min'), price.get('max'), price.get('currency'), event.get('url'))
+
+
+class Artwork(Record):
+    """Произведение из музейной коллекции"""
+
+    FIELDS = (('source', CATEGORY), ('artwork_id', TEXT), ('accession', TEXT), ('title', TEXT),
+              ('creator', TEXT), ('date', TEXT), ('year', FLOAT), ('department', CATEGORY),
+              ('type', CATEGORY), ('culture', CATEGORY), ('image', TEXT), ('url', TEXT))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+    @classmethod
+    def from_cleveland(cls, artwork):
+        """Запись Cleveland Museum of Art Open Access (/api/artworks)"""
+        image = (artwork.get('images') or {}).get('web') or {}
+        return cls('cleveland', artwork.get('id'), artwork.get('accession_number'), artwork.get('title'),
+                   _first(artwork.get('creators')).get('description'), artwork.get('creation_date'),
+                   artwork.get('creation_date_earliest'), artwork.get('department'), artwork.get('type'),
+                   (artwork.get('culture') or [None])[0], image.get('url'), artwork.get('url'))
+
+
+class Restaurant(Record):
+    """Ресторан или кафе"""
+
+    FIELDS = (('source', CATEGORY), ('restaurant_id', TEXT), ('name', TEXT),
+              ('lat', FLOAT), ('lon', FLOAT), ('address', TEXT), ('city', TEXT), ('country', CATEGORY),
+              ('categories', OBJECT), ('rating', FLOAT), ('price_tier', FLOAT), ('distance_m', FLOAT))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+    @classmethod
+    def from_foursquare(cls, place):
+        """Место Foursquare Places (/places/search, results)"""
+        geo = (place.get('geocodes') or {}).get('main') or {}
+        location = place.get('location') or {}
+        return cls('foursquare', place.get('fsq_id'), place.get('name'),
+                   geo.get('latitude'), geo.get('longitude'), location.get('formatted_address'),
+                   location.get('locality'), location.get('country'),
+                   [category.get('name') for category in place.get('categories') or []],
+                   place.get('rating'), place.get('price'), place.get('distance'))
+
+
+class RecordBatch:
+    """Колоночная форма записей одного типа"""
+
+    def __init__(self, record_type, records=()):
+        """
+        Args:
+            record_type (type): Класс записей (Place, HotelOffer, ...)
+            records (iterable): Начальные записи
+        """
+        self.record_type = record_type
+        self.columns = {}
+        # Для категорий: (список значений, {значение: код})
+        self.dictionaries = {}
+        for name, kind in record_type.FIELDS:
+            if kind == FLOAT:
+                self.columns[name] = array('d')
+            elif kind == CATEGORY:
+                self.columns[name] = array('i')
+                self.dictionaries[name] = ([], {})
+            else:
+                self.columns[name] = []
+        self.extend(records)
+
+    def append(self, record):
+        """Добавить запись"""
+        for name, kind in self.record_type.FIELDS:
+            value = getattr(record, name)
+            if kind == FLOAT:
+                self.columns[name].append(math.nan if value is None else value)
+            elif kind == CATEGORY:
+                self.columns[name].append(self._code(name, value))
+            else:
+                self.columns[name].append(value)
+
+    def extend(self, records):
+        """Добавить записи"""
+        for record in records:
+            self.append(record)
+
+    def _code(self, name, value):
+        if value is None:
+            return -1
+        values, codes = self.dictionaries[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.columns[self.record_type.FIELDS[0][0]])
+
+    def _value(self, name, kind, index):
+        value = self.columns[name][index]
+        if kind == FLOAT:
+            return None if value != value else value
+        if kind == CATEGORY:
+            return None if value < 0 else self.dictionaries[name][0][value]
+        return value
+
+    def __getitem__(self, index):
+        """Запись по номеру (собирается из колонок)"""
+        if index < 0:
+            index += len(self)
+        record = self.record_type.__new__(self.record_type)
+        for name, kind in self.record_type.FIELDS:
+            setattr(record, name, self._value(name, kind, index))
+        return record
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, name):
+        """
+        Колонка целиком: array('d') для чисел, список значений для категорий
+        и остальных полей
+        """
+        kind = dict(self.record_type.FIELDS)[name]
+        if kind == CATEGORY:
+            values = self.dictionaries[name][0]
+            return [values[code] if code >= 0 else None for code in self.columns[name]]
+        return self.columns[name]
+
+    def to_numpy(self, name):
+        """
+        Числовая колонка (или коды категории) как numpy.ndarray без копирования
+
+        Пока массив numpy существует, в пакет нельзя добавлять записи (BufferError).
+        """
+        if np is None:
+            raise ImportError("Для to_numpy требуется пакет numpy: pip install numpy")
+        column = self.columns[name]
+        if not isinstance(column, array):
+            raise ValueError(f"Колонка {name} не числовая")
+        return np.frombuffer(column, dtype=np.float64 if column.typecode == 'd' else np.int32)
+
+    def points(self):
+        """Координаты (N, 2) для common/geodistance.py"""
+        if np is None:
+            raise ImportError("Для points требуется пакет numpy: pip install numpy")
+        return np.column_stack([self.to_numpy('lat'), self.to_numpy('lon')])
+
+    def mask(self, name, low=None, high=None, equals=None):
+        """
+        Номера записей, у которых поле в диапазоне [low, high] или равно equals
+
+        Диапазон задается только для числовых полей.
+
+        Returns:
+            list: Номера записей по возрастанию
+        """
+        column = self.columns[name]
+        kind = dict(self.record_type.FIELDS)[name]
+        if kind == CATEGORY:
+            code = self.dictionaries[name][1].get(equals, -2)
+            return [index for index, value in enumerate(column) if value == code]
+        if equals is not None:
+            return [index for index, value in enumerate(column) if value == equals]
+        if kind != FLOAT:
+            raise ValueError(f"Диапазон low/high задается только для числовых полей, {name} — {kind}")
+        low = -math.inf if low is None else low
+        high = math.inf if high is None else high
+        return [index for index, value in enumerate(column) if low <= value <= high]
+
+    def argsort(self, name, reverse=False):
+        """Номера записей по возрастанию поля (пустые значения — в конце)"""
+        column = self.columns[name]
+        kind = dict(self.record_type.FIELDS)[name]
+        if kind == FLOAT:
+            present = [index for index, value in enumerate(column) if value == value]
+            missing = [index for index, value in enumerate(column) if value != value]
+            key = column.__getitem__
+        elif kind == CATEGORY:
+            # Коды идут в порядке появления значений, сортируются сами значения
+            values = self.dictionaries[name][0]
+            present = [index for index, code in enumerate(column) if code >= 0]
+            missing = [index for index, code in enumerate(column) if code < 0]
+            key = lambda index: values[column[index]]
+        else:
+            present = [index for index, value in enumerate(column) if value is not None]
+            missing = [index for index, value in enumerate(column) if value is None]
+            key = column.__getitem__
+        return sorted(present, key=key, reverse=reverse) + missing
+
+    def take(self, indices):
+        """Новый пакет из записей с указанными номерами (в этом порядке)"""
+        batch = RecordBatch(self.record_type)
+        for name, kind in self.record_type.FIELDS:
+            column = self.columns[name]
+            if kind == CATEGORY:
+                batch.dictionaries[name] = (list(self.dictionaries[name][0]), dict(self.dictionaries[name][1]))
+            if isinstance(column, array):
+                batch.columns[name] = array(column.typecode, (column[index] for index in indices))
+            else:
+                batch.columns[name] = [column[index] for index in indices]
+        return batch
+
+    def nbytes(self):
+        """Примерный объем колонок в байтах (без самих строк)"""
+        total = 0
+        for column in self.columns.values():
+            total += column.itemsize * len(column) if isinstance(column, array) else sys.getsizeof(column)
+        return total
+
+
+if __name__ == "__main__":
+    # Память: 200 000 предложений словарями (make_offer), записями и пакетом
+    import random
+    import tracemalloc
+
+    def measure(build):
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, size
+
+    random.seed(1)
+    hotels = [f"H{index:06d}" for index in range(20000)]
+    raw = [{'supplier': random.choice(['hotelbeds', 'booking', 'agoda']), 'hotel_id': random.choice(hotels),
+            'name': None, 'latitude': 41.3 + random.random(), 'longitude': 2.1 + random.random(),
+            'price': round(random.uniform(50, 400), 2), 'currency': 'EUR', 'room': 'DBL',
+            'board': random.choice(['RO', 'BB', 'HB']), 'refundable': random.random() < 0.5}
+           for _ in range(200000)]
+
+    dicts, dict_bytes = measure(lambda: [dict(offer) for offer in raw])
+    records, record_bytes = measure(lambda: [HotelOffer.from_offer(offer) for offer in raw])
+    batch, batch_bytes = measure(lambda: RecordBatch(HotelOffer, records))
+    print(f"словари: {dict_bytes / 2**20:.1f} МБ, записи: {record_bytes / 2**20:.1f} МБ, "
+          f"пакет: {batch_bytes / 2**20:.1f} МБ")
+
+    cheap = batch.take(batch.argsort('price')[:3])
+    print([(offer.hotel_id, offer.price, offer.board) for offer in cheap])
+    print(f"BB дешевле 100: {len(set(batch.mask('board', equals='BB')) & set(batch.mask('price', high=100)))}")
@@ -0,0 +1,534 @@
+"""
+Вывод схемы ответов по записанным payload и кэш схем
+
+Скрипты исследования API печатают ключи ответов вручную, чтобы понять их
+структуру. Здесь структура выводится автоматически: infer обходит ответ и
+сливает его со схемой эндпоинта (типы, обязательность полей, пример
+значения), SchemaCache хранит схемы в JSON-файле, describe печатает их.
+
+По схеме строится декодер (build_decoder): с пакетом msgspec — структуры
+msgspec.Struct, которые разбираются из байт напрямую, без промежуточного
+дерева словарей, и пропускают поля вне схемы; без msgspec — сгенерированные
+классы со __slots__ поверх parse из projection.py (быстрее не разбор, а
+доступ к полям и память на объект). Схема обновляется новыми записями,
+декодер пересоздается при смене отпечатка схемы.
+
+Узел схемы:
+    {'types': ['object', 'null'], 'seen': 3, 'fields': {...}}  — объект
+    {'types': ['list'], 'seen': 3, 'items': {...}}              — массив
+    {'types': ['object'], 'seen': 3, 'map': {...}}              — словарь с произвольными ключами
+    {'types': ['str'], 'seen': 3, 'example': 'Telescope'}       — скаляр
+Поле необязательно, если его seen меньше seen родительского объекта.
+"""
+
+import hashlib
+import json
+import keyword
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from common.projection import parse
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Объект с большим числом разных ключей считается словарем (ID -> запись)
+MAX_FIELDS = 200
+EXAMPLE_LENGTH = 60
+DEFAULT_CACHE_PATH = "schemas.json"
+
+
+def _type_name(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, str):
+        return 'str'
+    if isinstance(value, list):
+        return 'list'
+    return 'object'
+
+
+def infer(value, schema=None):
+    """
+    Слить значение (разобранный JSON) со схемой
+
+    Args:
+        value: Значение
+        schema (dict): Схема, полученная ранее (None — новая)
+
+    Returns:
+        dict: Узел схемы (schema, измененный на месте, или новый)
+    """
+    node = schema if schema is not None else {'types': [], 'seen': 0}
+    node['seen'] += 1
+    kind = _type_name(value)
+    if kind not in node['types']:
+        node['types'].append(kind)
+
+    if kind == 'object':
+        if 'map' in node:
+            for item in value.values():
+                node['map'] = infer(item, node['map'])
+            return node
+        fields = node.setdefault('fields', {})
+        for key, item in value.items():
+            fields[key] = infer(item, fields.get(key))
+        if len(fields) > MAX_FIELDS:
+            _collapse_to_map(node)
+    elif kind == 'list':
+        for item in value:
+            node['items'] = infer(item, node.get('items'))
+    elif kind != 'null' and 'example' not in node:
+        node['example'] = value[:EXAMPLE_LENGTH] if isinstance(value, str) else value
+    return node
+
+
+def merge(left, right):
+    """Слить две схемы (например, записанные в разных процессах)"""
+    if left is None or right is None:
+        return json.loads(json.dumps(left if right is None else right))
+    node = {'types': list(left['types']), 'seen': left['seen'] + right['seen']}
+    node['types'] += [kind for kind in right['types'] if kind not in node['types']]
+    if 'example' in left or 'example' in right:
+        node['example'] = left.get('example', right.get('example'))
+    if 'items' in left or 'items' in right:
+        node['items'] = merge(left.get('items'), right.get('items'))
+    if 'map' in left or 'map' in right:
+        node['map'] = merge(left.get('map'), right.get('map'))
+        for sub in list(left.get('fields', {}).values()) + list(right.get('fields', {}).values()):
+            node['map'] = merge(node['map'], sub)
+    elif 'fields' in left or 'fields' in right:
+        fields = dict(left.get('fields', {}))
+        for key, sub in right.get('fields', {}).items():
+            fields[key] = merge(fields.get(key), sub)
+        node['fields'] = fields
+        if len(fields) > MAX_FIELDS:
+            _collapse_to_map(node)
+    return node
+
+
+def _collapse_to_map(node):
+    values = None
+    for sub in node.pop('fields').values():
+        values = merge(values, sub)
+    node['map'] = values
+
+
+def fingerprint(schema):
+    """Отпечаток формы схемы (без счетчиков и примеров)"""
+    def shape(node):
+        if node is None:
+            return None
+        return [sorted(node['types']), shape(node.get('items')), shape(node.get('map')),
+                {key: shape(sub) for key, sub in sorted(node.get('fields', {}).items())}]
+    return hashlib.sha1(json.dumps(shape(schema)).encode('utf-8')).hexdigest()[:16]
+
+
+def describe(schema, name='', parent_seen=None, lines=None, max_depth=None):
+    """
+    Схема в виде строк 'путь: типы' для печати
+
+    Args:
+        schema (dict): Схема
+        max_depth (int): Не глубже стольких уровней вложенности (None — вся схема)
+
+    Returns:
+        list: Строки вида 'data.attributes.title: str (необязательное) = "Telescope"'
+    """
+    lines = [] if lines is None else lines
+    if schema is None:
+        return lines
+    if max_depth is not None and name.count('.') + name.count('[]') + bool(name) > max_depth:
+        return lines
+    types = ' | '.join(schema['types'])
+    line = f"{name or '.'}: {types}"
+    if parent_seen is not None and schema['seen'] < parent_seen:
+        line += " (необязательное)"
+    if 'example' in schema:
+        line += f" = {json.dumps(schema['example'], ensure_ascii=False)}"
+    lines.append(line)
+    for key, sub in schema.get('fields', {}).items():
+        describe(sub, f"{name}.{key}" if name else key, schema['seen'], lines, max_depth)
+    if 'map' in schema:
+        describe(schema['map'], f"{name}.<ключ>" if name else '<ключ>', None, lines, max_depth)
+    if 'items' in schema:
+        describe(schema['items'], f"{name}[]", None, lines, max_depth)
+    return lines
+
+
+def infer_files(paths, schema=None):
+    """Схема по файлам JSON/JSONL с записанными ответами"""
+    for path in paths:
+        with open(path, 'rb') as f:
+            if path.endswith('.jsonl'):
+                for line in f:
+                    if line.strip():
+                        schema = infer(parse(line), schema)
+            else:
+                schema = infer(parse(f.read()), schema)
+    return schema
+
+
+# --- Кэш схем
+
+class SchemaCache:
+    """Схемы эндпоинтов в JSON-файле"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        """
+        Args:
+            path (str): Файл кэша (None — только в памяти)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.decoders = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def observe(self, endpoint, payload):
+        """
+        Добавить ответ эндпоинта в его схему
+
+        Args:
+            endpoint (str): Имя эндпоинта ('sciencemuseumgroup/object')
+            payload: Разобранный JSON, bytes или str
+
+        Returns:
+            dict: Схема эндпоинта
+        """
+        if isinstance(payload, (bytes, bytearray, str)):
+            payload = parse(payload)
+        with self.lock:
+            entry = self.entries.setdefault(endpoint, {'schema': None})
+            entry['schema'] = infer(payload, entry['schema'])
+            entry['fingerprint'] = fingerprint(entry['schema'])
+            entry['updated_at'] = time.time()
+            return entry['schema']
+
+    def observe_files(self, endpoint, paths):
+        """Добавить в схему эндпоинта записанные ответы из файлов"""
+        schema = infer_files(paths)
+        with self.lock:
+            entry = self.entries.setdefault(endpoint, {'schema': None})
+            entry['schema'] = merge(entry['schema'], schema)
+            entry['fingerprint'] = fingerprint(entry['schema'])
+            entry['updated_at'] = time.time()
+            return entry['schema']
+
+    def get(self, endpoint):
+        """Схема эндпоинта или None"""
+        entry = self.entries.get(endpoint)
+        return entry['schema'] if entry else None
+
+    def decoder(self, endpoint, fields=None):
+        """
+        Декодер по текущей схеме эндпоинта (пересоздается при изменении схемы)
+
+        Args:
+            endpoint (str): Имя эндпоинта
+            fields (list): Только эти пути (как в Projection); None — вся схема
+
+        Returns:
+            SchemaDecoder или None, если схемы нет
+        """
+        entry = self.entries.get(endpoint)
+        if entry is None:
+            return None
+        key = (endpoint, tuple(fields or ()))
+        with self.lock:
+            cached = self.decoders.get(key)
+            if cached is None or cached.fingerprint != entry['fingerprint']:
+                cached = build_decoder(entry['schema'], _class_name(endpoint), fields)
+                self.decoders[key] = cached
+            return cached
+
+    def save(self):
+        """Записать кэш (через временный файл)"""
+        if not self.path:
+            return
+        with self.lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+# --- Декодеры
+
+def _class_name(text):
+    name = ''.join(part.capitalize() for part in re.split(r'[^0-9A-Za-z]+', text) if part)
+    return name if name and not name[0].isdigit() else f"Record{name}"
+
+
+def _attr_name(key):
+    # Python приводит идентификаторы к NFKC ('ﬁle' -> 'file', 'a²' -> 'a2'), поэтому
+    # имя строится уже из нормализованного ключа; символы, недопустимые
+    # в идентификаторе, заменяются на '_'
+    name = ''.join(ch if f"a{ch}".isidentifier() else '_' for ch in unicodedata.normalize('NFKC', key))
+    name = name.strip('_') or 'field'
+    if not name.isidentifier() or unicodedata.normalize('NFKC', name) != name:
+        name = re.sub(r'[^A-Za-z0-9_]', '_', name).strip('_') or 'field'
+    if name[0].isdigit() or keyword.iskeyword(name):
+        name = f"f_{name}"
+    return name
+
+
+def _attr_names(keys):
+    # Имена атрибутов для ключей JSON ('@id' -> 'id', 'dc:title' -> 'dc_title').
+    # Ключи, которые уже являются именами, выбирают первыми: '@id' не отнимает
+    # 'id' у настоящего 'id'. Имена SlottedRecord (to_dict, _keys) заняты
+    keys = list(keys)
+    candidates = {key: _attr_name(key) for key in keys}
+    names, used = {}, set(_RESERVED_ATTRS)
+    for key in keys:
+        if candidates[key] == key and key not in used:
+            names[key] = key
+            used.add(key)
+    for key in keys:
+        if key in names:
+            continue
+        base = name = candidates[key]
+        index = 2
+        while name in used:
+            name, index = f"{base}_{index}", index + 1
+        used.add(name)
+        names[key] = name
+    return {key: names[key] for key in keys}
+
+
+def _restrict(schema, tree):
+    # Схема, сокращенная до дерева путей Projection
+    if tree is True or schema is None:
+        return schema
+    node = {key: value for key, value in schema.items() if key not in ('fields', 'items', 'map')}
+    if 'items' in schema:
+        node['items'] = _restrict(schema['items'], tree)
+    if 'map' in schema:
+        node['map'] = _restrict(schema['map'], tree.get('*', tree))
+    if 'fields' in schema:
+        node['fields'] = {key: _restrict(sub, tree.get(key) or tree.get('*'))
+                          for key, sub in schema['fields'].items() if key in tree or '*' in tree}
+    return node
+
+
+class SchemaDecoder:
+    """Декодер ответов одного эндпоинта, построенный по схеме"""
+
+    def __init__(self, schema, name, backend):
+        self.schema = schema
+        self.name = name
+        self.backend = backend
+        self.fingerprint = fingerprint(schema)
+        self.source = None
+        self.classes = {}
+        self.stats = {'decoded': 0, 'fallbacks': 0}
+        self._build = None
+        self._msgspec_decoder = None
+
+    def decode(self, raw):
+        """
+        Разобрать ответ (bytes или str)
+
+        Returns:
+            Объекты со __slots__ (или msgspec.Struct) для объектов схемы, списки
+            и скаляры как есть; поля вне схемы отбрасываются, отсутствующие — None
+        """
+        self.stats['decoded'] += 1
+        if self._msgspec_decoder is not None:
+            try:
+                return self._msgspec_decoder.decode(raw)
+            except msgspec.ValidationError:
+                # Ответ не совпал со схемой по типам — разбор без проверки типов
+                self.stats['fallbacks'] += 1
+                return self._slotted(parse(raw))
+        return self._build(parse(raw))
+
+    def convert(self, value):
+        """Уже разобранный JSON в объекты схемы"""
+        if self._msgspec_decoder is not None:
+            try:
+                return msgspec.convert(value, self._msgspec_type)
+            except msgspec.ValidationError:
+                self.stats['fallbacks'] += 1
+        return self._slotted(value)
+
+    def _slotted(self, value):
+        if self._build is None:
+            _compile_slotted(self)
+        return self._build(value)
+
+
+def build_decoder(schema, name='Record', fields=None, backend=None):
+    """
+    Построить декодер по схеме
+
+    Args:
+        schema (dict): Схема (infer, SchemaCache.get)
+        name (str): Имя корневого класса
+        fields (list): Только эти пути (как в Projection); None — вся схема
+        backend (str): 'msgspec' или 'slots' (по умолчанию msgspec, если установлен)
+
+    Returns:
+        SchemaDecoder
+    """
+    if fields:
+        from common.projection import Projection
+        schema = _restrict(schema, Projection(fields).tree)
+    backend = backend or ('msgspec' if msgspec is not None else 'slots')
+    decoder = SchemaDecoder(schema, name, backend)
+    if backend == 'msgspec':
+        if msgspec is None:
+            raise ImportError("Для backend='msgspec' требуется пакет msgspec: pip install msgspec")
+        decoder._msgspec_type = _msgspec_type(schema, name, decoder.classes)
+        decoder._msgspec_decoder = msgspec.json.Decoder(decoder._msgspec_type)
+    else:
+        _compile_slotted(decoder)
+    return decoder
+
+
+def _msgspec_type(node, name, classes):
+    from typing import Any, Optional
+    kinds = [kind for kind in node['types'] if kind != 'null']
+    nullable = 'null' in node['types']
+    if kinds == ['object'] and 'fields' in node:
+        names = _attr_names(node['fields'])
+        struct_fields = [(names[key], Optional[_msgspec_type(sub, f"{name}{_class_name(key)}", classes)], None)
+                         for key, sub in node['fields'].items()]
+        rename = {attr: key for key, attr in names.items() if attr != key}
+        result = msgspec.defstruct(name, struct_fields, rename=rename or None)
+        classes[name] = result
+    elif kinds == ['object'] and 'map' in node:
+        result = dict[str, _msgspec_type(node['map'], f"{name}Value", classes)]
+    elif kinds == ['list']:
+        result = list[_msgspec_type(node['items'], f"{name}Item", classes)] if 'items' in node else list
+    elif kinds in (['int'], ['float'], ['str'], ['bool']):
+        result = {'int': int, 'float': float, 'str': str, 'bool': bool}[kinds[0]]
+    elif sorted(kinds) == ['float', 'int']:
+        result = float
+    else:
+        return Any
+    return Optional[result] if nullable else result
+
+
+def _compile_slotted(decoder):
+    # Исходный код классов со __slots__ и функций сборки без общего обхода словаря
+    lines = []
+    taken = set()
+
+    def value_expr(node, expr, class_name):
+        # Выражение, превращающее значение expr по схеме node
+        if node is None:
+            return expr
+        if 'fields' in node:
+            return f"{emit(node, class_name)}({expr})"
+        if 'map' in node and ('fields' in node['map'] or 'items' in node['map'] or 'map' in node['map']):
+            inner = value_expr(node['map'], 'v', f"{class_name}Value")
+            return f"({{k: {inner} for k, v in {expr}.items()}} if type({expr}) is dict else {expr})"
+        if 'items' in node and ('fields' in node['items'] or 'items' in node['items'] or 'map' in node['items']):
+            inner = value_expr(node['items'], 'x', class_name)
+            return f"([{inner} for x in {expr}] if type({expr}) is list else {expr})"
+        return expr
+
+    def emit(node, class_name):
+        base, index = class_name, 2
+        while class_name in taken:
+            class_name, index = f"{base}{index}", index + 1
+        taken.add(class_name)
+        names = _attr_names(node['fields'])
+        builder = f"_build_{class_name}"
+        body = [f"def {builder}(d):",
+                "    if type(d) is not dict:",
+                "        return d",
+                f"    o = _new({class_name})"]
+        for key, sub in node['fields'].items():
+            getter = f"d.get({key!r})"
+            expr = value_expr(sub, 'v', f"{class_name}{_class_name(key)}")
+            if expr == 'v':
+                body.append(f"    o.{names[key]} = {getter}")
+            else:
+                body.append(f"    v = {getter}")
+                body.append(f"    o.{names[key]} = None if v is None else {expr}")
+        body.append("    return o")
+        lines.extend([f"class {class_name}(_Record):",
+                      f"    __slots__ = {tuple(names.values())!r}",
+                      f"    _keys = {tuple(names.keys())!r}",
+                      "", *body, ""])
+        return builder
+
+    root = value_expr(decoder.schema, 'value', decoder.name)
+    lines.extend(["def _build(value):", f"    return {root}", ""])
+    decoder.source = '\n'.join(lines)
+    namespace = {'_Record': SlottedRecord, '_new': object.__new__}
+    exec(compile(decoder.source, f"<schema {decoder.name}>", 'exec'), namespace)
+    decoder._build = namespace['_build']
+    decoder.classes.update({key: value for key, value in namespace.items()
+                            if isinstance(value, type) and issubclass(value, SlottedRecord) and value is not SlottedRecord})
+
+
+class SlottedRecord:
+    """База сгенерированных классов: запись с полями из схемы"""
+
+    __slots__ = ()
+    _keys = ()
+
+    def to_dict(self):
+        """Запись обратно в словарь с исходными ключами JSON"""
+        def plain(value):
+            if isinstance(value, SlottedRecord):
+                return value.to_dict()
+            if isinstance(value, list):
+                return [plain(item) for item in value]
+            if isinstance(value, dict):
+                return {key: plain(item) for key, item in value.items()}
+            return value
+        return {key: plain(getattr(self, attr)) for key, attr in zip(self._keys, self.__slots__)}
+
+    def __repr__(self):
+        shown = ', '.join(f"{attr}={getattr(self, attr)!r:.40}" for attr in self.__slots__[:4])
+        more = ', ...' if len(self.__slots__) > 4 else ''
+        return f"{type(self).__name__}({shown}{more})"
+
+
+# Атрибуты базового класса, которые поле записи не должно перекрывать
+_RESERVED_ATTRS = frozenset(dir(SlottedRecord))
+
+
+if __name__ == "__main__":
+    # Схемы записанных ответов из репозитория и скорость разбора ответа Cleveland
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    fixtures = {
+        'cleveland/artworks': ['Museum/cleveland/api_response_20250618_093645.json'],
+        'skyscanner/autosuggest': ['CarRent/skyscanner/simulated_response_popular.json',
+                                   'CarRent/skyscanner/simulated_response_london.json'],
+        'europeana/search': ['Museum/europeana/van_gogh_search.json',
+                             'Museum/europeana/europeana_success_api2demo.json'],
+    }
+    cache = SchemaCache(None)
+    for endpoint, paths in fixtures.items():
+        cache.observe_files(endpoint, [os.path.join(root, path) for path in paths])
+    print('\n'.join(describe(cache.get('skyscanner/autosuggest'))))
+
+    with open(os.path.join(root, fixtures['cleveland/artworks'][0]), 'rb') as f:
+        raw = f.read()
+    fields = ['info.total', 'data.id', 'data.title', 'data.creators.description', 'data.department']
+    decoder = cache.decoder('cleveland/artworks', fields)
+    for label, run in (('parse + dict', lambda: [(a['id'], a['title']) for a in parse(raw)['data']]),
+                       (f'decoder ({decoder.backend})', lambda: [(a.id, a.title) for a in decoder.decode(raw).data])):
+        started = time.perf_counter()
+        for _ in range(50):
+            run()
+        print(f"{label}: {(time.perf_counter() - started) / 50 * 1000:.2f} мс на ответ")
+    print(decoder.decode(raw).data[0])
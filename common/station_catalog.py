@@ -0,0 +1,304 @@
+"""
+Локальный каталог станций проката с инкрементальным обновлением
+
+Поиск станций возвращает краткие записи, а координаты и услуги берутся из
+деталей каждой станции — N+1 запросов на город. Каталог хранит снимок
+станций (краткая запись + детали) в JSON-файле и в памяти с индексами по ID,
+городу, услугам (subtypes) и ячейкам координатной сетки, поэтому поиск
+ближайших станций и фильтр по услугам не обращаются к сети.
+
+Обновление инкрементальное: список станций города запрашивается заново, а
+детали — только для новых станций и станций, краткая запись которых
+изменилась, параллельно через DetailHydrator. Фоновый поток обновляет
+города, снимок которых устарел.
+
+Каталог не зависит от провайдера: функции поиска и деталей передаются в
+конструктор (для Sixt — search_stations и get_station_details).
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+from common.geocache import haversine_m, normalize_query
+from common.hydrate import DetailHydrator
+
+# Снимок города считается устаревшим через сутки
+DEFAULT_MAX_AGE = 24 * 3600
+# Размер ячейки сетки в градусах (~11 км по широте)
+CELL_DEG = 0.1
+# Дальше этого числа колец сетки (или колец больше, чем занятых ячеек) станции ищутся перебором
+MAX_RINGS = 20
+KM_PER_DEGREE = 111.32
+
+
+def _fingerprint(summary):
+    return hashlib.sha1(json.dumps(summary, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def _coordinates(station):
+    coords = station.get('coordinates') or {}
+    lat, lon = coords.get('latitude'), coords.get('longitude')
+    if lat is None or lon is None:
+        return None
+    return float(lat), float(lon)
+
+
+def _cell(latitude, longitude):
+    return math.floor(latitude / CELL_DEG), math.floor(longitude / CELL_DEG)
+
+
+class _Indexes:
+    """Неизменяемый набор индексов: читатели работают без блокировок"""
+
+    def __init__(self, stations, cities):
+        self.stations = stations
+        self.cities = cities
+        self.services = {}
+        self.cells = {}
+        for station_id, station in stations.items():
+            for service in station.get('subtypes') or ():
+                self.services.setdefault(service, set()).add(station_id)
+            point = _coordinates(station)
+            if point is not None:
+                self.cells.setdefault(_cell(*point), []).append((point, station_id))
+
+
+class StationCatalog:
+    """Каталог станций в памяти со снимком на диске"""
+
+    def __init__(self, search, details, path=None, max_age=DEFAULT_MAX_AGE, max_workers=4):
+        """
+        Args:
+            search (callable): search(city) -> список кратких записей станций (с 'id')
+            details (callable): details(station_id) -> детали станции или None
+            path (str): JSON-файл снимка (None — только в памяти)
+            max_age (int): Через сколько секунд город обновляется в фоне
+            max_workers (int): Максимум одновременных запросов деталей
+        """
+        self.search = search
+        self.details = details
+        self.path = path
+        self.max_age = max_age
+        self.hydrator = DetailHydrator(fetch_one=details, max_workers=max_workers, name='деталей станции')
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # Состояние, которое пишется в снимок
+        self.stations = {}
+        self.fingerprints = {}
+        self.city_ids = {}
+        self.city_updated = {}
+        if path and os.path.exists(path):
+            self._load()
+        self.indexes = _Indexes(dict(self.stations), dict(self.city_ids))
+
+    # --- снимок
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        self.stations = snapshot.get('stations', {})
+        self.fingerprints = snapshot.get('fingerprints', {})
+        self.city_ids = snapshot.get('cities', {})
+        self.city_updated = snapshot.get('updated', {})
+
+    def _save(self):
+        if not self.path:
+            return
+        snapshot = {
+            'stations': self.stations,
+            'fingerprints': self.fingerprints,
+            'cities': self.city_ids,
+            'updated': self.city_updated
+        }
+        # Пишем во временный файл и подменяем — читатель не увидит половину снимка
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    # --- обновление
+
+    def refresh_city(self, city, full=False):
+        """
+        Обновить станции города: детали запрашиваются только для новых и изменившихся
+
+        Args:
+            city (str): Город (поисковый запрос)
+            full (bool): Запросить детали всех станций города заново
+
+        Returns:
+            dict: {'stations': всего, 'fetched': запрошено деталей, 'removed': удалено}
+                или None, если список станций получить не удалось
+        """
+        key = normalize_query(city)
+        summaries = self.search(city)
+        if summaries is None:
+            return None
+
+        with self.lock:
+            known = dict(self.fingerprints)
+        changed = {}
+        for summary in summaries:
+            station_id = str(summary['id'])
+            fingerprint = _fingerprint(summary)
+            if full or known.get(station_id) != fingerprint:
+                changed[station_id] = (summary, fingerprint)
+        updates = {}
+        for station_id, details in self.hydrator.stream(changed):
+            if details is not None:
+                summary, fingerprint = changed[station_id]
+                updates[station_id] = ({**summary, **details}, fingerprint)
+        fetched = len(changed)
+
+        with self.lock:
+            ids = [str(summary['id']) for summary in summaries]
+            for station_id, (station, fingerprint) in updates.items():
+                self.stations[station_id] = station
+                self.fingerprints[station_id] = fingerprint
+            ids = [station_id for station_id in ids if station_id in self.stations]
+
+            removed = set(self.city_ids.get(key, ())) - set(ids)
+            self.city_ids[key] = ids
+            self.city_updated[key] = time.time()
+            # Станция могла переехать в список другого города — удаляем только ничьи
+            still_listed = set()
+            for city_ids in self.city_ids.values():
+                still_listed.update(city_ids)
+            for station_id in removed - still_listed:
+                self.stations.pop(station_id, None)
+                self.fingerprints.pop(station_id, None)
+
+            self.indexes = _Indexes(dict(self.stations), dict(self.city_ids))
+            self._save()
+        return {'stations': len(ids), 'fetched': fetched, 'removed': len(removed)}
+
+    def track(self, city):
+        """Добавить город в каталог (загружается сразу, если его еще нет)"""
+        if normalize_query(city) not in self.indexes.cities:
+            self.refresh_city(city)
+
+    def refresh_stale(self):
+        """Обновить города, снимок которых старше max_age"""
+        now = time.time()
+        with self.lock:
+            stale = [city for city, updated in self.city_updated.items() if now - updated > self.max_age]
+        for city in stale:
+            if self.stop_event.is_set():
+                break
+            try:
+                self.refresh_city(city)
+            except Exception as e:
+                print(f"Ошибка обновления станций города {city}: {e}")
+        return len(stale)
+
+    def start_background_refresh(self, interval=600):
+        """
+        Запустить фоновый поток, который раз в interval секунд обновляет устаревшие города
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+
+        def run():
+            while not self.stop_event.wait(interval):
+                self.refresh_stale()
+
+        self.thread = threading.Thread(target=run, name='station-catalog-refresh', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Остановить фоновое обновление"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # --- запросы (только память)
+
+    def get(self, station_id):
+        """Станция по ID или None"""
+        return self.indexes.stations.get(str(station_id))
+
+    def by_city(self, city):
+        """Станции города в порядке выдачи поиска"""
+        indexes = self.indexes
+        return [indexes.stations[station_id] for station_id in indexes.cities.get(normalize_query(city), ())]
+
+    def with_service(self, service, city=None):
+        """Станции с услугой (subtypes), при необходимости — только в городе"""
+        indexes = self.indexes
+        ids = indexes.services.get(service, set())
+        if city is None:
+            return [indexes.stations[station_id] for station_id in sorted(ids)]
+        return [indexes.stations[station_id]
+                for station_id in indexes.cities.get(normalize_query(city), ()) if station_id in ids]
+
+    def nearest(self, latitude, longitude, k=5, max_km=None, service=None):
+        """
+        Ближайшие станции к точке
+
+        Args:
+            latitude, longitude (float): Точка
+            k (int): Количество станций
+            max_km (float): Максимальное расстояние
+            service (str): Только станции с этой услугой
+
+        Returns:
+            list: Пары (расстояние в км, станция) по возрастанию расстояния
+        """
+        indexes = self.indexes
+        allowed = indexes.services.get(service, set()) if service is not None else None
+        cell_y, cell_x = _cell(latitude, longitude)
+        # Ширина ячейки по долготе в км меньше, чем по широте: граница по ней
+        ring_km = CELL_DEG * KM_PER_DEGREE * max(math.cos(math.radians(min(abs(latitude) + CELL_DEG * MAX_RINGS,
+                                                                           89.9))), 0.01)
+
+        # Обход колец дороже перебора, когда колец больше, чем занятых ячеек
+        max_rings = min(MAX_RINGS, int(math.sqrt(len(indexes.cells))) // 2 + 1)
+        found = []
+        for ring in range(max_rings + 1):
+            for dy in range(-ring, ring + 1):
+                for dx in range(-ring, ring + 1):
+                    if max(abs(dy), abs(dx)) != ring:
+                        continue
+                    for point, station_id in indexes.cells.get((cell_y + dy, cell_x + dx), ()):
+                        if allowed is not None and station_id not in allowed:
+                            continue
+                        distance = haversine_m(latitude, longitude, *point) / 1000
+                        if max_km is None or distance <= max_km:
+                            found.append((distance, station_id))
+            # Станции за пределами колец 0..ring дальше ring * ring_km
+            bound = ring * ring_km
+            found.sort()
+            if len(found) >= k and found[k - 1][0] <= bound:
+                break
+            if max_km is not None and bound >= max_km:
+                break
+        else:
+            # Станции далеко — перебираем все
+            found = []
+            for cell_points in indexes.cells.values():
+                for point, station_id in cell_points:
+                    if allowed is not None and station_id not in allowed:
+                        continue
+                    distance = haversine_m(latitude, longitude, *point) / 1000
+                    if max_km is None or distance <= max_km:
+                        found.append((distance, station_id))
+            found.sort()
+
+        return [(round(distance, 3), indexes.stations[station_id]) for distance, station_id in found[:k]]
+
+    def stats(self):
+        """Количество станций, городов и услуг в каталоге"""
+        indexes = self.indexes
+        return {
+            'stations': len(indexes.stations),
+            'cities': len(indexes.cities),
+            'services': {service: len(ids) for service, ids in indexes.services.items()}
+        }
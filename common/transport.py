@@ -0,0 +1,102 @@
+"""
+Общий HTTP транспорт для всех клиентов провайдеров
+
+Вместо модульных requests.get/post (новое TCP+TLS соединение на каждый вызов)
+клиенты используют одну сессию на процесс. Внутри сессии urllib3 держит
+отдельный keep-alive пул на каждый хост, размер пулов ограничен,
+таймауты по умолчанию одинаковые для всех провайдеров.
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Таймауты по умолчанию: (подключение, чтение) в секундах
+DEFAULT_TIMEOUT = (5, 30)
+
+# Сколько хостов держать в кэше пулов и сколько соединений на хост
+POOL_CONNECTIONS = 32
+POOL_MAXSIZE = 16
+
+USER_AGENT = 'TravelPackAPI/1.0'
+
+_session = None
+_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter, подставляющий таймаут по умолчанию"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(timeout=DEFAULT_TIMEOUT, pool_connections=POOL_CONNECTIONS,
+                   pool_maxsize=POOL_MAXSIZE):
+    """
+    Создать новую сессию с пулами соединений
+
+    Args:
+        timeout (tuple): Таймаут (подключение, чтение) по умолчанию
+        pool_connections (int): Количество хостов, для которых хранятся пулы
+        pool_maxsize (int): Максимум keep-alive соединений на один хост
+
+    Returns:
+        requests.Session: Настроенная сессия
+    """
+    session = requests.Session()
+    adapter = TimeoutHTTPAdapter(
+        timeout=timeout,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def get_session():
+    """
+    Получить общую для процесса сессию
+
+    Сессия создается при первом вызове. Заголовки авторизации в нее не
+    записываются: каждый клиент передает свои заголовки в запросе.
+
+    Returns:
+        requests.Session: Общая сессия
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session():
+    """Закрыть общую сессию и освободить соединения"""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _reset_after_fork():
+    # Сокеты родительского процесса нельзя делить с дочерним
+    global _session, _lock
+    _session = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)